@@ -0,0 +1,61 @@
+import logging
+import threading
+
+from app.core.profiling import profile_job
+from app.core.tracing import start_trace
+
+logger = logging.getLogger(__name__)
+
+# Every worker's `name`, which is what PROFILE_WORKERS matches on.
+worker_names: set[str] = set()
+
+
+class BackgroundWorker:
+  """
+  Daemon thread that calls `run_once()` every `interval` seconds until stopped.
+  `run_once()` may return True to request an immediate re-run (e.g. while catching up).
+  """
+
+  name = "background-worker"
+
+  def __init_subclass__(cls, **kwargs) -> None:
+    super().__init_subclass__(**kwargs)
+    worker_names.add(cls.name)
+
+  def __init__(self, interval: float) -> None:
+    self.interval = interval
+    self._stop = threading.Event()
+    self._wake = threading.Event()
+    self._thread: threading.Thread | None = None
+
+  def run_once(self) -> bool:
+    raise NotImplementedError
+
+  def start(self) -> None:
+    if self._thread and self._thread.is_alive():
+      return
+    self._stop.clear()
+    self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+    self._thread.start()
+
+  def wake(self) -> None:
+    self._wake.set()
+
+  def stop(self, timeout: float | None = 5.0) -> None:
+    self._stop.set()
+    self._wake.set()
+    if self._thread:
+      self._thread.join(timeout)
+
+  def _loop(self) -> None:
+    while not self._stop.is_set():
+      busy = False
+      try:
+        # Idle polls record no spans and are not exported.
+        with profile_job(self.name), start_trace(f"worker {self.name}", drop_if_empty=True):
+          busy = bool(self.run_once())
+      except Exception:  # noqa: BLE001
+        logger.exception("%s iteration failed", self.name)
+      if not busy:
+        self._wake.wait(self.interval)
+      self._wake.clear()
@@ -0,0 +1,45 @@
+import base64
+import hashlib
+import json
+
+RAW_CODEC = 0x55
+DAG_JSON_CODEC = 0x0129
+SHA2_256 = 0x12
+
+
+def _varint(value: int) -> bytes:
+  out = bytearray()
+  while True:
+    byte = value & 0x7F
+    value >>= 7
+    if value:
+      out.append(byte | 0x80)
+    else:
+      out.append(byte)
+      return bytes(out)
+
+
+def canonical_metadata_bytes(metadata: dict) -> bytes:
+  """The exact bytes we pin for a metadata document; the CID is derived from these."""
+  return json.dumps(metadata, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def compute_cid(data: bytes, codec: int = RAW_CODEC) -> str:
+  """
+  CIDv1 (base32, sha2-256) of `data`. With the default raw codec this matches what IPFS assigns to a
+  single-chunk file added with CIDv1 / raw leaves, i.e. what Pinata returns for pinFileToIPFS.
+  """
+  digest = hashlib.sha256(data).digest()
+  multihash = _varint(SHA2_256) + _varint(len(digest)) + digest
+  cid_bytes = _varint(1) + _varint(codec) + multihash
+  return "b" + base64.b32encode(cid_bytes).decode().lower().rstrip("=")
+
+
+def is_raw_cid(cid: str) -> bool:
+  """True for CIDv1 raw/sha2-256 CIDs, whose content can be checked with `compute_cid`."""
+  return cid.startswith("bafkrei")
+
+
+def metadata_cid(metadata: dict) -> tuple[bytes, str]:
+  content = canonical_metadata_bytes(metadata)
+  return content, compute_cid(content)
@@ -6,6 +6,10 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def _get_bool(name: str, default: bool) -> bool:
+  return os.getenv(name, str(default)).strip().lower() in {"1", "true", "yes", "on"}
+
+
 class Settings:
   def __init__(self) -> None:
     self.app_name = os.getenv("APP_NAME", "CloChain Server v2")
@@ -13,15 +17,94 @@ class Settings:
     self.jwt_secret = os.getenv("JWT_SECRET", "dev-secret")
     self.jwt_algorithm = os.getenv("JWT_ALGORITHM", "HS256")
     self.jwt_exp_minutes = int(os.getenv("JWT_EXP_MINUTES", "30"))
+    self.jwt_cache_max_entries = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "10000"))
+    self.session_sweep_seconds = float(os.getenv("SESSION_SWEEP_SECONDS", "300"))
+    self.session_sweep_batch_size = int(os.getenv("SESSION_SWEEP_BATCH_SIZE", "1000"))
     self.hmac_secret = os.getenv("HMAC_SECRET", "dev-hmac")
     self.database_url = os.getenv("DATABASE_URL", "sqlite:///./clochain.db")
+    # The local SQLite dev database migrates itself on startup; deployed databases are migrated explicitly.
+    self.db_auto_migrate = _get_bool("DB_AUTO_MIGRATE", self.database_url.startswith("sqlite"))
+    self.db_async = _get_bool("DB_ASYNC", False)
+    self.db_pool_profile = os.getenv("DB_POOL_PROFILE", "default").strip().lower()
+    self.db_pool_size = int(os.getenv("DB_POOL_SIZE", "10"))
+    self.db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "30"))
+    self.db_pool_timeout_seconds = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    self.db_pool_recycle_seconds = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    self.db_pool_pre_ping = _get_bool("DB_POOL_PRE_PING", True)
+    self.database_replica_urls = [
+      url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    self.database_replica_max_lag_seconds = float(os.getenv("DATABASE_REPLICA_MAX_LAG_SECONDS", "5"))
+    self.database_replica_check_seconds = float(os.getenv("DATABASE_REPLICA_CHECK_SECONDS", "5"))
+    self.qr_render_processes = int(os.getenv("QR_RENDER_PROCESSES", "2"))
+    self.qr_cache_bytes = int(os.getenv("QR_CACHE_BYTES", str(32 * 1024 * 1024)))
+    self.verify_batch_max_tokens = int(os.getenv("VERIFY_BATCH_MAX_TOKENS", "1000"))
+    self.verify_batch_rate_per_second = float(os.getenv("VERIFY_BATCH_RATE_PER_SECOND", "200"))
+    self.verify_batch_burst = int(os.getenv("VERIFY_BATCH_BURST", "5000"))
+    # Proxies in front of the app that append to X-Forwarded-For (Railway's edge is one).
+    self.trusted_proxy_hops = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+    self.ownership_cache_ttl_seconds = float(os.getenv("OWNERSHIP_CACHE_TTL_SECONDS", "30"))
+    self.metrics_enabled = _get_bool("METRICS_ENABLED", True)
+    self.known_wallets_max_entries = int(os.getenv("KNOWN_WALLETS_MAX_ENTRIES", "100000"))
+    self.tracing_enabled = _get_bool("TRACING_ENABLED", False)
+    self.trace_sample_ratio = float(os.getenv("TRACE_SAMPLE_RATIO", "0.1"))
+    self.trace_exporter = os.getenv("TRACE_EXPORTER", "console").strip().lower()
+    self.trace_file = os.getenv("TRACE_FILE", "traces.jsonl")
+    self.profiling_enabled = _get_bool("PROFILING_ENABLED", False)
+    self.profiling_secret = os.getenv("PROFILING_SECRET", "")
+    self.profile_dir = os.getenv("PROFILE_DIR", "profiles")
+    self.profile_interval_seconds = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005"))
+    self.profile_max_files = int(os.getenv("PROFILE_MAX_FILES", "200"))
+    self.profile_workers = {name.strip() for name in os.getenv("PROFILE_WORKERS", "").split(",") if name.strip()}
+    self.profile_job_min_seconds = float(os.getenv("PROFILE_JOB_MIN_SECONDS", "1"))
     self.pinata_api_key = os.getenv("PINATA_API_KEY", "pinata-key")
     self.pinata_secret = os.getenv("PINATA_API_SECRET") or os.getenv("PINATA_SECRET", "pinata-secret")
     self.pinata_jwt = os.getenv("PINATA_JWT", "")
+    self.pinata_timeout_seconds = float(os.getenv("PINATA_TIMEOUT_SECONDS", "30"))
+    self.pinata_max_concurrency = int(os.getenv("PINATA_MAX_CONCURRENCY", "8"))
+    self.pinata_max_retries = int(os.getenv("PINATA_MAX_RETRIES", "3"))
+    self.pinata_backoff_base_seconds = float(os.getenv("PINATA_BACKOFF_BASE_SECONDS", "0.5"))
+    self.pinata_backoff_cap_seconds = float(os.getenv("PINATA_BACKOFF_CAP_SECONDS", "10"))
+    self.pin_worker_enabled = _get_bool("PIN_WORKER_ENABLED", True)
+    self.pin_worker_poll_seconds = float(os.getenv("PIN_WORKER_POLL_SECONDS", "5"))
+    self.pin_max_attempts = int(os.getenv("PIN_MAX_ATTEMPTS", "8"))
+    self.ipfs_gateways = [
+      gateway.strip().rstrip("/")
+      for gateway in os.getenv(
+        "IPFS_GATEWAYS", "https://gateway.pinata.cloud/ipfs,https://ipfs.io/ipfs,https://dweb.link/ipfs"
+      ).split(",")
+      if gateway.strip()
+    ]
+    self.metadata_fetch_concurrency = int(os.getenv("METADATA_FETCH_CONCURRENCY", "8"))
+    self.metadata_fetch_timeout_seconds = float(os.getenv("METADATA_FETCH_TIMEOUT_SECONDS", "10"))
     self.rpc_url = os.getenv("RPC_URL", "")
     self.server_private_key = os.getenv("SERVER_PRIVATE_KEY", "")
     self.server_wallet_address = os.getenv("SERVER_WALLET_ADDRESS", "")
     self.contract_address = os.getenv("CONTRACT_ADDRESS", "")
+    self.rpc_read_mode = os.getenv("RPC_READ_MODE", "multicall")
+    self.rpc_batch_size = int(os.getenv("RPC_BATCH_SIZE", "100"))
+    self.multicall3_address = os.getenv("MULTICALL3_ADDRESS", "0xcA11bde05977b3631167028A5cF38d5d46A2ebe8")
+    self.gas_oracle_ttl_seconds = float(os.getenv("GAS_ORACLE_TTL_SECONDS", "10"))
+    self.gas_base_fee_multiplier = float(os.getenv("GAS_BASE_FEE_MULTIPLIER", "2"))
+    self.gas_limit_margin = float(os.getenv("GAS_LIMIT_MARGIN", "1.25"))
+    self.nonce_backend = os.getenv("NONCE_BACKEND", "memory")
+    self.login_nonce_store = os.getenv("LOGIN_NONCE_STORE", "memory")
+    self.login_nonce_ttl_seconds = int(os.getenv("LOGIN_NONCE_TTL_SECONDS", "600"))
+    self.login_nonce_max_entries = int(os.getenv("LOGIN_NONCE_MAX_ENTRIES", "100000"))
+    self.login_nonce_sweep_seconds = float(os.getenv("LOGIN_NONCE_SWEEP_SECONDS", "60"))
+    self.mint_worker_enabled = _get_bool("MINT_WORKER_ENABLED", True)
+    self.mint_worker_concurrency = int(os.getenv("MINT_WORKER_CONCURRENCY", "4"))
+    self.mint_worker_poll_seconds = float(os.getenv("MINT_WORKER_POLL_SECONDS", "2"))
+    self.mint_window_size = int(os.getenv("MINT_WINDOW_SIZE", "20"))
+    self.mint_receipt_poll_seconds = float(os.getenv("MINT_RECEIPT_POLL_SECONDS", "2"))
+    self.mint_receipt_timeout_seconds = int(os.getenv("MINT_RECEIPT_TIMEOUT_SECONDS", "120"))
+    self.mint_job_max_attempts = int(os.getenv("MINT_JOB_MAX_ATTEMPTS", "3"))
+    self.indexer_enabled = _get_bool("INDEXER_ENABLED", False)
+    self.indexer_start_block = int(os.getenv("INDEXER_START_BLOCK", "0"))
+    self.indexer_confirmations = int(os.getenv("INDEXER_CONFIRMATIONS", "12"))
+    self.indexer_batch_blocks = int(os.getenv("INDEXER_BATCH_BLOCKS", "2000"))
+    self.indexer_poll_seconds = float(os.getenv("INDEXER_POLL_SECONDS", "5"))
+    self.indexer_max_staleness_seconds = int(os.getenv("INDEXER_MAX_STALENESS_SECONDS", "300"))
 
 
 @lru_cache
@@ -0,0 +1,14 @@
+from app.core import metrics
+
+CALLS = metrics.counter(
+  "clochain_external_calls_total", "Calls to external dependencies (rpc, pinata, ipfs, qr), by operation and result"
+)
+CALL_SECONDS = metrics.histogram(
+  "clochain_external_call_seconds", "Time spent in external dependency calls, by dependency and operation"
+)
+
+
+def observe_call(dependency: str, operation: str, result: str, seconds: float) -> None:
+  CALLS.inc(dependency=dependency, operation=operation, result=result)
+  CALL_SECONDS.observe(seconds, dependency=dependency, operation=operation)
+
@@ -1,8 +1,11 @@
 import base64
+import binascii
 import hashlib
 import hmac
 import json
 import secrets
+import struct
+from datetime import datetime, timezone
 from typing import Tuple
 
 from fastapi import HTTPException, status
@@ -18,24 +21,193 @@ def _serialize_payload(payload: dict) -> str:
   return json.dumps(payload, separators=(",", ":"), sort_keys=True)
 
 
+def payload_fingerprint(payload: dict) -> str:
+  """Fixed-size key of a whole issued payload (sha256 of its canonical JSON)."""
+  return hashlib.sha256(_serialize_payload(payload).encode()).hexdigest()
+
+
+def product_fingerprint(brand: str, product_id: str, purchase_at: str) -> str:
+  """Fixed-size key of the purchase an NFT certifies; one NFT may exist per fingerprint."""
+  return hashlib.sha256("\x1f".join([brand, product_id, purchase_at]).encode()).hexdigest()
+
+
 def sign_payload(payload: dict) -> str:
   serialized = _serialize_payload(payload)
   digest = hmac.new(settings.hmac_secret.encode(), serialized.encode(), hashlib.sha256).hexdigest()
   return digest
 
 
-def encode_short_token(payload: dict, signature: str) -> str:
-  serialized = _serialize_payload(payload)
-  combined = f"{serialized}.{signature}".encode()
-  return base64.urlsafe_b64encode(combined).decode().rstrip("=")
+def _b64encode(data: bytes) -> str:
+  return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+  return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+# Compact token, version 0x01 (base64url):
+#   version(1) flags(1) brand(text) productId(text) purchaseAt(u64 epoch ms | text) address(20)
+#   nonce(16 | text) issuedAt(u32 epoch s | text) mac(16)
+# text = u16 length + UTF-8. The MAC is HMAC-SHA256 over everything before it, truncated to 16 bytes.
+# Timestamps and nonce only use the packed form when unpacking reproduces the original string exactly.
+COMPACT_TOKEN_VERSION = 0x01
+_COMPACT_MAC_BYTES = 16
+_COMPACT_FIELDS = {"brand", "productId", "purchaseAt", "did", "nonce", "issuedAt"}
+_FLAG_PURCHASE_AT_TEXT = 0x01
+_FLAG_NONCE_TEXT = 0x02
+_FLAG_ISSUED_AT_TEXT = 0x04
+_DID_PREFIX = "did:ethr:0x"
+
+
+def _format_js_iso(epoch_ms: int) -> str:
+  # Same shape as JavaScript's Date.toISOString(), which the shop uses for purchaseAt.
+  moment = datetime.fromtimestamp(epoch_ms / 1000, timezone.utc)
+  return moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{epoch_ms % 1000:03d}Z"
+
+
+def _format_iso_seconds(epoch_s: int) -> str:
+  return datetime.fromtimestamp(epoch_s, timezone.utc).isoformat()
+
+
+def _pack_js_iso(value: str) -> int | None:
+  try:
+    moment = datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
+  except ValueError:
+    return None
+  epoch_ms = round(moment.timestamp() * 1000)
+  return epoch_ms if 0 <= epoch_ms < 2**64 and _format_js_iso(epoch_ms) == value else None
+
+
+def _pack_iso_seconds(value: str) -> int | None:
+  try:
+    epoch_s = int(datetime.fromisoformat(value).timestamp())
+  except (ValueError, OverflowError):
+    return None
+  return epoch_s if 0 <= epoch_s < 2**32 and _format_iso_seconds(epoch_s) == value else None
+
+
+def _pack_nonce(value: str) -> bytes | None:
+  try:
+    raw = _b64decode(value)
+  except (ValueError, binascii.Error):
+    return None
+  return raw if len(raw) == 16 and _b64encode(raw) == value else None
+
+
+def _pack_text(value: str) -> bytes | None:
+  encoded = value.encode()
+  return struct.pack(">H", len(encoded)) + encoded if len(encoded) <= 0xFFFF else None
+
+
+def _pack_payload(payload: dict) -> bytes | None:
+  """Binary body of a compact token, or None when the payload does not fit the layout exactly."""
+  if set(payload) != _COMPACT_FIELDS or not all(isinstance(value, str) for value in payload.values()):
+    return None
+  did = payload["did"]
+  address = did[len(_DID_PREFIX) :]
+  if not did.startswith(_DID_PREFIX) or len(address) != 40 or address != address.lower():
+    return None
+  try:
+    address_bytes = bytes.fromhex(address)
+  except ValueError:
+    return None
+
+  flags = 0
+  purchase_at = _pack_js_iso(payload["purchaseAt"])
+  if purchase_at is None:
+    flags |= _FLAG_PURCHASE_AT_TEXT
+  nonce = _pack_nonce(payload["nonce"])
+  if nonce is None:
+    flags |= _FLAG_NONCE_TEXT
+  issued_at = _pack_iso_seconds(payload["issuedAt"])
+  if issued_at is None:
+    flags |= _FLAG_ISSUED_AT_TEXT
+
+  parts = [
+    bytes([COMPACT_TOKEN_VERSION, flags]),
+    _pack_text(payload["brand"]),
+    _pack_text(payload["productId"]),
+    struct.pack(">Q", purchase_at) if purchase_at is not None else _pack_text(payload["purchaseAt"]),
+    address_bytes,
+    nonce if nonce is not None else _pack_text(payload["nonce"]),
+    struct.pack(">I", issued_at) if issued_at is not None else _pack_text(payload["issuedAt"]),
+  ]
+  if any(part is None for part in parts):
+    return None
+  return b"".join(parts)
+
+
+def _unpack_payload(body: bytes) -> dict:
+  offset = 2
+  flags = body[1]
+
+  def take(size: int) -> bytes:
+    nonlocal offset
+    if offset + size > len(body):
+      raise ValueError("truncated token")
+    chunk = body[offset : offset + size]
+    offset += size
+    return chunk
+
+  def take_text() -> str:
+    (size,) = struct.unpack(">H", take(2))
+    return take(size).decode()
+
+  brand = take_text()
+  product_id = take_text()
+  if flags & _FLAG_PURCHASE_AT_TEXT:
+    purchase_at = take_text()
+  else:
+    purchase_at = _format_js_iso(struct.unpack(">Q", take(8))[0])
+  did = _DID_PREFIX + take(20).hex()
+  nonce = take_text() if flags & _FLAG_NONCE_TEXT else _b64encode(take(16))
+  if flags & _FLAG_ISSUED_AT_TEXT:
+    issued_at = take_text()
+  else:
+    issued_at = _format_iso_seconds(struct.unpack(">I", take(4))[0])
+  if offset != len(body):
+    raise ValueError("trailing bytes in token")
+  return {
+    "brand": brand,
+    "productId": product_id,
+    "purchaseAt": purchase_at,
+    "did": did,
+    "nonce": nonce,
+    "issuedAt": issued_at,
+  }
+
+
+def _compact_mac(body: bytes) -> bytes:
+  return hmac.new(settings.hmac_secret.encode(), body, hashlib.sha256).digest()[:_COMPACT_MAC_BYTES]
+
+
+def encode_short_token(payload: dict, signature: str, compact: bool = True) -> str:
+  """
+  Compact binary token when the payload fits the packed layout, otherwise the legacy
+  base64(JSON payload + "." + hex signature) token.
+  """
+  body = _pack_payload(payload) if compact else None
+  if body is None:
+    serialized = _serialize_payload(payload)
+    return _b64encode(f"{serialized}.{signature}".encode())
+  return _b64encode(body + _compact_mac(body))
 
 
 def decode_short_token(short_token: str) -> Tuple[dict, str]:
-  padding = "=" * (-len(short_token) % 4)
+  """
+  Verify either token format and return (payload, signature). The signature is always the hex
+  HMAC of the JSON payload, i.e. the value stored in `issues.signature`.
+  """
   try:
-    decoded = base64.urlsafe_b64decode(short_token + padding).decode()
+    decoded = _b64decode(short_token)
   except Exception as exc:  # noqa: BLE001
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed short token") from exc
+  if decoded[:1] == bytes([COMPACT_TOKEN_VERSION]):
+    return _decode_compact(decoded)
+  try:
+    decoded = decoded.decode()
+  except UnicodeDecodeError as exc:
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed short token") from exc
   if "." not in decoded:
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed token structure")
   payload_json, signature = decoded.rsplit(".", 1)
@@ -44,3 +216,16 @@ def decode_short_token(short_token: str) -> Tuple[dict, str]:
   if not hmac.compare_digest(signature, expected):
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token signature")
   return payload, signature
+
+
+def _decode_compact(decoded: bytes) -> Tuple[dict, str]:
+  if len(decoded) < 2 + _COMPACT_MAC_BYTES:
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed token structure")
+  body, mac = decoded[:-_COMPACT_MAC_BYTES], decoded[-_COMPACT_MAC_BYTES:]
+  if not hmac.compare_digest(mac, _compact_mac(body)):
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token signature")
+  try:
+    payload = _unpack_payload(body)
+  except (ValueError, struct.error, OverflowError, OSError) as exc:
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed token structure") from exc
+  return payload, sign_payload(payload)
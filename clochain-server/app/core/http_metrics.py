@@ -0,0 +1,60 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import metrics
+
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+REQUESTS = metrics.counter("clochain_http_requests_total", "HTTP requests, by method, route and status")
+DURATION = metrics.histogram("clochain_http_request_duration_seconds", "HTTP request latency, by method and route")
+RESPONSE_SIZE = metrics.histogram(
+  "clochain_http_response_size_bytes", "HTTP response body size, by method and route", buckets=SIZE_BUCKETS
+)
+IN_FLIGHT = metrics.gauge("clochain_http_requests_in_flight", "HTTP requests currently being handled, by method")
+
+
+def route_template(scope: Scope) -> str:
+  # FastAPI records the matched route in the (shared) scope while routing.
+  return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+  """
+  Pure ASGI middleware (no per-request task or body stream like BaseHTTPMiddleware) that records
+  request count, latency and response size per route template, plus requests in flight.
+
+  The route label is the matched path template (`/nft/jobs/{job_id}`), never the raw path, so the
+  label set stays bounded; requests that match no route are labelled "unmatched".
+  """
+
+  def __init__(self, app: ASGIApp) -> None:
+    self.app = app
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+    method = scope["method"]
+    status_code = 500
+    size = 0
+
+    async def send_wrapper(message: Message) -> None:
+      nonlocal status_code, size
+      if message["type"] == "http.response.start":
+        status_code = message["status"]
+      elif message["type"] == "http.response.body":
+        size += len(message.get("body", b""))
+      await send(message)
+
+    IN_FLIGHT.inc(method=method)
+    started = time.perf_counter()
+    try:
+      await self.app(scope, receive, send_wrapper)
+    finally:
+      elapsed = time.perf_counter() - started
+      IN_FLIGHT.dec(method=method)
+      route = route_template(scope)
+      REQUESTS.inc(method=method, route=route, status=status_code)
+      DURATION.observe(elapsed, method=method, route=route)
+      RESPONSE_SIZE.observe(size, method=method, route=route)
@@ -0,0 +1,153 @@
+import threading
+from typing import Any
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, Any]) -> LabelKey:
+  return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class _Metric:
+  kind = "untyped"
+
+  def __init__(self, name: str, documentation: str) -> None:
+    self.name = name
+    self.documentation = documentation
+    self._lock = threading.Lock()
+
+
+class Counter(_Metric):
+  kind = "counter"
+
+  def __init__(self, name: str, documentation: str) -> None:
+    super().__init__(name, documentation)
+    self._values: dict[LabelKey, float] = {}
+
+  def inc(self, amount: float = 1, **labels: Any) -> None:
+    key = _label_key(labels)
+    with self._lock:
+      self._values[key] = self._values.get(key, 0) + amount
+
+  def samples(self) -> dict[LabelKey, float]:
+    with self._lock:
+      return dict(self._values)
+
+
+class Gauge(Counter):
+  kind = "gauge"
+
+  def set(self, value: float, **labels: Any) -> None:
+    with self._lock:
+      self._values[_label_key(labels)] = value
+
+  def dec(self, amount: float = 1, **labels: Any) -> None:
+    self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+  kind = "histogram"
+
+  def __init__(self, name: str, documentation: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+    super().__init__(name, documentation)
+    self.buckets = tuple(sorted(buckets))
+    self._values: dict[LabelKey, list[float]] = {}
+
+  def observe(self, value: float, **labels: Any) -> None:
+    key = _label_key(labels)
+    with self._lock:
+      # [bucket counts..., +Inf count, sum]
+      state = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+      for index, bound in enumerate(self.buckets):
+        if value <= bound:
+          state[index] += 1
+      state[-2] += 1
+      state[-1] += value
+
+  def samples(self) -> dict[LabelKey, list[float]]:
+    with self._lock:
+      return {key: list(state) for key, state in self._values.items()}
+
+
+_registry: dict[str, _Metric] = {}
+_registry_lock = threading.Lock()
+
+
+def _get_or_create(cls, name: str, documentation: str, **kwargs):
+  with _registry_lock:
+    metric = _registry.get(name)
+    if metric is None:
+      metric = cls(name, documentation, **kwargs)
+      _registry[name] = metric
+    return metric
+
+
+def counter(name: str, documentation: str) -> Counter:
+  return _get_or_create(Counter, name, documentation)
+
+
+def gauge(name: str, documentation: str) -> Gauge:
+  return _get_or_create(Gauge, name, documentation)
+
+
+def histogram(name: str, documentation: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+  return _get_or_create(Histogram, name, documentation, buckets=buckets)
+
+
+def snapshot(prefix: str = "") -> dict[str, list[dict]]:
+  """JSON-friendly view of every registered metric whose name starts with `prefix`."""
+  with _registry_lock:
+    metrics = [metric for name, metric in _registry.items() if name.startswith(prefix)]
+  result: dict[str, list[dict]] = {}
+  for metric in metrics:
+    entries = []
+    for key, value in metric.samples().items():
+      entry: dict[str, Any] = {"labels": dict(key)}
+      if isinstance(metric, Histogram):
+        entry["count"] = value[-2]
+        entry["sum"] = value[-1]
+      else:
+        entry["value"] = value
+      entries.append(entry)
+    result[metric.name] = entries
+  return result
+
+
+def _format_value(value: float) -> str:
+  if value == float("inf"):
+    return "+Inf"
+  return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value: str) -> str:
+  return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: LabelKey, extra: tuple[tuple[str, str], ...] = ()) -> str:
+  pairs = labels + extra
+  if not pairs:
+    return ""
+  return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render_prometheus() -> str:
+  """Every registered metric in the Prometheus text exposition format (version 0.0.4)."""
+  with _registry_lock:
+    metrics = sorted(_registry.values(), key=lambda metric: metric.name)
+  lines: list[str] = []
+  for metric in metrics:
+    lines.append(f"# HELP {metric.name} {metric.documentation}")
+    lines.append(f"# TYPE {metric.name} {metric.kind}")
+    for key, value in sorted(metric.samples().items()):
+      if isinstance(metric, Histogram):
+        # Bucket counts are already cumulative: observe() bumps every bucket whose bound fits.
+        for bound, count in zip(metric.buckets, value):
+          lines.append(f"{metric.name}_bucket{_format_labels(key, (('le', _format_value(bound)),))} {_format_value(count)}")
+        lines.append(f"{metric.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {_format_value(value[-2])}")
+        lines.append(f"{metric.name}_sum{_format_labels(key)} {_format_value(value[-1])}")
+        lines.append(f"{metric.name}_count{_format_labels(key)} {_format_value(value[-2])}")
+      else:
+        lines.append(f"{metric.name}{_format_labels(key)} {_format_value(value)}")
+  return "\n".join(lines) + "\n"
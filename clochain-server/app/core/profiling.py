@@ -0,0 +1,232 @@
+"""
+On-demand sampling profiler for single requests and background jobs (PROFILING_ENABLED).
+
+A request is profiled only when it carries a valid admin signature in `X-Clochain-Profile`:
+`<unix time>.<hex HMAC-SHA256(PROFILING_SECRET, <unix time, METHOD, path, query, X-Request-ID>)>`,
+at most `_SIGNATURE_MAX_AGE` seconds old and accepted once per process, so a leaked header can only
+replay that exact request. Background workers listed in PROFILE_WORKERS are profiled on every
+iteration and kept when it ran for at least PROFILE_JOB_MIN_SECONDS.
+
+Profiles are speedscope files (https://www.speedscope.app) in PROFILE_DIR named after the signed
+`X-Request-ID`, echoed in `X-Profile-Id`; the newest PROFILE_MAX_FILES are kept. Every thread is
+sampled and gets its own profile in the file, the one that started the profile first: sync routes
+run on a threadpool thread, async ones on the loop.
+With PROFILING_ENABLED=false no middleware is installed and workers skip the check entirely.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-clochain-profile"
+_SIGNATURE_MAX_AGE = 300
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+# Innermost Python frames of a thread that is blocked waiting for work.
+_IDLE_FRAMES = {"wait", "select", "poll", "accept", "_recv_msg"}
+
+_store_lock = threading.Lock()
+# Accepted signatures -> when they can be forgotten (by then their timestamp is too old anyway).
+_used_signatures: dict[str, float] = {}
+_used_lock = threading.Lock()
+
+
+def sign_profile_request(method: str, path: str, query: str, request_id: str, timestamp: int | None = None) -> str:
+  """Value of the `X-Clochain-Profile` header that asks for `METHOD path?query` to be profiled as `request_id`."""
+  timestamp = int(time.time()) if timestamp is None else timestamp
+  # Newline-separated: none of the fields can contain one, so no two requests share a message.
+  message = "\n".join([str(timestamp), method.upper(), path, query, request_id]).encode()
+  return f"{timestamp}.{hmac.new(settings.profiling_secret.encode(), message, hashlib.sha256).hexdigest()}"
+
+
+def verify_profile_signature(header: str | None, method: str, path: str, query: str, request_id: str) -> bool:
+  """Check the signature and use it up: the same header is rejected on every later request."""
+  if not header or not settings.profiling_secret or not _REQUEST_ID.match(request_id):
+    return False
+  timestamp, _, _ = header.partition(".")
+  if not timestamp.isdigit() or abs(time.time() - int(timestamp)) > _SIGNATURE_MAX_AGE:
+    return False
+  if not hmac.compare_digest(header, sign_profile_request(method, path, query, request_id, int(timestamp))):
+    return False
+  now = time.time()
+  with _used_lock:
+    for stale in [signature for signature, forget_at in _used_signatures.items() if forget_at <= now]:
+      del _used_signatures[stale]
+    if header in _used_signatures:
+      return False
+    _used_signatures[header] = now + 2 * _SIGNATURE_MAX_AGE
+  return True
+
+
+class SamplingProfiler:
+  """Samples every thread's Python stack each `interval` seconds from a background thread."""
+
+  def __init__(self, interval: float) -> None:
+    self.interval = interval
+    self.origin_thread = threading.get_ident()
+    self._frames: dict[tuple[str, str, int], int] = {}
+    self._samples: dict[int, list[tuple[list[int], float]]] = {}
+    self._thread_names: dict[int, str] = {}
+    self._stop = threading.Event()
+    self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+    self.started = self.stopped = 0.0
+
+  def start(self) -> None:
+    self.started = time.perf_counter()
+    self._thread.start()
+
+  def stop(self) -> None:
+    self._stop.set()
+    self._thread.join()
+    self.stopped = time.perf_counter()
+
+  def _run(self) -> None:
+    own = threading.get_ident()
+    last = time.perf_counter()
+    while not self._stop.wait(self.interval):
+      now = time.perf_counter()
+      for thread_id, frame in sys._current_frames().items():
+        if thread_id == own:
+          continue
+        if thread_id not in self._samples:
+          # Named now: the thread may be gone by the time the profile is written.
+          self._samples[thread_id] = []
+          self._thread_names.update((thread.ident, thread.name) for thread in threading.enumerate())
+        self._samples[thread_id].append((self._stack(frame), now - last))
+      last = now
+
+  def _stack(self, frame) -> list[int]:
+    stack = []
+    while frame is not None:
+      code = frame.f_code
+      key = (code.co_name, code.co_filename, code.co_firstlineno)
+      index = self._frames.get(key)
+      if index is None:
+        index = self._frames[key] = len(self._frames)
+      stack.append(index)
+      frame = frame.f_back
+    stack.reverse()
+    return stack
+
+  def speedscope(self, name: str) -> dict:
+    frames = [{"name": fn, "file": file, "line": line} for (fn, file, line) in self._frames]
+    profiles = []
+    for thread_id in sorted(self._samples, key=lambda ident: ident != self.origin_thread):
+      samples = self._samples[thread_id]
+      if thread_id != self.origin_thread and all(frames[stack[-1]]["name"] in _IDLE_FRAMES for stack, _ in samples):
+        continue
+      profiles.append(
+        {
+          "type": "sampled",
+          "name": self._thread_names.get(thread_id, str(thread_id)),
+          "unit": "seconds",
+          "startValue": 0,
+          "endValue": sum(weight for _, weight in samples),
+          "samples": [stack for stack, _ in samples],
+          "weights": [weight for _, weight in samples],
+        }
+      )
+    return {
+      "$schema": "https://www.speedscope.app/file-format-schema.json",
+      "name": name,
+      "exporter": "clochain",
+      "activeProfileIndex": 0,
+      "shared": {"frames": frames},
+      "profiles": profiles,
+    }
+
+
+def profile_path(profile_id: str) -> Path | None:
+  if not _REQUEST_ID.match(profile_id):
+    return None
+  return Path(settings.profile_dir) / f"{profile_id}.speedscope.json"
+
+
+def _store(profile_id: str, profiler: SamplingProfiler, name: str) -> None:
+  path = profile_path(profile_id)
+  if path is None:
+    return
+  document = profiler.speedscope(name)
+  with _store_lock:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(document, separators=(",", ":")), encoding="utf-8")
+    stored = sorted(path.parent.glob("*.speedscope.json"), key=lambda item: item.stat().st_mtime)
+    for stale in stored[: max(0, len(stored) - settings.profile_max_files)]:
+      stale.unlink(missing_ok=True)
+  logger.info("Stored profile %s (%s, %.1fs)", path, name, profiler.stopped - profiler.started)
+
+
+@contextmanager
+def profile_job(worker_name: str) -> Iterator[None]:
+  """Profile one background-worker iteration if PROFILE_WORKERS lists the worker."""
+  if not settings.profiling_enabled or worker_name not in settings.profile_workers:
+    yield
+    return
+  profiler = SamplingProfiler(settings.profile_interval_seconds)
+  profiler.start()
+  try:
+    yield
+  finally:
+    profiler.stop()
+    if profiler.stopped - profiler.started >= settings.profile_job_min_seconds:
+      _store(f"{worker_name}-{uuid.uuid4().hex[:12]}", profiler, f"worker {worker_name}")
+
+
+def check_profile_workers(known: set[str]) -> None:
+  """Warn about PROFILE_WORKERS entries that name no background worker; names must match exactly."""
+  unknown = sorted(settings.profile_workers - known)
+  if settings.profiling_enabled and unknown:
+    logger.warning(
+      "PROFILE_WORKERS lists unknown workers %s; known workers are %s", ", ".join(unknown), ", ".join(sorted(known))
+    )
+
+
+class ProfilingMiddleware:
+  """Pure ASGI middleware: profiles requests that carry a valid `X-Clochain-Profile` signature."""
+
+  def __init__(self, app: ASGIApp) -> None:
+    self.app = app
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+    headers = dict(scope["headers"])
+    signature = headers.get(PROFILE_HEADER.encode())
+    method, path = scope["method"], scope["path"]
+    # Downloading a profile is signed the same way but is not itself worth profiling.
+    if path.startswith("/admin/profiles/"):
+      signature = None
+    profile_id = headers.get(b"x-request-id", b"").decode("latin-1")
+    query = scope.get("query_string", b"").decode("latin-1")
+    if signature is None or not verify_profile_signature(signature.decode("latin-1"), method, path, query, profile_id):
+      await self.app(scope, receive, send)
+      return
+
+    async def send_wrapper(message: Message) -> None:
+      if message["type"] == "http.response.start":
+        message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+      await send(message)
+
+    profiler = SamplingProfiler(settings.profile_interval_seconds)
+    profiler.start()
+    try:
+      await self.app(scope, receive, send_wrapper)
+    finally:
+      profiler.stop()
+      await run_in_threadpool(_store, profile_id, profiler, f"{method} {path}")
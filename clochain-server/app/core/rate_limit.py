@@ -0,0 +1,58 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+
+
+class TokenBucketLimiter:
+  """
+  Per-key token buckets refilled at `rate` tokens per second up to `burst`. Buckets for idle keys
+  are dropped least-recently-used first once `max_keys` is reached (a dropped key starts full again).
+  """
+
+  def __init__(self, rate: float, burst: int, max_keys: int = 10_000) -> None:
+    self.rate = rate
+    self.burst = burst
+    self.max_keys = max_keys
+    self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+    self._lock = threading.Lock()
+
+  def acquire(self, key: str, cost: float = 1) -> float:
+    """Take `cost` tokens for `key`; returns 0 on success, else the seconds to wait before retrying."""
+    now = time.monotonic()
+    with self._lock:
+      tokens, updated = self._buckets.pop(key, (float(self.burst), now))
+      tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+      wait = 0.0
+      if cost > tokens:
+        wait = (cost - tokens) / self.rate if self.rate > 0 else math.inf
+      else:
+        tokens -= cost
+      self._buckets[key] = (tokens, now)
+      while len(self._buckets) > self.max_keys:
+        self._buckets.popitem(last=False)
+      return wait
+
+  def enforce(self, key: str, cost: float = 1) -> None:
+    wait = self.acquire(key, cost)
+    if wait > 0:
+      retry_after = str(math.ceil(wait)) if math.isfinite(wait) else "3600"
+      raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Rate limit exceeded",
+        headers={"Retry-After": retry_after},
+      )
+
+
+def client_key(request: Request) -> str:
+  # Every trusted proxy appends the address it was connected from, so the caller is TRUSTED_PROXY_HOPS
+  # hops from the end of X-Forwarded-For. Earlier hops are whatever the client sent.
+  hops = settings.trusted_proxy_hops
+  forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+  if hops > 0 and len(forwarded) >= hops:
+    return forwarded[-hops]
+  return request.client.host if request.client else "unknown"
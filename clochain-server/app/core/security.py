@@ -1,3 +1,7 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict
 
@@ -5,17 +9,59 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
 
+from app.core import metrics
 from app.core.config import settings
 from app.core.did import to_did
 
 bearer_scheme = HTTPBearer(auto_error=True)
 
+TOKEN_CACHE = metrics.counter("clochain_jwt_cache_total", "Bearer token lookups in the verified-token cache, by result")
+
 
 def _now() -> datetime:
   return datetime.now(tz=timezone.utc)
 
 
-def create_wallet_token(wallet: str, expires_minutes: int | None = None) -> str:
+class VerifiedTokenCache:
+  """
+  LRU of claims for tokens whose signature was already checked, keyed by the token's SHA-256.
+  An entry is only served until the token's own `exp`, so a hit never outlives what jwt.decode allows.
+  """
+
+  def __init__(self, max_entries: int) -> None:
+    self.max_entries = max_entries
+    self._entries: OrderedDict[bytes, Dict[str, Any]] = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, token: str) -> Dict[str, Any] | None:
+    key = hashlib.sha256(token.encode()).digest()
+    with self._lock:
+      claims = self._entries.get(key)
+      if claims is None:
+        return None
+      if claims["exp"] <= time.time():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return claims
+
+  def put(self, token: str, claims: Dict[str, Any]) -> None:
+    # Tokens without a numeric exp never expire on their own; keep verifying those every time.
+    if self.max_entries <= 0 or not isinstance(claims.get("exp"), (int, float)):
+      return
+    key = hashlib.sha256(token.encode()).digest()
+    with self._lock:
+      self._entries[key] = claims
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+
+token_cache = VerifiedTokenCache(settings.jwt_cache_max_entries)
+
+
+def issue_wallet_token(wallet: str, expires_minutes: int | None = None) -> tuple[str, datetime]:
+  """Signed token for `wallet` and its expiry; the token is pre-verified in the cache."""
   did = to_did(wallet)
   payload: Dict[str, Any] = {
     "wallet": wallet,
@@ -23,14 +69,27 @@ def create_wallet_token(wallet: str, expires_minutes: int | None = None) -> str:
   }
   expire = _now() + timedelta(minutes=expires_minutes or settings.jwt_exp_minutes)
   payload["exp"] = int(expire.timestamp())
-  return jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
+  token = jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
+  token_cache.put(token, payload)
+  return token, datetime.fromtimestamp(payload["exp"], tz=timezone.utc)
+
+
+def create_wallet_token(wallet: str, expires_minutes: int | None = None) -> str:
+  return issue_wallet_token(wallet, expires_minutes)[0]
 
 
 def decode_token(token: str) -> Dict[str, Any]:
+  claims = token_cache.get(token)
+  if claims is not None:
+    TOKEN_CACHE.inc(result="hit")
+    return claims
+  TOKEN_CACHE.inc(result="miss")
   try:
-    return jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+    claims = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
   except JWTError as exc:
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token") from exc
+  token_cache.put(token, claims)
+  return claims
 
 
 def get_current_wallet(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> str:
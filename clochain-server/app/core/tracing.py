@@ -0,0 +1,320 @@
+"""
+Request tracing with OpenTelemetry-compatible ids and output, without the OpenTelemetry SDK.
+
+A trace starts at the edge (`TracingMiddleware` for HTTP requests, `start_trace` for background
+jobs) and the sampling decision is made once there: an incoming W3C `traceparent` is honoured,
+otherwise TRACE_SAMPLE_RATIO of trace ids are kept. Nested work opens child spans with `span()` /
+`@traced`; for an unsampled request that is one ContextVar lookup, and with TRACING_ENABLED=false
+nothing is installed at all.
+
+Finished traces go to TRACE_EXPORTER: "console" logs an indented span tree, "json" appends one
+OTLP/JSON `resourceSpans` document per line to TRACE_FILE (readable by the OpenTelemetry
+Collector's otlpjsonfile receiver).
+"""
+
+import functools
+import inspect
+import json
+import logging
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.http_metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+_MAX_STATEMENT_CHARS = 1000
+_SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+_current: ContextVar["Span | None"] = ContextVar("clochain_current_span", default=None)
+
+
+class Trace:
+  __slots__ = ("trace_id", "spans")
+
+  def __init__(self, trace_id: str) -> None:
+    self.trace_id = trace_id
+    self.spans: list[Span] = []
+
+
+class Span:
+  __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "attributes", "start_ns", "end_ns", "error")
+
+  def __init__(self, trace: Trace, name: str, parent_id: str | None, kind: str, attributes: dict[str, Any]) -> None:
+    self.trace = trace
+    self.span_id = secrets.token_hex(8)
+    self.parent_id = parent_id
+    self.name = name
+    self.kind = kind
+    self.attributes = attributes
+    self.start_ns = time.time_ns()
+    self.end_ns = 0
+    self.error: str | None = None
+
+  def set_attribute(self, key: str, value: Any) -> None:
+    self.attributes[key] = value
+
+  def end(self, error: BaseException | str | None = None) -> None:
+    self.end_ns = time.time_ns()
+    if error is not None:
+      self.error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+    self.trace.spans.append(self)
+
+  @property
+  def duration_ms(self) -> float:
+    return (self.end_ns - self.start_ns) / 1e6
+
+  def to_otlp(self) -> dict:
+    span = {
+      "traceId": self.trace.trace_id,
+      "spanId": self.span_id,
+      "name": self.name,
+      "kind": _SPAN_KINDS.get(self.kind, 1),
+      "startTimeUnixNano": str(self.start_ns),
+      "endTimeUnixNano": str(self.end_ns),
+      "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+      "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+    }
+    if self.parent_id:
+      span["parentSpanId"] = self.parent_id
+    return span
+
+
+def _otlp_value(value: Any) -> dict:
+  if isinstance(value, bool):
+    return {"boolValue": value}
+  if isinstance(value, int):
+    return {"intValue": str(value)}
+  if isinstance(value, float):
+    return {"doubleValue": value}
+  return {"stringValue": str(value)}
+
+
+def _parse_traceparent(header: str | None) -> tuple[str, str, bool] | None:
+  # version-traceid-parentid-flags, e.g. 00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01
+  parts = (header or "").strip().split("-")
+  if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+    return None
+  try:
+    sampled = bool(int(parts[3], 16) & 1)
+    int(parts[1], 16), int(parts[2], 16)
+  except ValueError:
+    return None
+  if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+    return None
+  return parts[1], parts[2], sampled
+
+
+def _sampled(trace_id: str) -> bool:
+  # Same rule as OpenTelemetry's TraceIdRatioBased sampler: compare the low 64 bits of the id.
+  return int(trace_id[16:], 16) < settings.trace_sample_ratio * 2**64
+
+
+@contextmanager
+def start_trace(
+  name: str, kind: str = "internal", traceparent: str | None = None, drop_if_empty: bool = False, **attributes: Any
+) -> Iterator[Span | None]:
+  """
+  Root span of a new trace; yields None when tracing is off or the trace is not sampled.
+  With `drop_if_empty`, a trace that recorded no child spans (e.g. an idle worker poll) is not exported.
+  """
+  if not settings.tracing_enabled:
+    yield None
+    return
+  parent = _parse_traceparent(traceparent)
+  if parent is not None:
+    trace_id, parent_id, sampled = parent
+  else:
+    trace_id, parent_id = secrets.token_hex(16), None
+    sampled = _sampled(trace_id)
+  if not sampled:
+    yield None
+    return
+  root = Span(Trace(trace_id), name, parent_id, kind, attributes)
+  token = _current.set(root)
+  try:
+    yield root
+  except BaseException as exc:
+    root.error = f"{type(exc).__name__}: {exc}"
+    raise
+  finally:
+    _current.reset(token)
+    root.end(root.error)
+    if not (drop_if_empty and len(root.trace.spans) == 1):
+      _get_exporter().export(root.trace)
+
+
+def start_span(name: str, kind: str = "internal", **attributes: Any) -> Span | None:
+  """Child of the current span without making it current; the caller must `end()` it."""
+  parent = _current.get()
+  if parent is None:
+    return None
+  return Span(parent.trace, name, parent.span_id, kind, attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes: Any) -> Iterator[Span | None]:
+  """Child span of the current one for the duration of the block; yields None outside a sampled trace."""
+  child = start_span(name, kind, **attributes)
+  if child is None:
+    yield None
+    return
+  token = _current.set(child)
+  try:
+    yield child
+  except BaseException as exc:
+    child.error = f"{type(exc).__name__}: {exc}"
+    raise
+  finally:
+    _current.reset(token)
+    child.end(child.error)
+
+
+def traced(name: str, kind: str = "internal") -> Callable:
+  """Decorator form of `span()` for sync and async functions."""
+
+  def decorate(fn: Callable) -> Callable:
+    if inspect.iscoroutinefunction(fn):
+
+      @functools.wraps(fn)
+      async def async_wrapper(*args, **kwargs):
+        if _current.get() is None:
+          return await fn(*args, **kwargs)
+        with span(name, kind):
+          return await fn(*args, **kwargs)
+
+      return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+      if _current.get() is None:
+        return fn(*args, **kwargs)
+      with span(name, kind):
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+  return decorate
+
+
+def trace_engine(engine, name: str) -> None:
+  """One client span per statement executed on `engine` (sync or async) inside a sampled trace."""
+  if not settings.tracing_enabled:
+    return
+  target = getattr(engine, "sync_engine", engine)
+  system = target.dialect.name
+
+  @event.listens_for(target, "before_cursor_execute")
+  def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is None or context is None:
+      return
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    context._trace_span = start_span(
+      f"db {operation}",
+      "client",
+      **{"db.system": system, "db.instance": name, "db.statement": statement[:_MAX_STATEMENT_CHARS]},
+    )
+
+  @event.listens_for(target, "after_cursor_execute")
+  def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+    db_span = getattr(context, "_trace_span", None)
+    if db_span is not None:
+      context._trace_span = None
+      db_span.end()
+
+  @event.listens_for(target, "handle_error")
+  def _error(exception_context) -> None:
+    db_span = getattr(exception_context.execution_context, "_trace_span", None)
+    if db_span is not None:
+      exception_context.execution_context._trace_span = None
+      db_span.end(exception_context.original_exception)
+
+
+class TracingMiddleware:
+  """Pure ASGI middleware opening the root span of every HTTP request (named `METHOD /route/template`)."""
+
+  def __init__(self, app: ASGIApp) -> None:
+    self.app = app
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+    traceparent = next((value.decode("latin-1") for key, value in scope["headers"] if key == b"traceparent"), None)
+    method = scope["method"]
+    with start_trace(method, "server", traceparent, **{"http.method": method, "http.target": scope["path"]}) as root:
+      if root is None:
+        await self.app(scope, receive, send)
+        return
+      status_code = 500
+
+      async def send_wrapper(message: Message) -> None:
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+          status_code = message["status"]
+        await send(message)
+
+      try:
+        await self.app(scope, receive, send_wrapper)
+      finally:
+        route = route_template(scope)
+        root.name = f"{method} {route}"
+        root.set_attribute("http.route", route)
+        root.set_attribute("http.status_code", status_code)
+        if status_code >= 500 and root.error is None:
+          root.error = f"HTTP {status_code}"
+
+
+class ConsoleExporter:
+  def export(self, trace: Trace) -> None:
+    spans = sorted(trace.spans, key=lambda item: item.start_ns)
+    depth: dict[str | None, int] = {}
+    lines = []
+    for item in spans:
+      level = depth.get(item.parent_id, -1) + 1
+      depth[item.span_id] = level
+      error = f"  !! {item.error}" if item.error else ""
+      lines.append(f"{'  ' * level}{item.duration_ms:9.1f}ms  {item.name}{error}")
+    logger.info("trace %s\n%s", trace.trace_id, "\n".join(lines))
+
+
+class JsonFileExporter:
+  def __init__(self, path: str) -> None:
+    self.path = path
+    self._lock = threading.Lock()
+
+  def export(self, trace: Trace) -> None:
+    document = {
+      "resourceSpans": [
+        {
+          "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": settings.app_name}}]},
+          "scopeSpans": [{"scope": {"name": "clochain"}, "spans": [item.to_otlp() for item in trace.spans]}],
+        }
+      ]
+    }
+    line = json.dumps(document, separators=(",", ":"))
+    try:
+      with self._lock, open(self.path, "a", encoding="utf-8") as handle:
+        handle.write(line + "\n")
+    except OSError:
+      logger.exception("Could not write trace %s to %s", trace.trace_id, self.path)
+
+
+_exporter: ConsoleExporter | JsonFileExporter | None = None
+_exporter_lock = threading.Lock()
+
+
+def _get_exporter() -> ConsoleExporter | JsonFileExporter:
+  global _exporter
+  with _exporter_lock:
+    if _exporter is None:
+      _exporter = JsonFileExporter(settings.trace_file) if settings.trace_exporter == "json" else ConsoleExporter()
+    return _exporter
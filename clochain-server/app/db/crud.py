@@ -1,36 +1,58 @@
+import json
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Any, Dict
 
-from sqlalchemy import select
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.core.did import did_to_wallet, to_did
+from app.core.hmac_utils import payload_fingerprint, product_fingerprint
 from app.db import models
+from app.db.known_wallets import known_wallets
+from app.db.ownership_cache import ownership_cache, product_key
+from app.db.session import on_commit
 
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
 
-def ensure_user(session: Session, wallet_address: str) -> models.User:
+
+def dialect_insert(session: Session, model):
+  """INSERT for `model` with ON CONFLICT support on Postgres / SQLite; None on other dialects."""
+  make_insert = _UPSERT_INSERTS.get(session.get_bind().dialect.name)
+  return make_insert(model) if make_insert is not None else None
+
+
+def ensure_user(session: Session, wallet_address: str) -> None:
   wallet = wallet_address.lower()
-  result = session.execute(select(models.User).where(models.User.wallet_address == wallet))
-  user = result.scalars().first()
-  if user:
-    return user
-  user = models.User(wallet_address=wallet, did=to_did(wallet))
-  session.add(user)
-  session.commit()
-  return user
+  if wallet in known_wallets:
+    return
+  values = {"wallet_address": wallet, "did": to_did(wallet), "created_at": datetime.utcnow()}
+  statement = dialect_insert(session, models.User)
+  if statement is not None:
+    # One round trip, and a concurrent first login for the same wallet is a no-op instead of a PK violation.
+    session.execute(statement.values(**values).on_conflict_do_nothing(index_elements=[models.User.wallet_address]))
+  elif session.get(models.User, wallet) is None:
+    try:
+      with session.begin_nested():
+        session.add(models.User(**values))
+    except IntegrityError:
+      pass
+  on_commit(session, lambda: known_wallets.add(wallet))
 
 
 def create_issue(session: Session, short_token: str, payload: Dict[str, Any], signature: str) -> models.Issue:
   issue = models.Issue(
     issue_id=str(uuid.uuid4()),
     short_token=short_token,
+    payload_fingerprint=payload_fingerprint(payload),
     payload=payload,
     signature=signature,
     created_at=datetime.utcnow(),
   )
   session.add(issue)
-  session.commit()
+  session.flush()
   return issue
 
 
@@ -39,6 +61,24 @@ def get_issue_by_token(session: Session, short_token: str) -> models.Issue | Non
   return result.scalars().first()
 
 
+def get_issue_by_payload(session: Session, payload: Dict[str, Any]) -> models.Issue | None:
+  result = session.execute(
+    select(models.Issue).where(models.Issue.payload_fingerprint == payload_fingerprint(payload))
+  )
+  return result.scalars().first()
+
+
+def _product_fingerprint_of(payload: Dict[str, Any]) -> str:
+  return product_fingerprint(str(payload["brand"]), str(payload["productId"]), str(payload["purchaseAt"]))
+
+
+def get_issued_tokens(session: Session, short_tokens: list[str]) -> set[str]:
+  if not short_tokens:
+    return set()
+  result = session.execute(select(models.Issue.short_token).where(models.Issue.short_token.in_(short_tokens)))
+  return set(result.scalars().all())
+
+
 def create_nft_record(
   session: Session,
   token_id: str,
@@ -56,11 +96,14 @@ def create_nft_record(
     brand=payload["brand"],
     product_id=payload["productId"],
     purchase_at=payload["purchaseAt"],
+    product_fingerprint=_product_fingerprint_of(payload),
     first_owner_wallet=first_owner,
     created_at=datetime.utcnow(),
   )
-  session.add(nft)
-  session.commit()
+  # Savepoint: a duplicate fingerprint fails this insert only, not the caller's whole unit of work.
+  with session.begin_nested():
+    session.add(nft)
+  on_commit(session, lambda: ownership_cache.invalidate_product(product_key(payload)))
   return nft
 
 
@@ -70,22 +113,35 @@ def get_nft_by_token(session: Session, token_id: str) -> models.NFT | None:
 
 
 def is_payload_registered(session: Session, payload: Dict[str, Any]) -> bool:
-  stmt = select(models.NFT).where(
-    models.NFT.brand == payload["brand"],
-    models.NFT.product_id == payload["productId"],
-    models.NFT.purchase_at == payload["purchaseAt"],
-  )
-  result = session.execute(stmt)
-  return result.scalars().first() is not None
+  stmt = select(models.NFT.token_id).where(models.NFT.product_fingerprint == _product_fingerprint_of(payload))
+  return session.execute(stmt).first() is not None
+
 
+def get_nfts_by_products(session: Session, products: list[tuple[str, str, str]]) -> dict[tuple[str, str, str], models.NFT]:
+  """NFTs keyed by (brand, productId, purchaseAt), fetched with a single IN query on the fingerprint."""
+  if not products:
+    return {}
+  fingerprints = {product_fingerprint(*product) for product in products}
+  stmt = select(models.NFT).where(models.NFT.product_fingerprint.in_(fingerprints))
+  return {(nft.brand, nft.product_id, nft.purchase_at): nft for nft in session.execute(stmt).scalars().all()}
 
-def update_nft_owner(session: Session, token_id: str, to_wallet: str) -> models.NFT | None:
-  nft = get_nft_by_token(session, token_id)
-  if not nft:
-    return None
-  nft.owner_wallet = to_wallet
-  session.commit()
-  session.refresh(nft)
+
+def update_nft_owner(
+  session: Session, token_id: str, to_wallet: str, expected_owner: str | None = None
+) -> models.NFT | None:
+  """
+  Move `token_id` to `to_wallet` with a single UPDATE ... RETURNING (no SELECT before or refresh after).
+  With `expected_owner` the update only applies while that wallet still owns the token; None means
+  no row matched.
+  """
+  stmt = update(models.NFT).where(models.NFT.token_id == token_id)
+  if expected_owner is not None:
+    stmt = stmt.where(models.NFT.owner_wallet == expected_owner.lower())
+  nft = session.execute(
+    stmt.values(owner_wallet=to_wallet).returning(models.NFT).execution_options(synchronize_session="fetch")
+  ).scalars().first()
+  if nft is not None:
+    on_commit(session, lambda: ownership_cache.invalidate_token(token_id))
   return nft
 
 
@@ -106,19 +162,230 @@ def record_transfer(
     block_number=block_number,
   )
   session.add(transfer)
-  session.commit()
+  session.flush()
+  on_commit(session, lambda: ownership_cache.invalidate_token(token_id))
   return transfer
 
 
+def get_ownership(session: Session, key: tuple[str, str, str]) -> dict:
+  """Registration state of one product in a single query: the NFT row plus its transfer count."""
+  transfer_count = (
+    select(func.count(models.Transfer.id)).where(models.Transfer.token_id == models.NFT.token_id).scalar_subquery()
+  )
+  row = session.execute(
+    select(models.NFT.token_id, models.NFT.owner_wallet, transfer_count).where(
+      models.NFT.product_fingerprint == product_fingerprint(*key)
+    )
+  ).first()
+  if row is None:
+    return {"registered": False, "tokenId": None, "owner": None, "transferCount": 0}
+  token_id, owner, count = row
+  return {"registered": True, "tokenId": token_id, "owner": owner, "transferCount": count}
+
+
 def store_session(session: Session, token: str, wallet_address: str, expired_at: datetime) -> models.Session:
   record = models.Session(session_token=token, wallet_address=wallet_address.lower(), expired_at=expired_at)
   session.merge(record)
-  session.commit()
+  session.flush()
   return record
 
 
+def delete_expired_sessions(session: Session, now: datetime, limit: int) -> int:
+  """Delete up to `limit` sessions that expired before `now`; returns how many were deleted."""
+  expired = (
+    select(models.Session.session_token).where(models.Session.expired_at <= now).limit(limit).scalar_subquery()
+  )
+  result = session.execute(delete(models.Session).where(models.Session.session_token.in_(expired)))
+  return result.rowcount
+
+
 def list_nfts_by_owner(session: Session, wallet_address: str) -> list[models.NFT]:
   wallet = wallet_address.lower()
   stmt = select(models.NFT).where(models.NFT.owner_wallet == wallet)
   result = session.execute(stmt)
   return list(result.scalars().all())
+
+
+def get_indexer_cursor(session: Session, name: str) -> models.IndexerCursor | None:
+  return session.get(models.IndexerCursor, name)
+
+
+def apply_indexed_events(
+  session: Session,
+  cursor_name: str,
+  events: list[Dict[str, Any]],
+  block_number: int,
+  head_block: int,
+  caught_up: bool,
+) -> models.IndexerCursor:
+  # Every token the batch touches is loaded with one IN query; new ones are inserted together at flush.
+  token_ids = {event["tokenId"] for event in events}
+  tokens: dict[str, models.IndexedToken | None] = dict.fromkeys(token_ids)
+  if token_ids:
+    existing = session.execute(select(models.IndexedToken).where(models.IndexedToken.token_id.in_(token_ids)))
+    tokens.update((token.token_id, token) for token in existing.scalars())
+  for event in events:
+    token_id = event["tokenId"]
+    token = tokens[token_id]
+    position = (event["blockNumber"], event["logIndex"])
+    if event["event"] == "Transfer":
+      if token is None:
+        token = models.IndexedToken(token_id=token_id, owner_wallet=event["to"], token_uri="")
+        token.last_block, token.last_log_index = position
+        session.add(token)
+        tokens[token_id] = token
+      elif position > (token.last_block, token.last_log_index):
+        token.owner_wallet = event["to"]
+        token.last_block, token.last_log_index = position
+    elif event["event"] == "AuthenticityMinted" and token is not None:
+      token.token_uri = event["tokenURI"]
+
+  cursor = session.get(models.IndexerCursor, cursor_name)
+  if cursor is None:
+    cursor = models.IndexerCursor(name=cursor_name, block_number=block_number, head_block=head_block)
+    session.add(cursor)
+  cursor.block_number = block_number
+  cursor.head_block = head_block
+  cursor.caught_up = caught_up
+  cursor.updated_at = datetime.utcnow()
+  session.flush()
+  return cursor
+
+
+def list_indexed_tokens_by_owner(session: Session, wallet_address: str) -> list[models.IndexedToken]:
+  wallet = wallet_address.lower()
+  stmt = select(models.IndexedToken).where(models.IndexedToken.owner_wallet == wallet)
+  result = session.execute(stmt)
+  return list(result.scalars().all())
+
+
+def create_mint_job(session: Session, short_token: str, wallet_address: str, payload: Dict[str, Any]) -> models.MintJob:
+  now = datetime.utcnow()
+  job = models.MintJob(
+    job_id=str(uuid.uuid4()),
+    short_token=short_token,
+    wallet_address=wallet_address.lower(),
+    payload=payload,
+    status="pending",
+    attempts=0,
+    created_at=now,
+    updated_at=now,
+  )
+  with session.begin_nested():
+    session.add(job)
+  return job
+
+
+def get_mint_job(session: Session, job_id: str) -> models.MintJob | None:
+  return session.get(models.MintJob, job_id)
+
+
+def get_mint_job_by_token(session: Session, short_token: str) -> models.MintJob | None:
+  result = session.execute(select(models.MintJob).where(models.MintJob.short_token == short_token))
+  return result.scalars().first()
+
+
+def _lease_rows(session: Session, model, key_column, statuses: list[str], limit: int, lease_seconds: int) -> list:
+  """
+  Lease up to `limit` unlocked rows of `model` in `statuses` to the caller by setting `locked_until`;
+  a lease only succeeds if the row is still unlocked, so concurrent workers never share a row.
+  """
+  now = datetime.utcnow()
+  unlocked = or_(model.locked_until.is_(None), model.locked_until < now)
+  candidates = session.execute(
+    select(key_column).where(model.status.in_(statuses), unlocked).order_by(model.created_at).limit(limit)
+  ).scalars().all()
+  claimed: list[str] = []
+  for key in candidates:
+    result = session.execute(
+      update(model)
+      .where(key_column == key, model.status.in_(statuses), unlocked)
+      .values(locked_until=now + timedelta(seconds=lease_seconds))
+    )
+    if result.rowcount == 1:
+      claimed.append(key)
+  session.flush()
+  if not claimed:
+    return []
+  result = session.execute(select(model).where(key_column.in_(claimed)).order_by(model.created_at))
+  return list(result.scalars().all())
+
+
+def claim_mint_jobs(session: Session, statuses: list[str], limit: int, lease_seconds: int) -> list[models.MintJob]:
+  """
+  Lease up to `limit` unlocked jobs in `statuses` to the caller. A lease left behind by a crashed
+  worker expires after `lease_seconds`, which is how jobs survive a restart.
+  """
+  return _lease_rows(session, models.MintJob, models.MintJob.job_id, statuses, limit, lease_seconds)
+
+
+def update_mint_job(session: Session, job: models.MintJob, **fields: Any) -> models.MintJob:
+  for name, value in fields.items():
+    setattr(job, name, value)
+  job.updated_at = datetime.utcnow()
+  session.flush()
+  return job
+
+
+def get_metadata_pin(session: Session, cid: str) -> models.MetadataPin | None:
+  return session.get(models.MetadataPin, cid)
+
+
+def get_metadata_pin_contents(session: Session, cids: list[str]) -> dict[str, dict]:
+  if not cids:
+    return {}
+  result = session.execute(
+    select(models.MetadataPin.cid, models.MetadataPin.content).where(models.MetadataPin.cid.in_(cids))
+  )
+  return {cid: json.loads(content) for cid, content in result.all()}
+
+
+def register_metadata_pin(session: Session, cid: str, content: str, name: str) -> models.MetadataPin:
+  """Record metadata that still has to be pinned; registering the same CID twice is a no-op."""
+  pin = session.get(models.MetadataPin, cid)
+  if pin is not None:
+    return pin
+  now = datetime.utcnow()
+  pin = models.MetadataPin(cid=cid, content=content, name=name, status="pending", created_at=now, updated_at=now)
+  try:
+    with session.begin_nested():
+      session.add(pin)
+  except IntegrityError:
+    return session.get(models.MetadataPin, cid)
+  return pin
+
+
+def claim_metadata_pins(session: Session, limit: int, lease_seconds: int) -> list[models.MetadataPin]:
+  return _lease_rows(session, models.MetadataPin, models.MetadataPin.cid, ["pending"], limit, lease_seconds)
+
+
+def update_metadata_pin(session: Session, pin: models.MetadataPin, **fields: Any) -> models.MetadataPin:
+  for name, value in fields.items():
+    setattr(pin, name, value)
+  pin.updated_at = datetime.utcnow()
+  session.flush()
+  return pin
+
+
+def get_token_metadata_many(session: Session, cids: list[str]) -> dict[str, dict]:
+  if not cids:
+    return {}
+  result = session.execute(select(models.TokenMetadata).where(models.TokenMetadata.cid.in_(cids)))
+  return {record.cid: record.content for record in result.scalars().all()}
+
+
+def store_token_metadata_many(session: Session, entries: dict[str, dict]) -> None:
+  if not entries:
+    return
+  now = datetime.utcnow()
+  known = set(session.execute(select(models.TokenMetadata.cid).where(models.TokenMetadata.cid.in_(entries))).scalars())
+  try:
+    # Only a cache: losing a race with another request for the same CID is fine.
+    with session.begin_nested():
+      session.add_all(
+        models.TokenMetadata(cid=cid, content=content, fetched_at=now)
+        for cid, content in entries.items()
+        if cid not in known
+      )
+  except IntegrityError:
+    pass
@@ -0,0 +1,35 @@
+import threading
+from collections import OrderedDict
+
+from app.core.config import settings
+
+
+class KnownWallets:
+  """
+  Wallets this process has seen committed to `users`. Users are never deleted, so an entry can
+  never go stale; the set is only bounded (least recently seen evicted first) to cap memory.
+  """
+
+  def __init__(self, max_entries: int) -> None:
+    self.max_entries = max_entries
+    self._wallets: OrderedDict[str, None] = OrderedDict()
+    self._lock = threading.Lock()
+
+  def __contains__(self, wallet: str) -> bool:
+    with self._lock:
+      if wallet not in self._wallets:
+        return False
+      self._wallets.move_to_end(wallet)
+      return True
+
+  def add(self, wallet: str) -> None:
+    if self.max_entries <= 0:
+      return
+    with self._lock:
+      self._wallets[wallet] = None
+      self._wallets.move_to_end(wallet)
+      while len(self._wallets) > self.max_entries:
+        self._wallets.popitem(last=False)
+
+
+known_wallets = KnownWallets(settings.known_wallets_max_entries)
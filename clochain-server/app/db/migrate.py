@@ -0,0 +1,115 @@
+"""
+Schema migrations.
+
+Migrations live in `app/db/migrations/mNNNN_<name>.py`; each module defines `revision`,
+`description` and `upgrade(conn)`, and runs in its own transaction together with its row in
+`schema_migrations`. Use the idempotent helpers in `app.db.migrations.ops` for DDL.
+
+  python -m app.db.migrate            # apply pending migrations
+  python -m app.db.migrate status     # list applied / pending revisions
+"""
+
+import importlib
+import pkgutil
+import sys
+from datetime import datetime
+from types import ModuleType
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select, text
+from sqlalchemy.engine import Engine
+
+from app.db import migrations
+
+_metadata = MetaData()
+schema_migrations = Table(
+  "schema_migrations",
+  _metadata,
+  Column("revision", String, primary_key=True),
+  Column("description", String, nullable=False),
+  Column("applied_at", DateTime, nullable=False),
+)
+
+# Arbitrary constant: serializes concurrent upgrades (several uvicorn workers) on Postgres.
+_ADVISORY_LOCK_ID = 72_317_001
+
+
+class SchemaNotMigratedError(RuntimeError):
+  pass
+
+
+def load_migrations() -> list[ModuleType]:
+  modules = [
+    importlib.import_module(f"{migrations.__name__}.{info.name}")
+    for info in pkgutil.iter_modules(migrations.__path__)
+    if info.name.startswith("m") and info.name[1:5].isdigit()
+  ]
+  return sorted(modules, key=lambda module: module.revision)
+
+
+def applied_revisions(engine: Engine) -> set[str]:
+  with engine.connect() as conn:
+    if not conn.dialect.has_table(conn, schema_migrations.name):
+      return set()
+    return set(conn.execute(select(schema_migrations.c.revision)).scalars().all())
+
+
+def pending_migrations(engine: Engine) -> list[ModuleType]:
+  applied = applied_revisions(engine)
+  return [module for module in load_migrations() if module.revision not in applied]
+
+
+def upgrade(engine: Engine) -> list[str]:
+  """Apply every pending migration in revision order; returns the applied revisions."""
+  _metadata.create_all(bind=engine)
+  applied: list[str] = []
+  with engine.connect() as lock_conn:
+    postgres = engine.dialect.name == "postgresql"
+    if postgres:
+      lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+    try:
+      for module in pending_migrations(engine):
+        with engine.begin() as conn:
+          module.upgrade(conn)
+          conn.execute(
+            schema_migrations.insert().values(
+              revision=module.revision, description=module.description, applied_at=datetime.utcnow()
+            )
+          )
+        applied.append(module.revision)
+    finally:
+      if postgres:
+        lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": _ADVISORY_LOCK_ID})
+        lock_conn.commit()
+  return applied
+
+
+def check_schema(engine: Engine) -> None:
+  pending = pending_migrations(engine)
+  if pending:
+    revisions = ", ".join(module.revision for module in pending)
+    raise SchemaNotMigratedError(
+      f"Database schema is missing migrations {revisions}; run `python -m app.db.migrate` "
+      "(or set DB_AUTO_MIGRATE=true)"
+    )
+
+
+def main(argv: list[str]) -> int:
+  from app.db.session import engine
+
+  command = argv[0] if argv else "upgrade"
+  if command == "status":
+    applied = applied_revisions(engine)
+    for module in load_migrations():
+      state = "applied" if module.revision in applied else "pending"
+      print(f"{module.revision}  {state:<8} {module.description}")
+    return 0
+  if command == "upgrade":
+    revisions = upgrade(engine)
+    print(f"Applied {', '.join(revisions)}" if revisions else "Schema is up to date")
+    return 0
+  print(f"Unknown command {command!r}; expected 'upgrade' or 'status'", file=sys.stderr)
+  return 2
+
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,65 @@
+"""Tables as created by `init_db`'s create_all before migrations existed (frozen; do not follow models.py)."""
+
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, MetaData, String, Table
+from sqlalchemy.engine import Connection
+
+revision = "0001"
+description = "baseline schema"
+
+_metadata = MetaData()
+
+Table(
+  "users",
+  _metadata,
+  Column("wallet_address", String, primary_key=True),
+  Column("did", String, nullable=False),
+  Column("created_at", DateTime, nullable=False),
+)
+
+Table(
+  "issues",
+  _metadata,
+  Column("issue_id", String, primary_key=True),
+  Column("short_token", String, unique=True, nullable=False),
+  Column("payload", JSON, nullable=False),
+  Column("signature", String, nullable=False),
+  Column("created_at", DateTime, nullable=False),
+)
+
+Table(
+  "nfts",
+  _metadata,
+  Column("token_id", String, primary_key=True),
+  Column("owner_wallet", String, nullable=False),
+  Column("cid", String, nullable=False),
+  Column("brand", String, nullable=False),
+  Column("product_id", String, nullable=False),
+  Column("purchase_at", String, nullable=False),
+  Column("first_owner_wallet", String, nullable=False),
+  Column("created_at", DateTime, nullable=False),
+)
+
+Table(
+  "transfers",
+  _metadata,
+  Column("id", String, primary_key=True),
+  Column("token_id", String, ForeignKey("nfts.token_id"), nullable=False),
+  Column("from_wallet", String, nullable=False),
+  Column("to_wallet", String, nullable=False),
+  Column("tx_hash", String, nullable=False),
+  Column("block_number", Integer, nullable=True),
+  Column("created_at", DateTime, nullable=False),
+)
+
+Table(
+  "sessions",
+  _metadata,
+  Column("session_token", String, primary_key=True),
+  Column("wallet_address", String, nullable=False),
+  Column("expired_at", DateTime, nullable=False),
+)
+
+
+def upgrade(conn: Connection) -> None:
+  # create_all only creates missing tables, so this adopts databases made by the old init_db as-is.
+  _metadata.create_all(bind=conn)
@@ -0,0 +1,60 @@
+"""Fingerprint columns used for issue lookups and duplicate-registration checks."""
+
+import json
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core.hmac_utils import payload_fingerprint, product_fingerprint
+from app.db.migrations import ops
+
+revision = "0002"
+description = "issues.payload_fingerprint and nfts.product_fingerprint"
+
+_MAX_REPORTED = 20
+
+
+def upgrade(conn: Connection) -> None:
+  issues = {
+    issue_id: payload_fingerprint(json.loads(payload) if isinstance(payload, str) else payload)
+    for issue_id, payload in conn.execute(text("SELECT issue_id, payload FROM issues"))
+  }
+  nfts = {
+    token_id: product_fingerprint(brand, product_id, purchase_at)
+    for token_id, brand, product_id, purchase_at in conn.execute(
+      text("SELECT token_id, brand, product_id, purchase_at FROM nfts")
+    )
+  }
+  # Both rows of a duplicate are live (a printed short_token, a minted token), so neither can be dropped here.
+  _refuse_duplicates("issues", "issue_id", "payloads issued more than once", issues)
+  _refuse_duplicates("nfts", "token_id", "products registered more than once", nfts)
+
+  _add_fingerprint(conn, "issues", "issue_id", "payload_fingerprint", issues)
+  ops.create_index(conn, "issues", "uq_issues_payload_fingerprint", ["payload_fingerprint"], unique=True)
+  _add_fingerprint(conn, "nfts", "token_id", "product_fingerprint", nfts)
+  ops.create_index(conn, "nfts", "uq_nfts_product_fingerprint", ["product_fingerprint"], unique=True)
+
+
+def _refuse_duplicates(table: str, key: str, what: str, fingerprints: dict[str, str]) -> None:
+  groups: dict[str, list[str]] = {}
+  for row_key, fingerprint in fingerprints.items():
+    groups.setdefault(fingerprint, []).append(row_key)
+  duplicates = [sorted(keys) for keys in groups.values() if len(keys) > 1]
+  if not duplicates:
+    return
+  listed = "; ".join(", ".join(keys) for keys in duplicates[:_MAX_REPORTED])
+  more = f" (and {len(duplicates) - _MAX_REPORTED} more)" if len(duplicates) > _MAX_REPORTED else ""
+  raise ops.MigrationConflictError(
+    f"{table} has {len(duplicates)} {what}, which the unique fingerprint index would reject. "
+    f"Keep one row per group ({key}: {listed}){more} and run the migration again."
+  )
+
+
+def _add_fingerprint(conn: Connection, table: str, key: str, column: str, fingerprints: dict[str, str]) -> None:
+  if ops.add_column(conn, table, column, "VARCHAR(64)"):
+    for row_key, fingerprint in fingerprints.items():
+      conn.execute(
+        text(f"UPDATE {table} SET {column} = :fingerprint WHERE {key} = :key"),
+        {"fingerprint": fingerprint, "key": row_key},
+      )
+  ops.set_not_null(conn, table, column)
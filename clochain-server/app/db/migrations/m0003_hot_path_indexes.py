@@ -0,0 +1,14 @@
+"""Secondary indexes for the lookups the CRUD layer performs on every request."""
+
+from sqlalchemy.engine import Connection
+
+from app.db.migrations import ops
+
+revision = "0003"
+description = "indexes on nfts.owner_wallet, transfers.token_id, sessions.wallet_address"
+
+
+def upgrade(conn: Connection) -> None:
+  ops.create_index(conn, "nfts", "ix_nfts_owner_wallet", ["owner_wallet"])  # /nft/me
+  ops.create_index(conn, "transfers", "ix_transfers_token_id", ["token_id"])  # ownership / transfer counts
+  ops.create_index(conn, "sessions", "ix_sessions_wallet_address", ["wallet_address"])
@@ -0,0 +1,20 @@
+"""Wallet-login nonces shared by all uvicorn workers (LOGIN_NONCE_STORE=db)."""
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table
+from sqlalchemy.engine import Connection
+
+revision = "0004"
+description = "login_nonces table"
+
+login_nonces = Table(
+  "login_nonces",
+  MetaData(),
+  Column("wallet_address", String, primary_key=True),
+  Column("nonce", String, nullable=False),
+  Column("expires_at", DateTime, nullable=False, index=True),
+)
+
+
+def upgrade(conn: Connection) -> None:
+  # checkfirst: databases created by the pre-migration create_all may already have the table.
+  login_nonces.create(conn, checkfirst=True)
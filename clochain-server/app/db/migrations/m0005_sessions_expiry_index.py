@@ -0,0 +1,12 @@
+"""Index for the expired-session sweep."""
+
+from sqlalchemy.engine import Connection
+
+from app.db.migrations import ops
+
+revision = "0005"
+description = "index on sessions.expired_at"
+
+
+def upgrade(conn: Connection) -> None:
+  ops.create_index(conn, "sessions", "ix_sessions_expired_at", ["expired_at"])
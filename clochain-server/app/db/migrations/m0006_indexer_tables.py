@@ -0,0 +1,35 @@
+"""Transfer-log indexer state: current owner per token and the per-contract block cursor."""
+
+from sqlalchemy import Boolean, Column, DateTime, Integer, MetaData, String, Table
+from sqlalchemy.engine import Connection
+
+revision = "0006"
+description = "indexed_tokens and indexer_cursors tables"
+
+_metadata = MetaData()
+
+Table(
+  "indexed_tokens",
+  _metadata,
+  Column("token_id", String, primary_key=True),
+  Column("owner_wallet", String, nullable=False, index=True),
+  Column("token_uri", String, nullable=False),
+  Column("last_block", Integer, nullable=False),
+  Column("last_log_index", Integer, nullable=False),
+  Column("updated_at", DateTime, nullable=False),
+)
+
+Table(
+  "indexer_cursors",
+  _metadata,
+  Column("name", String, primary_key=True),
+  Column("block_number", Integer, nullable=False),
+  Column("head_block", Integer, nullable=False),
+  Column("caught_up", Boolean, nullable=False),
+  Column("updated_at", DateTime, nullable=False),
+)
+
+
+def upgrade(conn: Connection) -> None:
+  # checkfirst: databases created by the pre-migration create_all may already have the tables.
+  _metadata.create_all(bind=conn)
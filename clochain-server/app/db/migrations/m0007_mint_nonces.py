@@ -0,0 +1,29 @@
+"""Locally allocated mint transaction nonces and the ones released by failed sends."""
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table
+from sqlalchemy.engine import Connection
+
+revision = "0007"
+description = "wallet_nonces and released_nonces tables"
+
+_metadata = MetaData()
+
+Table(
+  "wallet_nonces",
+  _metadata,
+  Column("wallet_address", String, primary_key=True),
+  Column("next_nonce", Integer, nullable=False),
+  Column("updated_at", DateTime, nullable=False),
+)
+
+Table(
+  "released_nonces",
+  _metadata,
+  Column("wallet_address", String, primary_key=True),
+  Column("nonce", Integer, primary_key=True),
+)
+
+
+def upgrade(conn: Connection) -> None:
+  # checkfirst: databases created by the pre-migration create_all may already have the tables.
+  _metadata.create_all(bind=conn)
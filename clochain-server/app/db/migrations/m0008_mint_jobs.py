@@ -0,0 +1,32 @@
+"""Persisted queue behind `/nft/register?async=true`."""
+
+from sqlalchemy import JSON, Column, DateTime, Integer, MetaData, String, Table
+from sqlalchemy.engine import Connection
+
+revision = "0008"
+description = "mint_jobs table"
+
+mint_jobs = Table(
+  "mint_jobs",
+  MetaData(),
+  Column("job_id", String, primary_key=True),
+  Column("short_token", String, unique=True, nullable=False),
+  Column("wallet_address", String, nullable=False),
+  Column("payload", JSON, nullable=False),
+  Column("status", String, nullable=False, index=True),
+  Column("cid", String, nullable=True),
+  Column("metadata", JSON, nullable=True),
+  Column("tx_hash", String, nullable=True),
+  Column("token_id", String, nullable=True),
+  Column("block_number", Integer, nullable=True),
+  Column("error", String, nullable=True),
+  Column("attempts", Integer, nullable=False),
+  Column("locked_until", DateTime, nullable=True),
+  Column("created_at", DateTime, nullable=False),
+  Column("updated_at", DateTime, nullable=False),
+)
+
+
+def upgrade(conn: Connection) -> None:
+  # checkfirst: databases created by the pre-migration create_all may already have the table.
+  mint_jobs.create(conn, checkfirst=True)
@@ -0,0 +1,27 @@
+"""Metadata bytes waiting for (or done with) their Pinata upload, keyed by the locally computed CID."""
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, Text
+from sqlalchemy.engine import Connection
+
+revision = "0009"
+description = "metadata_pins table"
+
+metadata_pins = Table(
+  "metadata_pins",
+  MetaData(),
+  Column("cid", String, primary_key=True),
+  Column("content", Text, nullable=False),
+  Column("name", String, nullable=False),
+  Column("status", String, nullable=False, index=True),
+  Column("pinned_cid", String, nullable=True),
+  Column("attempts", Integer, nullable=False),
+  Column("last_error", String, nullable=True),
+  Column("locked_until", DateTime, nullable=True),
+  Column("created_at", DateTime, nullable=False),
+  Column("updated_at", DateTime, nullable=False),
+)
+
+
+def upgrade(conn: Connection) -> None:
+  # checkfirst: databases created by the pre-migration create_all may already have the table.
+  metadata_pins.create(conn, checkfirst=True)
@@ -0,0 +1,20 @@
+"""Permanent cache of IPFS token metadata, keyed by CID."""
+
+from sqlalchemy import JSON, Column, DateTime, MetaData, String, Table
+from sqlalchemy.engine import Connection
+
+revision = "0010"
+description = "token_metadata table"
+
+token_metadata = Table(
+  "token_metadata",
+  MetaData(),
+  Column("cid", String, primary_key=True),
+  Column("content", JSON, nullable=False),
+  Column("fetched_at", DateTime, nullable=False),
+)
+
+
+def upgrade(conn: Connection) -> None:
+  # checkfirst: databases created by the pre-migration create_all may already have the table.
+  token_metadata.create(conn, checkfirst=True)
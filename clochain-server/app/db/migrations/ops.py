@@ -0,0 +1,76 @@
+"""
+Idempotent schema operations for migrations. Every helper inspects the live schema first, so a
+migration can run against a database that already has (part of) its changes, e.g. one created by
+the baseline from newer models, or one patched by hand.
+"""
+
+from sqlalchemy import MetaData, Table, inspect, text
+from sqlalchemy.engine import Connection
+
+
+class MigrationConflictError(RuntimeError):
+  """Existing rows violate a constraint the migration adds; nothing was changed."""
+
+
+def has_table(conn: Connection, table: str) -> bool:
+  return inspect(conn).has_table(table)
+
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+  return column in {existing["name"] for existing in inspect(conn).get_columns(table)}
+
+
+def is_nullable(conn: Connection, table: str, column: str) -> bool:
+  return next(existing["nullable"] for existing in inspect(conn).get_columns(table) if existing["name"] == column)
+
+
+def has_index(conn: Connection, table: str, name: str, columns: list[str] | None = None) -> bool:
+  """True if an index (or unique constraint) named `name`, or one covering exactly `columns`, exists."""
+  inspector = inspect(conn)
+  candidates = inspector.get_indexes(table) + inspector.get_unique_constraints(table)
+  for index in candidates:
+    if index.get("name") == name or (columns is not None and list(index.get("column_names") or []) == columns):
+      return True
+  return False
+
+
+def add_column(conn: Connection, table: str, column: str, ddl_type: str) -> bool:
+  if has_column(conn, table, column):
+    return False
+  conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+  return True
+
+
+def create_index(conn: Connection, table: str, name: str, columns: list[str], unique: bool = False) -> bool:
+  if has_index(conn, table, name, columns):
+    return False
+  kind = "UNIQUE INDEX" if unique else "INDEX"
+  conn.execute(text(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})"))
+  return True
+
+
+def set_not_null(conn: Connection, table: str, column: str) -> bool:
+  if not is_nullable(conn, table, column):
+    return False
+  if conn.dialect.name == "sqlite":
+    _rebuild_sqlite_table(conn, table, column)
+  else:
+    conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL"))
+  return True
+
+
+def _rebuild_sqlite_table(conn: Connection, table: str, not_null_column: str) -> None:
+  # SQLite cannot alter a column: copy the rows into a rebuilt table, swap it in, restore the indexes.
+  indexes = inspect(conn).get_indexes(table)
+  metadata = MetaData()
+  current = Table(table, metadata, autoload_with=conn)
+  rebuilt = current.to_metadata(metadata, name=f"_{table}_rebuild")
+  rebuilt.indexes.clear()
+  rebuilt.c[not_null_column].nullable = False
+  rebuilt.create(conn)
+  columns = ", ".join(column.name for column in current.columns)
+  conn.execute(text(f"INSERT INTO {rebuilt.name} ({columns}) SELECT {columns} FROM {table}"))
+  conn.execute(text(f"DROP TABLE {table}"))
+  conn.execute(text(f"ALTER TABLE {rebuilt.name} RENAME TO {table}"))
+  for index in indexes:
+    create_index(conn, table, index["name"], index["column_names"], unique=bool(index["unique"]))
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Any, Dict
 
-from sqlalchemy import JSON, DateTime, ForeignKey, Integer, String
+from sqlalchemy import JSON, Boolean, DateTime, ForeignKey, Integer, String, Text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -22,6 +22,7 @@ class Issue(Base):
 
   issue_id: Mapped[str] = mapped_column(String, primary_key=True)
   short_token: Mapped[str] = mapped_column(String, unique=True, nullable=False)
+  payload_fingerprint: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
   payload: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False)
   signature: Mapped[str] = mapped_column(String, nullable=False)
   created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -31,11 +32,12 @@ class NFT(Base):
   __tablename__ = "nfts"
 
   token_id: Mapped[str] = mapped_column(String, primary_key=True)
-  owner_wallet: Mapped[str] = mapped_column(String, nullable=False)
+  owner_wallet: Mapped[str] = mapped_column(String, nullable=False, index=True)
   cid: Mapped[str] = mapped_column(String, nullable=False)
   brand: Mapped[str] = mapped_column(String, nullable=False)
   product_id: Mapped[str] = mapped_column(String, nullable=False)
   purchase_at: Mapped[str] = mapped_column(String, nullable=False)
+  product_fingerprint: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
   first_owner_wallet: Mapped[str] = mapped_column(String, nullable=False)
   created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
@@ -44,7 +46,7 @@ class Transfer(Base):
   __tablename__ = "transfers"
 
   id: Mapped[str] = mapped_column(String, primary_key=True)
-  token_id: Mapped[str] = mapped_column(String, ForeignKey("nfts.token_id"), nullable=False)
+  token_id: Mapped[str] = mapped_column(String, ForeignKey("nfts.token_id"), nullable=False, index=True)
   from_wallet: Mapped[str] = mapped_column(String, nullable=False)
   to_wallet: Mapped[str] = mapped_column(String, nullable=False)
   tx_hash: Mapped[str] = mapped_column(String, nullable=False)
@@ -56,5 +58,92 @@ class Session(Base):
   __tablename__ = "sessions"
 
   session_token: Mapped[str] = mapped_column(String, primary_key=True)
+  wallet_address: Mapped[str] = mapped_column(String, nullable=False, index=True)
+  expired_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+
+class IndexedToken(Base):
+  __tablename__ = "indexed_tokens"
+
+  token_id: Mapped[str] = mapped_column(String, primary_key=True)
+  owner_wallet: Mapped[str] = mapped_column(String, nullable=False, index=True)
+  token_uri: Mapped[str] = mapped_column(String, nullable=False, default="")
+  last_block: Mapped[int] = mapped_column(Integer, nullable=False)
+  last_log_index: Mapped[int] = mapped_column(Integer, nullable=False)
+  updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class IndexerCursor(Base):
+  __tablename__ = "indexer_cursors"
+
+  name: Mapped[str] = mapped_column(String, primary_key=True)
+  block_number: Mapped[int] = mapped_column(Integer, nullable=False)
+  head_block: Mapped[int] = mapped_column(Integer, nullable=False)
+  caught_up: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+  updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class WalletNonce(Base):
+  __tablename__ = "wallet_nonces"
+
+  wallet_address: Mapped[str] = mapped_column(String, primary_key=True)
+  next_nonce: Mapped[int] = mapped_column(Integer, nullable=False)
+  updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class ReleasedNonce(Base):
+  __tablename__ = "released_nonces"
+
+  wallet_address: Mapped[str] = mapped_column(String, primary_key=True)
+  nonce: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+
+class MintJob(Base):
+  __tablename__ = "mint_jobs"
+
+  job_id: Mapped[str] = mapped_column(String, primary_key=True)
+  short_token: Mapped[str] = mapped_column(String, unique=True, nullable=False)
   wallet_address: Mapped[str] = mapped_column(String, nullable=False)
-  expired_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+  payload: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False)
+  status: Mapped[str] = mapped_column(String, nullable=False, default="pending", index=True)
+  cid: Mapped[str | None] = mapped_column(String, nullable=True)
+  token_metadata: Mapped[Dict[str, Any] | None] = mapped_column("metadata", JSON, nullable=True)
+  tx_hash: Mapped[str | None] = mapped_column(String, nullable=True)
+  token_id: Mapped[str | None] = mapped_column(String, nullable=True)
+  block_number: Mapped[int | None] = mapped_column(Integer, nullable=True)
+  error: Mapped[str | None] = mapped_column(String, nullable=True)
+  attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+  locked_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+  created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+  updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class MetadataPin(Base):
+  __tablename__ = "metadata_pins"
+
+  cid: Mapped[str] = mapped_column(String, primary_key=True)
+  content: Mapped[str] = mapped_column(Text, nullable=False)
+  name: Mapped[str] = mapped_column(String, nullable=False)
+  status: Mapped[str] = mapped_column(String, nullable=False, default="pending", index=True)
+  pinned_cid: Mapped[str | None] = mapped_column(String, nullable=True)
+  attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+  last_error: Mapped[str | None] = mapped_column(String, nullable=True)
+  locked_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+  created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+  updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class TokenMetadata(Base):
+  __tablename__ = "token_metadata"
+
+  cid: Mapped[str] = mapped_column(String, primary_key=True)
+  content: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False)
+  fetched_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class LoginNonce(Base):
+  __tablename__ = "login_nonces"
+
+  wallet_address: Mapped[str] = mapped_column(String, primary_key=True)
+  nonce: Mapped[str] = mapped_column(String, nullable=False)
+  expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from app.core.config import settings
+
+ProductKey = tuple[str, str, str]
+
+
+def product_key(payload: dict) -> ProductKey:
+  return (str(payload.get("brand")), str(payload.get("productId")), str(payload.get("purchaseAt")))
+
+
+class OwnershipCache:
+  """
+  TTL cache of {registered, tokenId, owner, transferCount} per product (brand, productId, purchaseAt),
+  the key a verified short_token payload maps to. Unregistered products are cached too, so repeated
+  scans of an unregistered QR do not hit the DB.
+
+  `crud` drops entries whenever it writes `nfts` or `transfers`, so this process never serves stale
+  data; other processes converge within `ttl_seconds`.
+  """
+
+  def __init__(self, ttl_seconds: float, max_entries: int = 50_000) -> None:
+    self.ttl_seconds = ttl_seconds
+    self.max_entries = max_entries
+    self._entries: OrderedDict[ProductKey, tuple[float, dict]] = OrderedDict()
+    self._products_by_token: dict[str, ProductKey] = {}
+    self._generation = 0
+    self._lock = threading.Lock()
+
+  def get(self, key: ProductKey, load: Callable[[ProductKey], dict]) -> dict:
+    now = time.monotonic()
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None and entry[0] > now:
+        self._entries.move_to_end(key)
+        return entry[1]
+      generation = self._generation
+    value = load(key)
+    with self._lock:
+      if generation != self._generation:
+        # A write landed while loading; the value may predate it, so don't keep it.
+        return value
+      self._entries[key] = (now + self.ttl_seconds, value)
+      self._entries.move_to_end(key)
+      if value.get("tokenId"):
+        self._products_by_token[value["tokenId"]] = key
+      while len(self._entries) > self.max_entries:
+        _, (_, evicted) = self._entries.popitem(last=False)
+        self._products_by_token.pop(evicted.get("tokenId"), None)
+    return value
+
+  def invalidate_product(self, key: ProductKey) -> None:
+    with self._lock:
+      self._generation += 1
+      entry = self._entries.pop(key, None)
+      if entry is not None:
+        self._products_by_token.pop(entry[1].get("tokenId"), None)
+
+  def invalidate_token(self, token_id: str) -> None:
+    with self._lock:
+      self._generation += 1
+      key = self._products_by_token.pop(token_id, None)
+      if key is not None:
+        self._entries.pop(key, None)
+
+  def clear(self) -> None:
+    with self._lock:
+      self._generation += 1
+      self._entries.clear()
+      self._products_by_token.clear()
+
+
+ownership_cache = OwnershipCache(settings.ownership_cache_ttl_seconds)
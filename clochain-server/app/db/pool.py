@@ -0,0 +1,129 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool, QueuePool
+
+from app.core import metrics
+from app.core.config import settings
+
+CHECKOUT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+CHECKOUT_SECONDS = metrics.histogram(
+  "clochain_db_pool_checkout_seconds",
+  "Time to get a connection from the pool (waiting for a free slot, connecting, pre-ping)",
+  buckets=CHECKOUT_BUCKETS,
+)
+CHECKOUT_TIMEOUTS = metrics.counter("clochain_db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT")
+IN_USE = metrics.gauge("clochain_db_pool_in_use", "Connections currently checked out")
+OVERFLOW = metrics.gauge("clochain_db_pool_overflow", "Connections open beyond DB_POOL_SIZE")
+CONNECTS = metrics.counter("clochain_db_pool_connects_total", "New DBAPI connections opened")
+INVALIDATIONS = metrics.counter("clochain_db_pool_invalidations_total", "Connections invalidated, by kind")
+
+
+class _TimedCheckout:
+  """Pool mixin that records how long `connect()` (a checkout) takes and how often it times out."""
+
+  def connect(self):
+    name = _pool_name(self)
+    started = time.perf_counter()
+    try:
+      return super().connect()
+    except PoolTimeoutError:
+      CHECKOUT_TIMEOUTS.inc(pool=name)
+      raise
+    finally:
+      CHECKOUT_SECONDS.observe(time.perf_counter() - started, pool=name)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+  pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+  pass
+
+
+class TimedNullPool(_TimedCheckout, NullPool):
+  pass
+
+
+def _pool_name(pool: Pool) -> str:
+  return getattr(pool, "_orig_logging_name", None) or "primary"
+
+
+def _is_sqlite_memory(url: str) -> bool:
+  # In-memory SQLite keeps SQLAlchemy's own pool: each pooled connection would be a separate database.
+  return url.startswith("sqlite") and (":memory:" in url or url.split("://", 1)[-1] in ("", "/"))
+
+
+def engine_options(url: str, name: str, use_async: bool = False) -> dict:
+  """
+  create_engine / create_async_engine keyword arguments for the configured DB_POOL_PROFILE.
+
+  "default" sizes a queue pool from DB_POOL_SIZE / DB_MAX_OVERFLOW (sized to the request threadpool).
+  "pgbouncer" is for PgBouncer in transaction mode: PgBouncer does the pooling, so no connections are
+  kept here (NullPool), and psycopg's server-side prepared statements are disabled because the next
+  transaction may run on a different server connection.
+  """
+  options: dict = {"pool_logging_name": name}
+  connect_args: dict = {}
+  if url.startswith("sqlite"):
+    if not use_async:
+      connect_args["check_same_thread"] = False
+  elif settings.db_pool_profile == "pgbouncer" and url.startswith("postgresql+psycopg"):
+    connect_args["prepare_threshold"] = None
+  if connect_args:
+    options["connect_args"] = connect_args
+
+  if _is_sqlite_memory(url):
+    return options
+  if settings.db_pool_profile == "pgbouncer":
+    options["poolclass"] = TimedNullPool
+    return options
+  options["poolclass"] = TimedAsyncQueuePool if use_async else TimedQueuePool
+  options["pool_pre_ping"] = settings.db_pool_pre_ping
+  options["pool_recycle"] = settings.db_pool_recycle_seconds
+  options["pool_size"] = settings.db_pool_size
+  options["max_overflow"] = settings.db_max_overflow
+  options["pool_timeout"] = settings.db_pool_timeout_seconds
+  return options
+
+
+def instrument_pool(engine) -> None:
+  """Keep in-use / overflow gauges and connect / invalidation counters for `engine`'s pool."""
+  target = getattr(engine, "sync_engine", engine)
+  in_use = 0
+  lock = threading.Lock()
+
+  def track(delta: int) -> None:
+    nonlocal in_use
+    pool = target.pool
+    name = _pool_name(pool)
+    with lock:
+      in_use += delta
+      IN_USE.set(in_use, pool=name)
+      if isinstance(pool, QueuePool):
+        # Overflow connections are closed as they come back, so beyond `size` every one is in use.
+        OVERFLOW.set(max(0, in_use - pool.size()), pool=name)
+
+  @event.listens_for(target, "connect")
+  def _on_connect(dbapi_connection, record) -> None:
+    CONNECTS.inc(pool=_pool_name(target.pool))
+
+  @event.listens_for(target, "checkout")
+  def _on_checkout(dbapi_connection, record, proxy) -> None:
+    track(1)
+
+  @event.listens_for(target, "checkin")
+  def _on_checkin(dbapi_connection, record) -> None:
+    track(-1)
+
+  @event.listens_for(target, "invalidate")
+  def _on_invalidate(dbapi_connection, record, exception) -> None:
+    INVALIDATIONS.inc(pool=_pool_name(target.pool), kind="hard")
+
+  @event.listens_for(target, "soft_invalidate")
+  def _on_soft_invalidate(dbapi_connection, record, exception) -> None:
+    INVALIDATIONS.inc(pool=_pool_name(target.pool), kind="soft")
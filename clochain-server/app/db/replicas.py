@@ -0,0 +1,155 @@
+import itertools
+import logging
+import threading
+from urllib.parse import urlsplit
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.core import metrics
+from app.core.background import BackgroundWorker
+
+logger = logging.getLogger(__name__)
+
+ROUTES = metrics.counter("clochain_db_routes_total", "Statements routed by the request session, by target and reason")
+REPLICA_HEALTHY = metrics.gauge("clochain_db_replica_healthy", "1 while a read replica is in rotation")
+REPLICA_LAG = metrics.gauge("clochain_db_replica_lag_seconds", "Replication lag measured by the last health check")
+
+# Zero while the replica has replayed everything it received, so an idle primary does not look like lag.
+_PG_LAG_SQL = text(
+  "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+  "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class Replica:
+  def __init__(self, url: str, engine: Engine, async_engine=None) -> None:
+    parts = urlsplit(url)
+    # Host and database only: the name is a metric label and must not carry credentials.
+    self.name = f"{parts.hostname or 'local'}{parts.path}"
+    self.engine = engine
+    self.async_engine = async_engine
+    self.healthy = False
+    self.lag_seconds: float | None = None
+    for bound in (engine, async_engine.sync_engine if async_engine is not None else None):
+      if bound is not None:
+        event.listen(bound, "handle_error", self._on_error)
+
+  def bind_for(self, use_async: bool) -> Engine:
+    return self.async_engine.sync_engine if use_async else self.engine
+
+  def _on_error(self, context) -> None:
+    # A dropped connection takes the replica out right away; the next health check decides when it returns.
+    if context.is_disconnect and self.healthy:
+      logger.warning("Read replica %s disconnected; routing reads to the primary", self.name)
+      self.healthy = False
+      REPLICA_HEALTHY.set(0, replica=self.name)
+
+
+class ReplicaSet:
+  """Read replicas in round-robin rotation; only replicas that passed their last health check are used."""
+
+  def __init__(self, replicas: list[Replica]) -> None:
+    self.replicas = replicas
+    self._turn = itertools.count()
+    self._lock = threading.Lock()
+
+  def pick(self) -> Replica | None:
+    healthy = [replica for replica in self.replicas if replica.healthy]
+    if not healthy:
+      return None
+    with self._lock:
+      turn = next(self._turn)
+    return healthy[turn % len(healthy)]
+
+  def check(self, max_lag_seconds: float) -> None:
+    for replica in self.replicas:
+      try:
+        with replica.engine.connect() as conn:
+          if replica.engine.dialect.name == "postgresql":
+            lag = float(conn.execute(_PG_LAG_SQL).scalar() or 0)
+          else:
+            conn.execute(text("SELECT 1"))
+            lag = 0.0
+      except Exception as exc:  # noqa: BLE001
+        self._set_health(replica, False, None, f"health check failed: {exc}")
+        continue
+      if lag > max_lag_seconds:
+        self._set_health(replica, False, lag, f"lag {lag:.1f}s exceeds {max_lag_seconds:.1f}s")
+      else:
+        self._set_health(replica, True, lag, "healthy")
+
+  def _set_health(self, replica: Replica, healthy: bool, lag: float | None, reason: str) -> None:
+    if healthy != replica.healthy:
+      log = logger.info if healthy else logger.warning
+      log("Read replica %s %s: %s", replica.name, "back in rotation" if healthy else "evicted", reason)
+    replica.healthy = healthy
+    replica.lag_seconds = lag
+    REPLICA_HEALTHY.set(1 if healthy else 0, replica=replica.name)
+    if lag is not None:
+      REPLICA_LAG.set(lag, replica=replica.name)
+
+
+class RoutingSession(Session):
+  """
+  Request session that sends plain SELECTs to a read replica and everything else to the primary:
+  writes, flushes, locking reads and anything inside a `transaction` block. Once a session has used
+  the primary it stays there, so a request reads its own writes.
+
+  The replica set comes from `info["replicas"]`; without it this is a plain primary-only Session.
+  """
+
+  def get_bind(self, mapper=None, clause=None, **kw):
+    replicas: ReplicaSet | None = self.info.get("replicas")
+    if replicas is None:
+      return super().get_bind(mapper, clause=clause, **kw)
+    if self.info.get("use_primary"):
+      ROUTES.inc(target="primary", reason="sticky")
+      return super().get_bind(mapper, clause=clause, **kw)
+    reason = self._primary_reason(clause)
+    if reason is None:
+      replica = replicas.pick()
+      if replica is not None:
+        ROUTES.inc(target="replica", reason="read")
+        return replica.bind_for(bool(self.info.get("async")))
+      reason = "no_replica"
+    else:
+      self.info["use_primary"] = True
+    ROUTES.inc(target="primary", reason=reason)
+    return super().get_bind(mapper, clause=clause, **kw)
+
+  def _primary_reason(self, clause) -> str | None:
+    if self._flushing:
+      return "flush"
+    if self.info.get("unit_of_work"):
+      return "transaction"
+    if not isinstance(clause, Select):
+      return "write"
+    if clause._for_update_arg is not None:
+      return "locking"
+    return None
+
+
+def use_primary(session) -> bool:
+  """Send the rest of this session's statements to the primary; False if it already reads from there."""
+  info = session.info
+  if info.get("replicas") is None or info.get("use_primary"):
+    return False
+  info["use_primary"] = True
+  return True
+
+
+class ReplicaMonitor(BackgroundWorker):
+  name = "replica-monitor"
+
+  def __init__(self, replicas: ReplicaSet, max_lag_seconds: float, poll_seconds: float) -> None:
+    super().__init__(poll_seconds)
+    self.replicas = replicas
+    self.max_lag_seconds = max_lag_seconds
+
+  def run_once(self) -> bool:
+    self.replicas.check(self.max_lag_seconds)
+    return False
+
@@ -1,7 +1,15 @@
+from contextlib import contextmanager
+from typing import Callable, Iterator, TypeVar
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings
+from app.core.tracing import trace_engine
+from app.db.pool import engine_options, instrument_pool
+from app.db.replicas import Replica, ReplicaMonitor, ReplicaSet, RoutingSession
 
 
 def _normalize_database_url(url: str) -> str:
@@ -12,28 +20,170 @@ def _normalize_database_url(url: str) -> str:
   return url
 
 
+def _create_engine(url: str, name: str):
+  """Sync engine with the DB_POOL_PROFILE pool settings, pool metrics and statement spans labelled `name`."""
+  created = create_engine(url, echo=False, future=True, **engine_options(url, name))
+  instrument_pool(created)
+  trace_engine(created, name)
+  return created
+
+
+def _create_async_engine(url: str, name: str):
+  async_url = _async_database_url(url)
+  created = create_async_engine(async_url, **engine_options(async_url, name, use_async=True))
+  instrument_pool(created)
+  trace_engine(created, name)
+  return created
+
+
 database_url = _normalize_database_url(settings.database_url)
-connect_args = {"check_same_thread": False} if database_url.startswith("sqlite") else {}
-engine = create_engine(
-  database_url,
-  echo=False,
-  future=True,
-  connect_args=connect_args,
-  pool_pre_ping=True,
-  pool_recycle=1800,
-)
+engine = _create_engine(database_url, "primary")
+# Primary only: background workers, the nonce manager and migrations read what they are about to write.
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, class_=Session)
 
+T = TypeVar("T")
+
+
+def _async_database_url(url: str) -> str:
+  # postgresql+psycopg already resolves to psycopg's async dialect under create_async_engine.
+  if url.startswith("sqlite:"):
+    return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+  return url
+
+
+# DB_ASYNC: request handlers talk to the database on the event loop instead of holding a threadpool
+# thread per request. Background workers and migrations keep using the sync engine either way.
+async_engine = _create_async_engine(database_url, "primary-async") if settings.db_async else None
+
+
+def _build_replica_set() -> ReplicaSet | None:
+  """DATABASE_REPLICA_URLS: request sessions send plain reads to healthy replicas (see RoutingSession)."""
+  if not settings.database_replica_urls:
+    return None
+  replicas = []
+  for index, url in enumerate(settings.database_replica_urls):
+    replica_url = _normalize_database_url(url)
+    name = f"replica-{index}"
+    async_replica = _create_async_engine(replica_url, f"{name}-async") if settings.db_async else None
+    replicas.append(Replica(url, _create_engine(replica_url, name), async_replica))
+  return ReplicaSet(replicas)
+
+
+replica_set = _build_replica_set()
+RequestSessionLocal = sessionmaker(
+  bind=engine, autocommit=False, autoflush=False, class_=RoutingSession, info={"replicas": replica_set}
+)
+AsyncSessionLocal = (
+  async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    info={"replicas": replica_set, "async": True},
+  )
+  if async_engine is not None
+  else None
+)
+
+
+@contextmanager
+def transaction(session: Session) -> Iterator[Session]:
+  """
+  Unit of work: crud helpers only flush, and the outermost `transaction` block commits once (or
+  rolls back on any exception). Nested blocks join the enclosing one.
+  """
+  if session.info.get("unit_of_work"):
+    yield session
+    return
+  session.info["unit_of_work"] = True
+  try:
+    yield session
+    session.commit()
+  except BaseException:
+    session.rollback()
+    session.info.pop("after_commit", None)
+    raise
+  finally:
+    session.info.pop("unit_of_work", None)
+  for callback in session.info.pop("after_commit", []):
+    callback()
+
+
+def on_commit(session: Session, callback: Callable[[], None]) -> None:
+  """Run `callback` once the enclosing `transaction` commits; dropped if it rolls back."""
+  session.info.setdefault("after_commit", []).append(callback)
+
 
 def init_db() -> None:
-  from app.db import models  # noqa: F401
+  """Bring the schema up to date (DB_AUTO_MIGRATE) or refuse to start on an un-migrated database."""
+  from app.db import migrate
 
-  models.Base.metadata.create_all(bind=engine)
+  if settings.db_auto_migrate:
+    migrate.upgrade(engine)
+  else:
+    migrate.check_schema(engine)
 
 
 def get_session():
-  session = SessionLocal()
+  session = RequestSessionLocal()
   try:
     yield session
   finally:
     session.close()
+
+
+async def get_db():
+  """Session for `async def` routes: an AsyncSession with DB_ASYNC, else a sync Session. Use it through `run_db`."""
+  if AsyncSessionLocal is not None:
+    async with AsyncSessionLocal() as session:
+      yield session
+    return
+  session = RequestSessionLocal()
+  try:
+    yield session
+  finally:
+    await run_in_threadpool(session.close)
+
+
+async def run_db(session: Session | AsyncSession, work: Callable[[Session], T]) -> T:
+  """
+  Run sync `work(session)` (services, crud, `transaction`) without blocking the event loop: on the
+  async driver through `AsyncSession.run_sync`, or in the threadpool for a sync Session. `work` must
+  only do database I/O and should return plain data, not lazy-loading ORM objects.
+  """
+  if isinstance(session, AsyncSession):
+    return await session.run_sync(work)
+  return await run_in_threadpool(work, session)
+
+
+async def run_in_session(work: Callable[[Session], T]) -> T:
+  """`run_db` on a session of its own, for code outside a request's dependency scope."""
+  if AsyncSessionLocal is not None:
+    async with AsyncSessionLocal() as session:
+      return await session.run_sync(work)
+
+  def call() -> T:
+    session = RequestSessionLocal()
+    try:
+      return work(session)
+    finally:
+      session.close()
+
+  return await run_in_threadpool(call)
+
+
+async def dispose_async_engine() -> None:
+  if async_engine is not None:
+    await async_engine.dispose()
+  for replica in replica_set.replicas if replica_set is not None else []:
+    if replica.async_engine is not None:
+      await replica.async_engine.dispose()
+
+
+def build_replica_monitor() -> ReplicaMonitor | None:
+  if replica_set is None:
+    return None
+  return ReplicaMonitor(
+    replica_set, settings.database_replica_max_lag_seconds, settings.database_replica_check_seconds
+  )
@@ -1,22 +1,56 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from app.core import metrics
+from app.core.background import worker_names
 from app.core.config import settings
-from app.db.session import init_db
-from app.routes import auth_wallet, issue, nft, verify
+from app.core.http_metrics import MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware, check_profile_workers
+from app.core.tracing import TracingMiddleware
+from app.db.session import build_replica_monitor, dispose_async_engine, init_db
+from app.routes import auth_wallet, issue, nft, profiles, qr, verify
+from app.services.indexer import build_indexer
+from app.services.login_nonce_store import build_login_nonce_sweeper
+from app.services.mint_worker import build_mint_worker
+from app.services.onchain import build_gas_oracle
+from app.services.pin_worker import build_pin_worker
+from app.services.pinata_service import close_http_client
+from app.services.qr_service import shutdown_qr_pool, warm_qr_pool
+from app.services.session_sweeper import build_session_sweeper
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-  async def dispatch(self, request: Request, call_next: RequestResponseEndpoint):
-    response = await call_next(request)
-    return response
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+  builders = (
+    build_replica_monitor,
+    build_login_nonce_sweeper,
+    build_session_sweeper,
+    build_gas_oracle,
+    build_indexer,
+    build_pin_worker,
+    build_mint_worker,
+  )
+  check_profile_workers(worker_names)
+  workers = [worker for worker in (build() for build in builders) if worker is not None]
+  for worker in workers:
+    worker.start()
+  warm_qr_pool()
+  try:
+    yield
+  finally:
+    for worker in workers:
+      worker.stop()
+    close_http_client()
+    await dispose_async_engine()
+    shutdown_qr_pool()
 
 
 def create_app() -> FastAPI:
   init_db()
-  app = FastAPI(title=settings.app_name, version="2.0.0")
+  app = FastAPI(title=settings.app_name, version="2.0.0", lifespan=lifespan)
   app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins,
@@ -24,7 +58,11 @@ def create_app() -> FastAPI:
     allow_methods=["*"],
     allow_headers=["*"],
   )
-  app.add_middleware(LoggingMiddleware)
+  app.add_middleware(MetricsMiddleware)
+  if settings.tracing_enabled:
+    app.add_middleware(TracingMiddleware)
+  if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
 
   @app.exception_handler(Exception)
   async def handle_exceptions(_: Request, exc: Exception):
@@ -32,13 +70,22 @@ def create_app() -> FastAPI:
 
   app.include_router(auth_wallet.router, prefix="/auth", tags=["auth"])
   app.include_router(issue.router, tags=["issue"])
+  app.include_router(qr.router, tags=["qr"])
   app.include_router(verify.router, tags=["verify"])
   app.include_router(nft.router, prefix="/nft", tags=["nft"])
+  if settings.profiling_enabled:
+    app.include_router(profiles.router, prefix="/admin", tags=["admin"])
 
   @app.get("/ping")
   async def ping():
     return {"pong": True}
 
+  if settings.metrics_enabled:
+
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+      return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
   return app
 
 
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 
-from app.db.session import get_session
+from app.db.session import get_db, run_db
 from app.services.auth_service import AuthService
 
 router = APIRouter()
@@ -21,16 +21,14 @@ class WalletVerify(BaseModel):
 
 
 @router.post("/wallet/request")
-def request_nonce(payload: WalletRequest, session=Depends(get_session)):
-  service = AuthService(session)
-  nonce = service.issue_nonce(payload.walletAddress)
+async def request_nonce(payload: WalletRequest, session=Depends(get_db)):
+  nonce = await run_db(session, lambda db: AuthService(db).issue_nonce(payload.walletAddress))
   return {"wallet": payload.walletAddress.lower(), "nonce": nonce}
 
 
 @router.post("/wallet/verify")
-def verify_signature(payload: WalletVerify, session=Depends(get_session)):
-  service = AuthService(session)
-  token = service.verify_signature(payload.walletAddress, payload.signature)
+async def verify_signature(payload: WalletVerify, session=Depends(get_db)):
+  token = await run_db(session, lambda db: AuthService(db).verify_signature(payload.walletAddress, payload.signature))
   return {
     "access_token": token,
     "did": f"did:ethr:{payload.walletAddress.lower()}",
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
 from pydantic import BaseModel, Field
 
-from app.db.session import get_session
+from app.db.session import get_db
 from app.services.issue_service import IssueService
 
 router = APIRouter()
@@ -17,7 +17,16 @@ class IssueRequest(BaseModel):
 
 
 @router.post("/issue")
-def issue_qr(payload: IssueRequest, session=Depends(get_session)):
+async def issue_qr(
+  payload: IssueRequest,
+  request: Request,
+  qr: str = Query(default="png", pattern="^(png|svg|url)$"),
+  session=Depends(get_db),
+):
   service = IssueService(session)
-  response = service.issue(payload.model_dump(by_alias=True))
+  response = await service.issue_async(
+    payload.model_dump(by_alias=True),
+    qr_mode=qr,
+    qr_url_for=lambda short_token: str(request.url_for("get_qr_image", short_token=short_token)),
+  )
   return response
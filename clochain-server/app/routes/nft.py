@@ -1,8 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 from pydantic import AliasChoices, BaseModel, Field
 
 from app.core.security import get_current_wallet
-from app.db.session import get_session
+from app.db import crud
+from app.db.session import get_db, get_session, run_db, run_in_session
+from app.services.mint_worker import notify_mint_worker, pipeline_metrics
 from app.services.nft_service import NFTService
 
 router = APIRouter()
@@ -68,6 +74,45 @@ class RegisterResponse(BaseModel):
   blockNumber: int | None = Field(default=None, validation_alias=AliasChoices("blockNumber", "block_number"))
 
 
+class MintJobResponse(BaseModel):
+  jobId: str
+  status: str
+  tokenId: str | None = None
+  cid: str | None = None
+  txHash: str | None = None
+  blockNumber: int | None = None
+  error: str | None = None
+
+
+class MetadataPinResponse(BaseModel):
+  cid: str
+  status: str
+  pinnedCid: str | None = None
+  attempts: int
+  lastError: str | None = None
+  updatedAt: str | None = None
+
+
+TERMINAL_JOB_STATUSES = {"confirmed", "failed"}
+
+
+def _job_response(job) -> MintJobResponse:
+  return MintJobResponse(
+    jobId=job.job_id,
+    status=job.status,
+    tokenId=job.token_id,
+    cid=job.cid,
+    txHash=job.tx_hash,
+    blockNumber=job.block_number,
+    error=job.error,
+  )
+
+
+def _load_job(session, job_id: str, wallet: str) -> MintJobResponse:
+  return _job_response(NFTService(session).get_mint_job(job_id, wallet))
+
+
+# /me and /register call the chain (and IPFS gateways) synchronously, so they stay threadpool handlers.
 @router.get("/me", response_model=list[NFTItemResponse])
 def my_nfts(wallet: str = Depends(get_current_wallet), session=Depends(get_session)):
   service = NFTService(session)
@@ -75,45 +120,54 @@ def my_nfts(wallet: str = Depends(get_current_wallet), session=Depends(get_sessi
 
 
 @router.post("/metadata", response_model=MetadataResponse)
-def build_metadata(payload: MetadataRequest, session=Depends(get_session)):
-  service = NFTService(session)
-  cid, metadata, qr_payload = service.create_metadata(payload.short_token)
+async def build_metadata(payload: MetadataRequest, session=Depends(get_db)):
+  cid, metadata, qr_payload = await run_db(session, lambda db: NFTService(db).create_metadata(payload.short_token))
   return MetadataResponse(cid=cid, metadata=metadata, payload=qr_payload)
 
 
 @router.post("/record", response_model=RecordResponse)
-def record_nft_registration(
+async def record_nft_registration(
   payload: RecordRequest,
   wallet: str = Depends(get_current_wallet),
-  session=Depends(get_session),
+  session=Depends(get_db),
 ):
-  service = NFTService(session)
   if wallet.lower() != payload.walletAddress.lower():
     raise HTTPException(status_code=403, detail="Wallet mismatch")
-  record = service.record_nft(payload.tokenId, payload.walletAddress, payload.cid, payload.payload)
+  record = await run_db(
+    session, lambda db: NFTService(db).record_nft(payload.tokenId, payload.walletAddress, payload.cid, payload.payload)
+  )
   return RecordResponse(ok=True, tokenId=record["tokenId"], walletAddress=record["wallet"], cid=record["cid"])
 
 
 @router.post("/record-transfer", response_model=TransferRecordResponse)
-def record_transfer_event(
+async def record_transfer_event(
   payload: TransferRecordRequest,
   wallet: str = Depends(get_current_wallet),
-  session=Depends(get_session),
+  session=Depends(get_db),
 ):
   if wallet.lower() != payload.fromWallet.lower():
     raise HTTPException(status_code=403, detail="Wallet mismatch")
-  service = NFTService(session)
-  service.record_transfer(payload.tokenId, payload.fromWallet, payload.toWallet, payload.txHash, payload.blockNumber)
+  await run_db(
+    session,
+    lambda db: NFTService(db).record_transfer(
+      payload.tokenId, payload.fromWallet, payload.toWallet, payload.txHash, payload.blockNumber
+    ),
+  )
   return TransferRecordResponse(ok=True, txHash=payload.txHash)
 
 
-@router.post("/register", response_model=RegisterResponse)
+@router.post("/register", response_model=RegisterResponse, responses={202: {"model": MintJobResponse}})
 def register_nft(
   payload: RegisterRequest,
+  async_mode: bool = Query(default=False, alias="async"),
   wallet: str = Depends(get_current_wallet),
   session=Depends(get_session),
 ):
   service = NFTService(session)
+  if async_mode:
+    job = service.enqueue_registration(payload.short_token, wallet)
+    notify_mint_worker()
+    return JSONResponse(status_code=202, content=_job_response(job).model_dump())
   result = service.register_nft(payload.short_token, wallet)
   return RegisterResponse(
     ok=True,
@@ -123,3 +177,42 @@ def register_nft(
     txHash=result.get("txHash"),
     blockNumber=result.get("blockNumber"),
   )
+
+
+@router.get("/mint-pipeline/metrics")
+def mint_pipeline_metrics(wallet: str = Depends(get_current_wallet)):
+  return pipeline_metrics()
+
+
+@router.get("/pins/{cid}", response_model=MetadataPinResponse)
+async def get_metadata_pin(cid: str, session=Depends(get_db)):
+  pin = await run_db(session, lambda db: crud.get_metadata_pin(db, cid))
+  if not pin:
+    raise HTTPException(status_code=404, detail="Pin not found")
+  return MetadataPinResponse(
+    cid=pin.cid,
+    status=pin.status,
+    pinnedCid=pin.pinned_cid,
+    attempts=pin.attempts,
+    lastError=pin.last_error,
+    updatedAt=pin.updated_at.isoformat() if pin.updated_at else None,
+  )
+
+
+@router.get("/jobs/{job_id}", response_model=MintJobResponse)
+async def get_mint_job(
+  job_id: str,
+  wait: float = Query(default=0, ge=0, le=30),
+  wallet: str = Depends(get_current_wallet),
+):
+  # Long-poll: hold the request (without a worker thread) until the status changes or `wait` elapses.
+  deadline = time.monotonic() + wait
+  job = await run_in_session(lambda session: _load_job(session, job_id, wallet))
+  initial_status = job.status
+  while job.status == initial_status and job.status not in TERMINAL_JOB_STATUSES:
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+      break
+    await asyncio.sleep(min(0.5, remaining))
+    job = await run_in_session(lambda session: _load_job(session, job_id, wallet))
+  return job
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+
+from app.core.profiling import PROFILE_HEADER, profile_path, verify_profile_signature
+
+router = APIRouter()
+
+
+@router.get("/profiles/{profile_id}", include_in_schema=False)
+def get_profile(profile_id: str, request: Request):
+  # Signed like a profiled request: the header must cover this GET, path and X-Request-ID.
+  signature = request.headers.get(PROFILE_HEADER)
+  request_id = request.headers.get("x-request-id", "")
+  if not verify_profile_signature(signature, "GET", request.url.path, request.url.query, request_id):
+    raise HTTPException(status_code=403, detail="Invalid profiling signature")
+  path = profile_path(profile_id)
+  if path is None or not path.is_file():
+    raise HTTPException(status_code=404, detail="Profile not found")
+  return FileResponse(path, media_type="application/json", filename=path.name)
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
+
+from app.db import crud
+from app.db.replicas import use_primary
+from app.db.session import run_in_session
+from app.services.qr_service import DEFAULT_BOX_SIZE, QR_FORMATS, get_qr_async, qr_cache
+
+router = APIRouter()
+
+
+def _is_issued(session, short_token: str) -> bool:
+  if crud.get_issue_by_token(session, short_token) is not None:
+    return True
+  # A token issued a moment ago may not have reached the read replica yet.
+  return use_primary(session) and crud.get_issue_by_token(session, short_token) is not None
+
+
+@router.get("/qr/{short_token}", name="get_qr_image")
+async def get_qr_image(
+  short_token: str,
+  size: int = Query(default=DEFAULT_BOX_SIZE, ge=1, le=40),
+  fmt: str = Query(default="png", alias="format", pattern="^(png|svg)$"),
+):
+  # Only issued tokens are rendered, so the cache cannot be filled with arbitrary payloads.
+  if qr_cache.get((short_token, fmt, size)) is None:
+    if not await run_in_session(lambda session: _is_issued(session, short_token)):
+      raise HTTPException(status_code=404, detail="Issue not found")
+  image = await get_qr_async(short_token, fmt, size)
+  # The image is a pure function of the token, which never changes.
+  return Response(
+    content=image,
+    media_type=QR_FORMATS[fmt],
+    headers={"Cache-Control": "public, max-age=31536000, immutable"},
+  )
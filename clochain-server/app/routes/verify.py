@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import json
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
-from app.db.session import get_session
-from app.services.verify_service import VerifyService
+from app.core.config import settings
+from app.core.rate_limit import TokenBucketLimiter, client_key
+from app.db.session import get_db, run_db, run_in_session
+from app.services.verify_service import BATCH_CHUNK_SIZE, VerifyService
 
 router = APIRouter()
 
+batch_limiter = TokenBucketLimiter(settings.verify_batch_rate_per_second, settings.verify_batch_burst)
+
 
 class VerifyResponse(BaseModel):
   ok: bool
@@ -14,12 +22,20 @@ class VerifyResponse(BaseModel):
   signature: str | None = None
 
 
+class VerifyDetailsResponse(VerifyResponse):
+  registered: bool
+  tokenId: str | None = None
+  owner: str | None = None
+  transferCount: int = 0
+
+
 @router.get("/verify", response_model=VerifyResponse)
-def verify_short_token(
+async def verify_short_token(
   q: str | None = Query(default=None, alias="q"),
   token: str | None = Query(default=None),
   sig: str | None = Query(default=None),
-  session=Depends(get_session),
+  details: bool = Query(default=False),
+  session=Depends(get_db),
 ):
   short_token = q or token
   if not short_token:
@@ -32,4 +48,61 @@ def verify_short_token(
     return VerifyResponse(ok=False, reason=reason)
   if sig and signature and sig != signature:
     return VerifyResponse(ok=False, reason="Signature mismatch")
+  if details:
+    # Opt-in extra fields; the default response keeps its original shape.
+    ownership = await run_db(session, lambda db: VerifyService(db).ownership(payload))
+    return JSONResponse(VerifyDetailsResponse(ok=True, payload=payload, signature=signature, **ownership).model_dump())
   return VerifyResponse(ok=True, payload=payload, signature=signature)
+
+
+def _parse_batch_body(body: bytes, content_type: str) -> list[str]:
+  """Tokens from a JSON array or from NDJSON (one JSON string, {"token": ...} or bare token per line)."""
+  if "ndjson" in content_type or "jsonlines" in content_type:
+    items = []
+    for line in body.decode().splitlines():
+      line = line.strip()
+      if not line:
+        continue
+      try:
+        items.append(json.loads(line))
+      except ValueError:
+        items.append(line)
+  else:
+    try:
+      items = json.loads(body or b"[]")
+    except ValueError as exc:
+      raise HTTPException(status_code=400, detail="Body must be a JSON array of tokens") from exc
+    if isinstance(items, dict):
+      items = items.get("tokens")
+    if not isinstance(items, list):
+      raise HTTPException(status_code=400, detail="Body must be a JSON array of tokens")
+
+  tokens = []
+  for item in items:
+    token = (item.get("token") or item.get("q")) if isinstance(item, dict) else item
+    if not isinstance(token, str) or not token:
+      raise HTTPException(status_code=400, detail="Every entry must be a short token string")
+    tokens.append(token)
+  return tokens
+
+
+async def _stream_batch(tokens: list[str]) -> AsyncIterator[bytes]:
+  # Runs after the request scope, so each chunk gets a session of its own instead of the request's.
+  for start in range(0, len(tokens), BATCH_CHUNK_SIZE):
+    chunk = tokens[start : start + BATCH_CHUNK_SIZE]
+    results = await run_in_session(lambda session: list(VerifyService(session).verify_many(chunk)))
+    lines = []
+    for result in results:
+      result["index"] += start
+      lines.append(json.dumps(result, separators=(",", ":"), ensure_ascii=False) + "\n")
+    yield "".join(lines).encode()
+
+
+@router.post("/verify/batch")
+async def verify_short_tokens_batch(request: Request):
+  body = await request.body()
+  tokens = _parse_batch_body(body, request.headers.get("content-type", ""))
+  if len(tokens) > settings.verify_batch_max_tokens:
+    raise HTTPException(status_code=413, detail=f"At most {settings.verify_batch_max_tokens} tokens per batch")
+  batch_limiter.enforce(client_key(request), cost=max(1, len(tokens)))
+  return StreamingResponse(_stream_batch(tokens), media_type="application/x-ndjson")
@@ -5,28 +5,30 @@ from eth_account import Account
 from eth_account.messages import encode_defunct
 from fastapi import HTTPException, status
 
-from app.core.security import create_wallet_token, decode_token
+from app.core.config import settings
+from app.core.security import issue_wallet_token
 from app.db import crud
+from app.db.session import transaction
+from app.services.login_nonce_store import get_login_nonce_store
 
 
 class AuthService:
-  _nonce_store: dict[str, tuple[str, datetime]] = {}
-  _ttl_minutes = 10
-
   def __init__(self, session):
     self.session = session
+    self.nonce_store = get_login_nonce_store()
 
   def issue_nonce(self, wallet_address: str) -> str:
     wallet = wallet_address.lower()
     nonce = secrets.token_hex(16)
-    expires = datetime.now(timezone.utc) + timedelta(minutes=self._ttl_minutes)
-    self._nonce_store[wallet] = (nonce, expires)
-    crud.ensure_user(self.session, wallet)
+    expires = datetime.now(timezone.utc) + timedelta(seconds=settings.login_nonce_ttl_seconds)
+    with transaction(self.session):
+      self.nonce_store.put(wallet, nonce, expires, self.session)
+      crud.ensure_user(self.session, wallet)
     return nonce
 
   def verify_signature(self, wallet_address: str, signature: str) -> str:
     wallet = wallet_address.lower()
-    record = self._nonce_store.get(wallet)
+    record = self.nonce_store.get(wallet, self.session)
     if not record:
       raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nonce not issued")
     nonce, expires = record
@@ -37,12 +39,11 @@ class AuthService:
     recovered = Account.recover_message(message, signature=signature)
     if recovered.lower() != wallet:
       raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Signature mismatch")
+    if not self.nonce_store.consume(wallet, nonce, self.session):
+      # Redeemed by a concurrent request (possibly on another worker) or replaced by a newer nonce.
+      raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nonce not issued")
 
-    token = create_wallet_token(wallet)
-    claims = decode_token(token)
-    exp_ts = claims.get("exp")
-    if isinstance(exp_ts, (int, float)):
-      expires_at = datetime.fromtimestamp(exp_ts, tz=timezone.utc)
-      crud.store_session(self.session, token, wallet, expires_at)
-    del self._nonce_store[wallet]
+    token, expires_at = issue_wallet_token(wallet)
+    with transaction(self.session):
+      crud.store_session(self.session, token, wallet, expires_at.replace(tzinfo=None))
     return token
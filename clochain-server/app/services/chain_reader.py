@@ -0,0 +1,155 @@
+import logging
+from typing import Any, Sequence
+
+from eth_utils.abi import function_abi_to_4byte_selector, get_abi_input_types, get_abi_output_types
+from web3 import Web3
+from web3.contract.contract import ContractFunction
+from web3.exceptions import Web3Exception
+
+logger = logging.getLogger(__name__)
+
+MULTICALL3_ABI = [
+  {
+    "inputs": [
+      {
+        "components": [
+          {"internalType": "address", "name": "target", "type": "address"},
+          {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+          {"internalType": "bytes", "name": "callData", "type": "bytes"},
+        ],
+        "internalType": "struct Multicall3.Call3[]",
+        "name": "calls",
+        "type": "tuple[]",
+      }
+    ],
+    "name": "aggregate3",
+    "outputs": [
+      {
+        "components": [
+          {"internalType": "bool", "name": "success", "type": "bool"},
+          {"internalType": "bytes", "name": "returnData", "type": "bytes"},
+        ],
+        "internalType": "struct Multicall3.Result[]",
+        "name": "returnData",
+        "type": "tuple[]",
+      }
+    ],
+    "stateMutability": "payable",
+    "type": "function",
+  }
+]
+
+READ_MODES = ("multicall", "batch", "single")
+
+
+class ChainReader:
+  """
+  Groups read-only contract calls into as few round trips as possible.
+
+  `multicall` packs a chunk into one Multicall3 `aggregate3` eth_call, `batch` sends a chunk as one
+  JSON-RPC batch, `single` issues one request per call. When a mode is rejected by the provider
+  (no Multicall3 deployment, batching disabled, ...) the reader falls through to the next mode and
+  remembers that for subsequent reads. Failed calls (e.g. reverts) yield None instead of raising.
+  """
+
+  def __init__(self, w3: Web3, mode: str = "multicall", batch_size: int = 100, multicall_address: str = "") -> None:
+    if mode not in READ_MODES:
+      raise ValueError(f"Unsupported RPC read mode: {mode}")
+    self.w3 = w3
+    self.batch_size = max(1, batch_size)
+    self._modes = list(READ_MODES[READ_MODES.index(mode) :])
+    self._multicall = None
+    if multicall_address:
+      self._multicall = w3.eth.contract(address=Web3.to_checksum_address(multicall_address), abi=MULTICALL3_ABI)
+    elif "multicall" in self._modes:
+      self._modes.remove("multicall")
+
+  def call_many(self, calls: Sequence[ContractFunction]) -> list[Any | None]:
+    results: list[Any | None] = []
+    for start in range(0, len(calls), self.batch_size):
+      results.extend(self._call_chunk(calls[start : start + self.batch_size]))
+    return results
+
+  def rpc_many(self, requests: Sequence[tuple[str, list]]) -> list[Any | None]:
+    """Send raw JSON-RPC requests as one batch, falling back to one request each."""
+    if not requests:
+      return []
+    if "batch" in self._modes:
+      try:
+        return self._send_batch(requests)
+      except (Web3Exception, ValueError, OSError) as exc:
+        self._disable("batch", exc)
+    return [self._send_single(method, params) for method, params in requests]
+
+  def _call_chunk(self, chunk: Sequence[ContractFunction]) -> list[Any | None]:
+    if not chunk:
+      return []
+    if "multicall" in self._modes:
+      try:
+        return self._call_multicall(chunk)
+      except (Web3Exception, ValueError, OSError) as exc:
+        self._disable("multicall", exc)
+    if "batch" in self._modes:
+      try:
+        raw = self._send_batch([("eth_call", [self._to_call(fn), "latest"]) for fn in chunk])
+        return [self._decode(fn, data) for fn, data in zip(chunk, raw)]
+      except (Web3Exception, ValueError, OSError) as exc:
+        self._disable("batch", exc)
+    return [self._call_single(fn) for fn in chunk]
+
+  def _call_multicall(self, chunk: Sequence[ContractFunction]) -> list[Any | None]:
+    payload = [(fn.address, True, self._calldata(fn)) for fn in chunk]
+    responses = self._multicall.functions.aggregate3(payload).call()
+    if len(responses) != len(chunk):
+      raise ValueError("Multicall3 returned an unexpected number of results")
+    return [self._decode(fn, data if success else None) for fn, (success, data) in zip(chunk, responses)]
+
+  def _send_batch(self, requests: Sequence[tuple[str, list]]) -> list[Any | None]:
+    responses = self.w3.provider.make_batch_request(list(requests))
+    if not isinstance(responses, list):
+      error = responses.get("error") if isinstance(responses, dict) else responses
+      raise ValueError(f"JSON-RPC batch rejected: {error}")
+    if len(responses) != len(requests):
+      raise ValueError("JSON-RPC batch returned an unexpected number of responses")
+    return [response.get("result") if "error" not in response else None for response in responses]
+
+  def _send_single(self, method: str, params: list) -> Any | None:
+    try:
+      response = self.w3.provider.make_request(method, params)
+    except (Web3Exception, ValueError, OSError):
+      return None
+    return response.get("result") if "error" not in response else None
+
+  def _call_single(self, fn: ContractFunction) -> Any | None:
+    try:
+      return fn.call()
+    except (Web3Exception, ValueError):
+      return None
+
+  def _to_call(self, fn: ContractFunction) -> dict:
+    return {"to": fn.address, "data": self._calldata(fn)}
+
+  def _calldata(self, fn: ContractFunction) -> str:
+    # Selector + ABI-encoded positional arguments, built from the public ABI and codec APIs.
+    selector = function_abi_to_4byte_selector(fn.abi)
+    return Web3.to_hex(selector + self.w3.codec.encode(get_abi_input_types(fn.abi), fn.args))
+
+  def _decode(self, fn: ContractFunction, data: Any) -> Any | None:
+    if data is None:
+      return None
+    raw = Web3.to_bytes(hexstr=data) if isinstance(data, str) else bytes(data)
+    if not raw:
+      return None
+    try:
+      values = self.w3.codec.decode(get_abi_output_types(fn.abi), raw)
+    except Exception:  # noqa: BLE001
+      return None
+    return values[0] if len(values) == 1 else values
+
+  def _disable(self, mode: str, exc: Exception) -> None:
+    if isinstance(exc, OSError):
+      # Transport failures are not a verdict on the mode; only this chunk falls back.
+      return
+    if mode in self._modes and len(self._modes) > 1:
+      self._modes.remove(mode)
+      logger.warning("RPC read mode %s disabled, falling back to %s: %s", mode, self._modes[0], exc)
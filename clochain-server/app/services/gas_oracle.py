@@ -0,0 +1,90 @@
+import threading
+import time
+from typing import Callable
+
+from app.core.background import BackgroundWorker
+from app.services.chain_reader import ChainReader
+
+
+class GasOracle(BackgroundWorker):
+  """
+  Keeps a fee quote for the mint path fresh in the background.
+
+  On EIP-1559 chains the quote is `maxFeePerGas = base fee * multiplier + tip` with the tip from
+  `eth_maxPriorityFeePerGas`; otherwise it is the legacy `gasPrice`. Both values are fetched in one
+  JSON-RPC batch. Callers read the cached quote and only block when no quote exists yet (cold start)
+  or when the refresher is not running and the quote has expired.
+
+  Gas limits for `mintAuthenticityToken` are calibrated once per tokenURI length bucket (one ABI word
+  per bucket): the first mint in a bucket pays for `estimate_gas`, later ones reuse it with a margin.
+  """
+
+  name = "gas-oracle"
+  fallback_gas_limit = 500_000
+
+  def __init__(
+    self,
+    reader: ChainReader,
+    ttl_seconds: float = 10,
+    base_fee_multiplier: float = 2,
+    gas_limit_margin: float = 1.25,
+  ) -> None:
+    super().__init__(max(1.0, ttl_seconds / 2))
+    self.reader = reader
+    self.ttl_seconds = ttl_seconds
+    self.base_fee_multiplier = base_fee_multiplier
+    self.gas_limit_margin = gas_limit_margin
+    self._lock = threading.Lock()
+    self._fees: dict[str, int] | None = None
+    self._fetched_at = 0.0
+    self._gas_limits: dict[int, int] = {}
+
+  def run_once(self) -> bool:
+    self.refresh()
+    return False
+
+  def refresh(self) -> dict[str, int]:
+    block, priority_fee = self.reader.rpc_many(
+      [("eth_getBlockByNumber", ["latest", False]), ("eth_maxPriorityFeePerGas", [])]
+    )
+    base_fee = (block or {}).get("baseFeePerGas")
+    if base_fee is not None and priority_fee is not None:
+      tip = int(priority_fee, 16)
+      fees = {
+        "maxFeePerGas": int(int(base_fee, 16) * self.base_fee_multiplier) + tip,
+        "maxPriorityFeePerGas": tip,
+      }
+    else:
+      (gas_price,) = self.reader.rpc_many([("eth_gasPrice", [])])
+      if gas_price is None:
+        raise ValueError("Unable to fetch gas price")
+      fees = {"gasPrice": int(gas_price, 16)}
+    with self._lock:
+      self._fees = fees
+      self._fetched_at = time.monotonic()
+    return fees
+
+  def fee_fields(self) -> dict[str, int]:
+    """Transaction fee fields (`gasPrice` or the EIP-1559 pair) from the cached quote."""
+    with self._lock:
+      fees = self._fees
+      stale = time.monotonic() - self._fetched_at > self.ttl_seconds
+    refresher_alive = self._thread is not None and self._thread.is_alive()
+    if fees is None or (stale and not refresher_alive):
+      return self.refresh()
+    return dict(fees)
+
+  def gas_limit(self, token_uri: str, estimate: Callable[[], int | None]) -> int:
+    bucket = len(token_uri.encode()) // 32
+    with self._lock:
+      cached = self._gas_limits.get(bucket)
+    if cached is not None:
+      return cached
+    estimated = estimate()
+    if estimated is None:
+      # Estimation is unavailable right now; use the conservative default without caching it.
+      return self.fallback_gas_limit
+    limit = int(estimated * self.gas_limit_margin)
+    with self._lock:
+      self._gas_limits[bucket] = max(limit, self._gas_limits.get(bucket, 0))
+      return self._gas_limits[bucket]
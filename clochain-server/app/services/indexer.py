@@ -0,0 +1,100 @@
+import logging
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from web3.exceptions import Web3Exception
+
+from app.core.background import BackgroundWorker
+from app.core.config import settings
+from app.db import crud
+from app.db.session import SessionLocal, transaction
+from app.services.onchain import fetch_contract_events, get_block_number
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NAME = "clochain-authenticity"
+
+
+class TransferIndexer(BackgroundWorker):
+  """
+  Follows Transfer/AuthenticityMinted logs of the authenticity contract into `indexed_tokens`.
+
+  Only blocks at least `confirmations` deep are indexed, so a reorg above that depth never
+  touches the table. While the cursor is more than one window behind the safe head the worker
+  re-runs immediately (catch-up mode) instead of sleeping between windows.
+  """
+
+  name = "transfer-indexer"
+
+  def __init__(
+    self,
+    session_factory=SessionLocal,
+    start_block: int | None = None,
+    confirmations: int | None = None,
+    batch_blocks: int | None = None,
+    poll_seconds: float | None = None,
+  ) -> None:
+    super().__init__(poll_seconds if poll_seconds is not None else settings.indexer_poll_seconds)
+    self.session_factory = session_factory
+    self.start_block = start_block if start_block is not None else settings.indexer_start_block
+    self.confirmations = confirmations if confirmations is not None else settings.indexer_confirmations
+    self.batch_blocks = max(1, batch_blocks or settings.indexer_batch_blocks)
+    self._window = self.batch_blocks
+
+  def run_once(self) -> bool:
+    head = get_block_number()
+    safe_head = head - self.confirmations
+    session = self.session_factory()
+    try:
+      cursor = crud.get_indexer_cursor(session, CURSOR_NAME)
+      from_block = cursor.block_number + 1 if cursor else self.start_block
+      if from_block > safe_head:
+        if cursor:  # heartbeat so readers can tell an idle chain from a dead indexer
+          with transaction(session):
+            crud.apply_indexed_events(session, CURSOR_NAME, [], cursor.block_number, head, True)
+        return False
+
+      to_block = min(safe_head, from_block + self._window - 1)
+      try:
+        events = fetch_contract_events(from_block, to_block)
+      except (Web3Exception, ValueError) as exc:
+        # Providers cap the block range / result size of eth_getLogs; shrink and retry next round.
+        if self._window == 1:
+          raise
+        self._window = max(1, self._window // 2)
+        logger.warning("eth_getLogs %s-%s failed (%s); window -> %s", from_block, to_block, exc, self._window)
+        return True
+
+      caught_up = safe_head - to_block < self.batch_blocks
+      with transaction(session):
+        crud.apply_indexed_events(session, CURSOR_NAME, events, to_block, head, caught_up)
+      self._window = min(self.batch_blocks, self._window * 2)
+      return to_block < safe_head
+    finally:
+      session.close()
+
+
+def is_index_ready(session) -> bool:
+  if not settings.indexer_enabled:
+    return False
+  cursor = crud.get_indexer_cursor(session, CURSOR_NAME)
+  if not cursor or not cursor.caught_up:
+    return False
+  max_age = timedelta(seconds=settings.indexer_max_staleness_seconds)
+  return datetime.utcnow() - cursor.updated_at <= max_age
+
+
+def fetch_wallet_tokens_indexed(session, wallet_address: str) -> list[dict]:
+  tokens = crud.list_indexed_tokens_by_owner(session, wallet_address)
+  return [{"tokenId": token.token_id, "tokenURI": token.token_uri} for token in tokens]
+
+
+def build_indexer() -> TransferIndexer | None:
+  if not settings.indexer_enabled:
+    return None
+  try:
+    get_block_number()
+  except HTTPException as exc:
+    logger.warning("Transfer indexer disabled: %s", exc.detail)
+    return None
+  return TransferIndexer()
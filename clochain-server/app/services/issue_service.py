@@ -1,19 +1,35 @@
-import base64
-import io
 from datetime import datetime, timezone
-
-import qrcode
+from typing import Callable
 
 from app.core.did import to_did
 from app.core.hmac_utils import encode_short_token, random_nonce, sign_payload
 from app.db import crud
+from app.db.session import run_db, transaction
+from app.services.qr_service import data_uri, get_qr_async, prerender_qr
 
 
 class IssueService:
   def __init__(self, session):
     self.session = session
 
-  def issue(self, request_data: dict) -> dict:
+  async def issue_async(
+    self, request_data: dict, qr_mode: str = "png", qr_url_for: Callable[[str], str] | None = None
+  ) -> dict:
+    """
+    Create an issue; `self.session` may be an AsyncSession. `qr_mode` picks the QR image returned in
+    `qr_base64`: a PNG or SVG data URI rendered in the QR process pool, or none ("url"), in which case
+    the image is pre-rendered into the cache for the `qr_url` (`GET /qr/{short_token}`) the caller fetches.
+    """
+    short_token, payload, signature = await run_db(
+      self.session, lambda session: IssueService(session).create(request_data)
+    )
+    image = None
+    if not _wants_url(qr_mode, qr_url_for):
+      image = await get_qr_async(short_token, _image_format(qr_mode))
+    return _issue_response(short_token, payload, signature, qr_mode, qr_url_for, image)
+
+  def create(self, request_data: dict) -> tuple[str, dict, str]:
+    """Sign a new payload and store the issue; returns (short_token, payload, signature)."""
     owner_wallet = request_data["ownerWallet"]
     payload = {
       "brand": request_data["brand"],
@@ -21,26 +37,44 @@ class IssueService:
       "purchaseAt": request_data["purchaseAt"],
       "did": to_did(owner_wallet),
       "nonce": random_nonce(),
-      "issuedAt": datetime.now(timezone.utc).isoformat(),
+      # Whole seconds, so the compact short_token can carry it as an epoch-second integer.
+      "issuedAt": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
     }
     signature = sign_payload(payload)
     short_token = encode_short_token(payload, signature)
-    crud.create_issue(self.session, short_token, payload, signature)
-    qr_base64 = self._build_qr(short_token)
-    return {
-      "short_token": short_token,
-      "qr_base64": qr_base64,
-      "payload": payload,
-      "signature": signature,
-    }
+    with transaction(self.session):
+      crud.create_issue(self.session, short_token, payload, signature)
+    return short_token, payload, signature
+
+
+def _wants_url(qr_mode: str, qr_url_for: Callable[[str], str] | None) -> bool:
+  return qr_mode == "url" and qr_url_for is not None
+
+
+def _image_format(qr_mode: str) -> str:
+  return "svg" if qr_mode == "svg" else "png"
+
 
-  def _build_qr(self, short_token: str) -> str:
-    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M)
-    verify_url = f"https://clochain-shop.vercel.app/shop/verify?q={short_token}"
-    qr.add_data(verify_url)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG")
-    encoded = base64.b64encode(buffer.getvalue()).decode()
-    return f"data:image/png;base64,{encoded}"
+def _issue_response(
+  short_token: str,
+  payload: dict,
+  signature: str,
+  qr_mode: str,
+  qr_url_for: Callable[[str], str] | None,
+  image: bytes | None,
+) -> dict:
+  qr_url = qr_url_for(short_token) if qr_url_for else None
+  if image is None:
+    prerender_qr(short_token)
+    qr_base64 = None
+  else:
+    qr_base64 = data_uri(image, _image_format(qr_mode))
+  response = {
+    "short_token": short_token,
+    "qr_base64": qr_base64,
+    "payload": payload,
+    "signature": signature,
+  }
+  if qr_url:
+    response["qr_url"] = qr_url
+  return response
@@ -0,0 +1,228 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.background import BackgroundWorker
+from app.core.config import settings
+from app.db import crud, models
+from app.db.session import SessionLocal, transaction
+
+EVENTS = metrics.counter(
+  "clochain_login_nonce_events_total", "Wallet-login nonces issued / consumed / missing / expired / evicted"
+)
+ENTRIES = metrics.gauge("clochain_login_nonce_entries", "Wallet-login nonces currently held by the store")
+
+
+def _now() -> datetime:
+  return datetime.now(timezone.utc)
+
+
+class LoginNonceStore:
+  """
+  Pending sign-in challenges: one nonce per wallet, replaced by every new `/auth/wallet/request`.
+
+  `get` returns the pending (nonce, expires_at) — dropping it if it has expired — and `consume`
+  removes it only if it is still the same unexpired nonce, so a signature can be redeemed once.
+  `session` is the caller's request session; stores that live in the database work on it.
+  """
+
+  name = "base"
+
+  def put(self, wallet: str, nonce: str, expires_at: datetime, session: Session) -> None:
+    raise NotImplementedError
+
+  def get(self, wallet: str, session: Session) -> tuple[str, datetime] | None:
+    raise NotImplementedError
+
+  def consume(self, wallet: str, nonce: str, session: Session) -> bool:
+    raise NotImplementedError
+
+  def sweep(self) -> int:
+    """Drop expired nonces; returns how many were removed."""
+    raise NotImplementedError
+
+  def _record(self, record: tuple[str, datetime] | None, now: datetime) -> tuple[str, datetime] | None:
+    if record is None:
+      EVENTS.inc(store=self.name, event="missing")
+    elif record[1] <= now:
+      EVENTS.inc(store=self.name, event="expired")
+    return record
+
+
+class MemoryLoginNonceStore(LoginNonceStore):
+  """
+  Per-process store capped at `max_entries`; the oldest challenges are evicted first. Every nonce has
+  the same TTL, so insertion order is expiry order and a sweep only walks the expired front.
+  Nonces issued by one uvicorn worker are unknown to the others — use the db store there.
+  """
+
+  name = "memory"
+
+  def __init__(self, max_entries: int) -> None:
+    self.max_entries = max_entries
+    self._entries: OrderedDict[str, tuple[str, datetime]] = OrderedDict()
+    self._lock = threading.Lock()
+
+  def put(self, wallet: str, nonce: str, expires_at: datetime, session: Session) -> None:
+    evicted = 0
+    with self._lock:
+      self._entries.pop(wallet, None)
+      self._entries[wallet] = (nonce, expires_at)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+        evicted += 1
+      ENTRIES.set(len(self._entries), store=self.name)
+    EVENTS.inc(store=self.name, event="issued")
+    if evicted:
+      EVENTS.inc(evicted, store=self.name, event="evicted")
+
+  def get(self, wallet: str, session: Session) -> tuple[str, datetime] | None:
+    now = _now()
+    with self._lock:
+      record = self._entries.get(wallet)
+      if record is not None and record[1] <= now:
+        del self._entries[wallet]
+        ENTRIES.set(len(self._entries), store=self.name)
+    return self._record(record, now)
+
+  def consume(self, wallet: str, nonce: str, session: Session) -> bool:
+    with self._lock:
+      record = self._entries.get(wallet)
+      if record is None or record[0] != nonce or record[1] <= _now():
+        return False
+      del self._entries[wallet]
+      ENTRIES.set(len(self._entries), store=self.name)
+    EVENTS.inc(store=self.name, event="consumed")
+    return True
+
+  def sweep(self) -> int:
+    now = _now()
+    removed = 0
+    with self._lock:
+      while self._entries:
+        wallet, (_, expires_at) = next(iter(self._entries.items()))
+        if expires_at > now:
+          break
+        del self._entries[wallet]
+        removed += 1
+      ENTRIES.set(len(self._entries), store=self.name)
+    if removed:
+      EVENTS.inc(removed, store=self.name, event="swept")
+    return removed
+
+
+class SqlLoginNonceStore(LoginNonceStore):
+  """
+  Store in `login_nonces`, shared by every uvicorn worker. Issuing is a single upsert and redeeming
+  a single DELETE ... RETURNING, so two workers can never both accept the same signature.
+  Runs on the request's session inside `transaction`, so it reads the primary and commits before the
+  response (the client signs the nonce next) and, with DB_ASYNC, stays on the async driver.
+  The sweeper has no request and uses a session of its own.
+  """
+
+  name = "db"
+
+  def __init__(self, session_factory=SessionLocal) -> None:
+    self.session_factory = session_factory
+
+  def put(self, wallet: str, nonce: str, expires_at: datetime, session: Session) -> None:
+    values = {"wallet_address": wallet, "nonce": nonce, "expires_at": _naive(expires_at)}
+    with transaction(session):
+      statement = crud.dialect_insert(session, models.LoginNonce)
+      if statement is not None:
+        statement = statement.values(**values)
+        session.execute(
+          statement.on_conflict_do_update(
+            index_elements=[models.LoginNonce.wallet_address],
+            set_={"nonce": statement.excluded.nonce, "expires_at": statement.excluded.expires_at},
+          )
+        )
+      else:
+        session.execute(delete(models.LoginNonce).where(models.LoginNonce.wallet_address == wallet))
+        session.add(models.LoginNonce(**values))
+    EVENTS.inc(store=self.name, event="issued")
+
+  def get(self, wallet: str, session: Session) -> tuple[str, datetime] | None:
+    now = _now()
+    with transaction(session):
+      row = session.execute(
+        select(models.LoginNonce.nonce, models.LoginNonce.expires_at).where(models.LoginNonce.wallet_address == wallet)
+      ).first()
+      record = (row.nonce, _aware(row.expires_at)) if row is not None else None
+      if record is not None and record[1] <= now:
+        session.execute(
+          delete(models.LoginNonce).where(
+            models.LoginNonce.wallet_address == wallet, models.LoginNonce.nonce == record[0]
+          )
+        )
+    return self._record(record, now)
+
+  def consume(self, wallet: str, nonce: str, session: Session) -> bool:
+    with transaction(session):
+      consumed = session.execute(
+        delete(models.LoginNonce)
+        .where(
+          models.LoginNonce.wallet_address == wallet,
+          models.LoginNonce.nonce == nonce,
+          models.LoginNonce.expires_at > _naive(_now()),
+        )
+        .returning(models.LoginNonce.wallet_address)
+      ).first()
+    if consumed is None:
+      return False
+    EVENTS.inc(store=self.name, event="consumed")
+    return True
+
+  def sweep(self) -> int:
+    session = self.session_factory()
+    try:
+      removed = session.execute(
+        delete(models.LoginNonce).where(models.LoginNonce.expires_at <= _naive(_now()))
+      ).rowcount
+      remaining = session.execute(select(func.count()).select_from(models.LoginNonce)).scalar_one()
+      session.commit()
+    finally:
+      session.close()
+    ENTRIES.set(remaining, store=self.name)
+    if removed:
+      EVENTS.inc(removed, store=self.name, event="swept")
+    return removed
+
+
+def _naive(moment: datetime) -> datetime:
+  # Columns are naive UTC, like every other timestamp in the schema.
+  return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _aware(moment: datetime) -> datetime:
+  return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment
+
+
+@lru_cache
+def get_login_nonce_store() -> LoginNonceStore:
+  if settings.login_nonce_store == "db":
+    return SqlLoginNonceStore()
+  return MemoryLoginNonceStore(settings.login_nonce_max_entries)
+
+
+class LoginNonceSweeper(BackgroundWorker):
+  name = "login-nonce-sweeper"
+
+  def __init__(self, store: LoginNonceStore, interval: float) -> None:
+    super().__init__(interval)
+    self.store = store
+
+  def run_once(self) -> bool:
+    self.store.sweep()
+    return False
+
+
+def build_login_nonce_sweeper() -> LoginNonceSweeper | None:
+  if settings.login_nonce_sweep_seconds <= 0:
+    return None
+  return LoginNonceSweeper(get_login_nonce_store(), settings.login_nonce_sweep_seconds)
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.cid import compute_cid, is_raw_cid
+from app.core.config import settings
+from app.core.external_calls import observe_call
+from app.core.tracing import span, traced
+from app.db import crud
+from app.db.session import transaction
+
+_memory: OrderedDict[str, dict] = OrderedDict()
+_memory_lock = threading.Lock()
+_MEMORY_SIZE = 2048
+
+
+def cid_from_token_uri(token_uri: str) -> str | None:
+  if not token_uri.startswith("ipfs://"):
+    return None
+  cid = token_uri.replace("ipfs://", "").removeprefix("ipfs/").split("/", 1)[0]
+  return cid or None
+
+
+def _remember(entries: dict[str, dict]) -> None:
+  with _memory_lock:
+    for cid, content in entries.items():
+      _memory[cid] = content
+      _memory.move_to_end(cid)
+    while len(_memory) > _MEMORY_SIZE:
+      _memory.popitem(last=False)
+
+
+def _recall(cids: set[str]) -> dict[str, dict]:
+  found: dict[str, dict] = {}
+  with _memory_lock:
+    for cid in cids:
+      content = _memory.get(cid)
+      if content is not None:
+        _memory.move_to_end(cid)
+        found[cid] = content
+  return found
+
+
+class MetadataResolver:
+  """
+  Resolves tokenURIs to metadata documents for list views.
+
+  IPFS content never changes for a CID, so ipfs:// documents are cached forever: an in-process LRU
+  in front of the `token_metadata` table, plus the bytes still waiting in the pin queue. Misses are
+  fetched concurrently (at most `concurrency` at a time) and every configured gateway is raced for
+  each CID; the first valid JSON answer wins. Raw-codec CIDs are checked against the response bytes
+  before anything is cached. Plain http(s) tokenURIs are fetched but not cached.
+
+  `resolve_many` runs its own event loop, so it must be called from synchronous code.
+  """
+
+  def __init__(
+    self,
+    session,
+    gateways: list[str] | None = None,
+    concurrency: int | None = None,
+    timeout: float | None = None,
+  ):
+    self.session = session
+    self.gateways = gateways or settings.ipfs_gateways
+    self.concurrency = max(1, concurrency or settings.metadata_fetch_concurrency)
+    self.timeout = timeout or settings.metadata_fetch_timeout_seconds
+
+  @traced("metadata.resolve_many")
+  def resolve_many(self, token_uris: list[str]) -> dict[str, dict | None]:
+    uri_cids = {uri: cid_from_token_uri(uri) for uri in set(token_uris) if uri}
+    cids = {cid for cid in uri_cids.values() if cid}
+    urls = [uri for uri, cid in uri_cids.items() if cid is None and uri.startswith(("http://", "https://"))]
+
+    found = _recall(cids)
+    missing = cids - found.keys()
+    if missing:
+      stored = crud.get_token_metadata_many(self.session, list(missing))
+      stored.update(crud.get_metadata_pin_contents(self.session, list(missing - stored.keys())))
+      _remember(stored)
+      found.update(stored)
+      missing -= stored.keys()
+
+    fetched: dict[str, dict | None] = {}
+    if missing or urls:
+      fetched = asyncio.run(self._fetch_all(sorted(missing), urls))
+      resolved = {cid: fetched[cid] for cid in missing if fetched.get(cid) is not None}
+      with transaction(self.session):
+        crud.store_token_metadata_many(self.session, resolved)
+      _remember(resolved)
+      found.update(resolved)
+
+    return {uri: found.get(cid) if cid else fetched.get(uri) for uri, cid in uri_cids.items()}
+
+  async def _fetch_all(self, cids: list[str], urls: list[str]) -> dict[str, dict | None]:
+    slots = asyncio.Semaphore(self.concurrency)
+    limits = httpx.Limits(max_connections=self.concurrency * max(1, len(self.gateways)))
+    async with httpx.AsyncClient(timeout=self.timeout, limits=limits, follow_redirects=True) as client:
+
+      async def fetch_cid(cid: str):
+        async with slots:
+          return cid, await self._race_gateways(client, cid)
+
+      async def fetch_url(url: str):
+        async with slots:
+          return url, await self._get_json(client, url, None)
+
+      results = await asyncio.gather(*[fetch_cid(cid) for cid in cids], *[fetch_url(url) for url in urls])
+    return dict(results)
+
+  async def _race_gateways(self, client: httpx.AsyncClient, cid: str) -> dict | None:
+    pending = {asyncio.create_task(self._get_json(client, f"{gateway}/{cid}", cid)) for gateway in self.gateways}
+    try:
+      while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+          if task.result() is not None:
+            return task.result()
+      return None
+    finally:
+      for task in pending:
+        task.cancel()
+      await asyncio.gather(*pending, return_exceptions=True)
+
+  async def _get_json(self, client: httpx.AsyncClient, url: str, cid: str | None) -> dict | None:
+    # Gateways are labelled by host; arbitrary (non-ipfs://) tokenURIs share one label.
+    operation = (urlsplit(url).hostname or "gateway") if cid else "url"
+    with span(f"ipfs GET {operation}", "client", **{"http.url": url}) as fetch_span:
+      started = time.perf_counter()
+      result = "error"
+      try:
+        response = await client.get(url)
+        response.raise_for_status()
+        if cid and is_raw_cid(cid) and compute_cid(response.content) != cid:
+          result = "mismatch"
+          return None
+        data = json.loads(response.content)
+        result = "ok" if isinstance(data, dict) else "error"
+      except (httpx.HTTPError, ValueError):
+        return None
+      except asyncio.CancelledError:
+        # Lost the race to another gateway.
+        result = "cancelled"
+        raise
+      finally:
+        observe_call("ipfs", operation, result, time.perf_counter() - started)
+        if fetch_span is not None:
+          fetch_span.set_attribute("ipfs.result", result)
+    return data if isinstance(data, dict) else None
@@ -0,0 +1,233 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from fastapi import HTTPException
+from web3.exceptions import ContractLogicError
+
+from app.core import metrics
+from app.core.background import BackgroundWorker
+from app.core.config import settings
+from app.core.profiling import profile_job
+from app.core.tracing import start_trace
+from app.db import crud
+from app.db.session import SessionLocal, transaction
+from app.services.nft_service import NFTService
+from app.services.onchain import (
+  broadcast_transaction,
+  fetch_mint_receipts,
+  get_nonce_manager,
+  quote_fees,
+  recover_nonces,
+  sign_mint_transaction,
+)
+
+logger = logging.getLogger(__name__)
+
+_worker: "MintJobWorker | None" = None
+
+WINDOW_SIZE = metrics.histogram(
+  "clochain_mint_window_size", "Jobs per mint window", buckets=(1, 2, 5, 10, 20, 50, 100)
+)
+WINDOW_BROADCAST_SECONDS = metrics.histogram(
+  "clochain_mint_window_broadcast_seconds", "Time to pin, sign and broadcast one mint window"
+)
+WINDOW_INCLUSION_SECONDS = metrics.histogram(
+  "clochain_mint_window_inclusion_seconds", "Time from the first broadcast of a window to its last receipt"
+)
+MINT_JOBS = metrics.counter("clochain_mint_jobs_total", "Mint jobs leaving the pipeline, by result")
+
+
+class MintJobWorker(BackgroundWorker):
+  """
+  Drains `mint_jobs` in windows. For each window the worker pins metadata, takes one gas price
+  quote from the gas oracle, reserves consecutive nonces and broadcasts every transaction back to back; a separate
+  thread then polls all receipts of the window with one batched RPC per round. Up to
+  `concurrency` windows can be waiting for inclusion while the next one is being broadcast.
+
+  Leases outlive the receipt timeout, so jobs held by a crashed process are picked up again after
+  a restart (already-submitted ones only have their receipts collected).
+  """
+
+  name = "mint-job-worker"
+
+  def __init__(
+    self,
+    session_factory=SessionLocal,
+    concurrency: int | None = None,
+    window_size: int | None = None,
+    poll_seconds: float | None = None,
+  ):
+    super().__init__(poll_seconds if poll_seconds is not None else settings.mint_worker_poll_seconds)
+    self.session_factory = session_factory
+    self.concurrency = max(1, concurrency or settings.mint_worker_concurrency)
+    self.window_size = max(1, window_size or settings.mint_window_size)
+    self.lease_seconds = settings.mint_receipt_timeout_seconds + 60
+    self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="mint-receipts")
+    self._in_flight = 0
+    self._lock = threading.Lock()
+    self.recent_windows: deque[dict] = deque(maxlen=50)
+
+  def run_once(self) -> bool:
+    with self._lock:
+      if self._in_flight >= self.concurrency:
+        return False
+    session = self.session_factory()
+    try:
+      with transaction(session):
+        jobs = crud.claim_mint_jobs(session, ["pending", "submitted"], self.window_size, self.lease_seconds)
+      if not jobs:
+        return False
+      window = {"startedAt": datetime.utcnow().isoformat(), "size": len(jobs)}
+      started = time.monotonic()
+      submitted = self._broadcast_window(session, jobs)
+      window["broadcastSeconds"] = round(time.monotonic() - started, 3)
+      WINDOW_SIZE.observe(len(jobs))
+      WINDOW_BROADCAST_SECONDS.observe(window["broadcastSeconds"])
+    finally:
+      session.close()
+
+    if submitted:
+      with self._lock:
+        self._in_flight += 1
+      self._executor.submit(self._collect_receipts, submitted, window, time.monotonic())
+    else:
+      self.recent_windows.append(window)
+    return True
+
+  def stop(self, timeout: float | None = 5.0) -> None:
+    super().stop(timeout)
+    self._executor.shutdown(wait=False, cancel_futures=True)
+
+  def _broadcast_window(self, session, jobs) -> dict[str, str]:
+    """Sign and send every unsent job of the window; returns {job_id: tx_hash} to watch."""
+    service = NFTService(session)
+    submitted = {job.job_id: job.tx_hash for job in jobs if job.tx_hash}
+    prepared = []
+    for job in jobs:
+      if job.tx_hash:
+        continue
+      try:
+        prepared.append((job, *service.prepare_mint_job(job)))
+      except HTTPException as exc:
+        self._fail(service, job, exc.detail, exc.status_code < 500)
+    if not prepared:
+      return submitted
+
+    try:
+      nonce_manager = get_nonce_manager()
+      fees = quote_fees()
+      nonces = nonce_manager.allocate_many(len(prepared))
+    except Exception as exc:
+      # Nothing was signed: release every lease and record why, so the job long-poll shows it. A
+      # misconfigured chain (500) will not fix itself, so it counts as an attempt; RPC outages do not.
+      reason = _failure_reason(exc)
+      for job, _, _ in prepared:
+        if isinstance(exc, HTTPException) and exc.status_code == 500:
+          self._fail(service, job, reason, False)
+        else:
+          with transaction(session):
+            crud.update_mint_job(session, job, error=reason, locked_until=None)
+      raise
+    for index, ((job, token_uri, product_hash_source), nonce) in enumerate(zip(prepared, nonces)):
+      try:
+        raw_transaction, _ = sign_mint_transaction(job.wallet_address, token_uri, product_hash_source, nonce, fees)
+        tx_hash = broadcast_transaction(raw_transaction)
+      except Exception as exc:  # noqa: BLE001
+        # Later nonces of the window would queue behind this gap, so none of them are sent: the
+        # nonces go back to the manager and the remaining jobs back to the queue.
+        recover_nonces(nonce_manager, nonces[index:], exc)
+        self._fail(service, job, _failure_reason(exc), isinstance(exc, ContractLogicError))
+        with transaction(session):
+          for later_job, _, _ in prepared[index + 1 :]:
+            crud.update_mint_job(session, later_job, locked_until=None)
+        break
+      # Committed per transaction: a broadcast tx_hash must never be lost to a later failure.
+      with transaction(session):
+        crud.update_mint_job(session, job, status="submitted", tx_hash=tx_hash, error=None)
+      submitted[job.job_id] = tx_hash
+    return submitted
+
+  def _collect_receipts(self, submitted: dict[str, str], window: dict, broadcast_at: float) -> None:
+    # Runs on the receipt executor, outside `run_once`, so it opens its own profile and trace.
+    with profile_job(self.name), start_trace(f"worker {self.name} receipts"):
+      self._poll_receipts(submitted, window, broadcast_at)
+
+  def _poll_receipts(self, submitted: dict[str, str], window: dict, broadcast_at: float) -> None:
+    session = self.session_factory()
+    outstanding = dict(submitted)
+    deadline = broadcast_at + settings.mint_receipt_timeout_seconds
+    try:
+      service = NFTService(session)
+      while outstanding:
+        try:
+          receipts = fetch_mint_receipts(list(outstanding.values()))
+        except Exception:  # noqa: BLE001
+          logger.exception("Receipt polling failed for %s transactions", len(outstanding))
+          receipts = {}
+        for job_id, tx_hash in list(outstanding.items()):
+          result = receipts.get(tx_hash)
+          if result is None:
+            continue
+          job = crud.get_mint_job(session, job_id)
+          if "error" in result:
+            # Mined but reverted (or no Transfer): watching the same tx_hash again can never succeed.
+            self._fail(service, job, result["error"], True)
+          else:
+            service.complete_mint_job(job, result)
+            MINT_JOBS.inc(result="confirmed")
+          del outstanding[job_id]
+        if not outstanding or time.monotonic() >= deadline:
+          break
+        time.sleep(settings.mint_receipt_poll_seconds)
+
+      # Not mined within the receipt timeout: a later window keeps watching, but each timeout counts as
+      # an attempt so a dropped transaction fails after MINT_JOB_MAX_ATTEMPTS instead of staying submitted.
+      for job_id in outstanding:
+        job = crud.get_mint_job(session, job_id)
+        if job is not None:
+          self._fail(service, job, "Mint transaction not mined yet", False)
+    except Exception:  # noqa: BLE001
+      logger.exception("Mint window failed while collecting receipts")
+    finally:
+      session.close()
+      window["inclusionSeconds"] = round(time.monotonic() - broadcast_at, 3)
+      window["pending"] = len(outstanding)
+      WINDOW_INCLUSION_SECONDS.observe(window["inclusionSeconds"])
+      self.recent_windows.append(window)
+      with self._lock:
+        self._in_flight -= 1
+      self.wake()
+
+  def _fail(self, service: NFTService, job, reason, permanent: bool) -> None:
+    reason = reason if isinstance(reason, str) else "Mint failed"
+    service.fail_mint_job(job, reason, permanent)
+    if job.status == "failed":
+      MINT_JOBS.inc(result="failed")
+
+
+def _failure_reason(exc: Exception) -> str:
+  return exc.detail if isinstance(exc, HTTPException) else (getattr(exc, "message", None) or str(exc))
+
+
+def build_mint_worker() -> MintJobWorker | None:
+  global _worker
+  if not settings.mint_worker_enabled:
+    return None
+  _worker = MintJobWorker()
+  return _worker
+
+
+def notify_mint_worker() -> None:
+  if _worker is not None:
+    _worker.wake()
+
+
+def pipeline_metrics() -> dict:
+  return {
+    "windows": list(_worker.recent_windows) if _worker is not None else [],
+    "metrics": metrics.snapshot("clochain_mint_"),
+  }
@@ -1,26 +1,37 @@
 from fastapi import HTTPException, status
-import httpx
+from sqlalchemy.exc import IntegrityError
 
 from app.core.config import settings
 from app.core.did import did_to_wallet, to_did
-from app.core.hmac_utils import decode_short_token, encode_short_token, sign_payload
+from app.core.hmac_utils import decode_short_token
+from app.core.tracing import traced
 from app.db import crud
+from app.db.session import on_commit, transaction
+from app.services.indexer import fetch_wallet_tokens_indexed, is_index_ready
+from app.services.metadata_cache import MetadataResolver
 from app.services.onchain import fetch_wallet_tokens_onchain, mint_via_web3
+from app.services.pin_worker import notify_pin_worker
 from app.services.pinata_service import PinataService
 
 
 class NFTService:
   def __init__(self, session, pinata: PinataService | None = None):
     self.session = session
-    self.pinata = pinata or PinataService(settings.pinata_api_key, settings.pinata_secret, settings.pinata_jwt)
+    self.pinata = pinata or PinataService(
+      settings.pinata_api_key,
+      settings.pinata_secret,
+      settings.pinata_jwt,
+      session=session,
+    )
 
   def create_metadata(self, short_token: str):
     payload, _ = decode_short_token(short_token)
-    issue = crud.get_issue_by_token(self.session, short_token)
-    if not issue:
-      raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Issue not found")
-    metadata = self._build_metadata(payload, short_token)
-    cid = self.pinata.upload_metadata(metadata)
+    with transaction(self.session):
+      issue = crud.get_issue_by_token(self.session, short_token)
+      if not issue:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Issue not found")
+      metadata = self._build_metadata(payload, short_token)
+      cid = self._pin_metadata(metadata)
     return cid, metadata, payload
 
   def record_nft(self, token_id: str, wallet_address: str, cid: str, payload: dict):
@@ -29,20 +40,13 @@ class NFTService:
     expected_wallet = did_to_wallet(payload["did"])
     if expected_wallet != normalized_wallet:
       raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Wallet does not match DID")
-    short_token = self._reconstruct_short_token(payload)
-    issue = crud.get_issue_by_token(self.session, short_token)
-    if not issue:
-      raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Issued token not found for payload")
-    if crud.is_payload_registered(self.session, payload):
-      raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="NFT already registered for this payload")
-    crud.create_nft_record(
-      self.session,
-      token_id=token_id,
-      wallet_address=normalized_wallet,
-      cid=cid,
-      payload=payload,
-      first_owner_wallet=normalized_wallet,
-    )
+    with transaction(self.session):
+      issue = crud.get_issue_by_payload(self.session, payload)
+      if not issue:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Issued token not found for payload")
+      if crud.is_payload_registered(self.session, payload):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="NFT already registered for this payload")
+      self._create_nft_record(token_id, normalized_wallet, cid, payload)
     return {"tokenId": token_id, "wallet": normalized_wallet, "cid": cid}
 
   def record_transfer(
@@ -53,28 +57,34 @@ class NFTService:
     tx_hash: str,
     block_number: int | None = None,
   ):
+    normalized_from = from_wallet.lower()
+    normalized_to = to_wallet.lower()
+    with transaction(self.session):
+      # Owner check and update in one conditional UPDATE; the NFT is only read when it did not apply.
+      nft = None
+      if normalized_from != normalized_to:
+        nft = crud.update_nft_owner(self.session, token_id, normalized_to, expected_owner=normalized_from)
+      if nft is None:
+        self._raise_transfer_rejected(token_id, normalized_from)
+      to_did(normalized_from)
+      to_did(normalized_to)
+      crud.record_transfer(
+        self.session,
+        token_id=token_id,
+        from_wallet=normalized_from,
+        to_wallet=normalized_to,
+        tx_hash=tx_hash,
+        block_number=block_number,
+      )
+    return {"txHash": tx_hash}
+
+  def _raise_transfer_rejected(self, token_id: str, normalized_from: str):
     nft = crud.get_nft_by_token(self.session, token_id)
     if not nft:
       raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="NFT not found")
-    current_owner = nft.owner_wallet.lower()
-    normalized_from = from_wallet.lower()
-    normalized_to = to_wallet.lower()
-    if current_owner != normalized_from:
+    if nft.owner_wallet.lower() != normalized_from:
       raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Recorded owner mismatch")
-    if normalized_from == normalized_to:
-      raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot transfer to the same wallet")
-    to_did(normalized_from)
-    to_did(normalized_to)
-    crud.update_nft_owner(self.session, token_id, normalized_to)
-    crud.record_transfer(
-      self.session,
-      token_id=token_id,
-      from_wallet=normalized_from,
-      to_wallet=normalized_to,
-      tx_hash=tx_hash,
-      block_number=block_number,
-    )
-    return {"txHash": tx_hash}
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot transfer to the same wallet")
 
   def list_wallet_nfts(self, wallet_address: str):
     normalized_wallet = wallet_address.lower()
@@ -89,18 +99,24 @@ class NFTService:
       for nft in stored_nfts
     }
     onchain_entries: list[dict] = []
-    try:
-      onchain_entries = fetch_wallet_tokens_onchain(normalized_wallet)
-    except HTTPException:
-      onchain_entries = []
-
-    for entry in onchain_entries:
-      token_id = entry.get("tokenId")
-      if not token_id or token_id in result_map:
-        continue
+    if is_index_ready(self.session):
+      onchain_entries = fetch_wallet_tokens_indexed(self.session, normalized_wallet)
+    else:
+      try:
+        onchain_entries = fetch_wallet_tokens_onchain(normalized_wallet)
+      except HTTPException:
+        onchain_entries = []
+
+    unknown_entries = [
+      entry for entry in onchain_entries if entry.get("tokenId") and entry["tokenId"] not in result_map
+    ]
+    metadata_by_uri = MetadataResolver(self.session).resolve_many(
+      [entry.get("tokenURI") or "" for entry in unknown_entries]
+    )
+    for entry in unknown_entries:
+      token_id = entry["tokenId"]
       token_uri = entry.get("tokenURI") or ""
-      metadata = self._load_metadata_from_token_uri(token_uri)
-      brand, product_id = self._extract_fields_from_metadata(metadata)
+      brand, product_id = self._extract_fields_from_metadata(metadata_by_uri.get(token_uri))
       result_map[token_id] = {
         "tokenId": token_id,
         "brand": brand or "Unknown",
@@ -129,28 +145,30 @@ class NFTService:
       metadata["attributes"].append({"trait_type": "issuedAt", "value": issued_at})
     return metadata
 
-  def _reconstruct_short_token(self, payload: dict) -> str:
-    signature = sign_payload(payload)
-    return encode_short_token(payload, signature)
+  @traced("nft.pin_metadata")
+  def _pin_metadata(self, metadata: dict) -> str:
+    # The CID is computed locally; the upload itself happens in the pin worker, off the mint path.
+    with transaction(self.session):
+      cid = self.pinata.register_pin(metadata)
+      on_commit(self.session, notify_pin_worker)
+    return cid
 
-  def _load_metadata_from_token_uri(self, token_uri: str) -> dict | None:
-    if not token_uri:
-      return None
-    url = self._resolve_token_uri(token_uri)
-    if not url:
-      return None
+  @traced("nft.create_nft_record")
+  def _create_nft_record(self, token_id: str, wallet_address: str, cid: str, payload: dict):
+    # The unique product fingerprint settles concurrent registrations of the same purchase.
     try:
-      response = httpx.get(url, timeout=10)
-      response.raise_for_status()
-      return response.json()
-    except httpx.HTTPError:
-      return None
-
-  def _resolve_token_uri(self, token_uri: str) -> str | None:
-    if token_uri.startswith("ipfs://"):
-      cid = token_uri.replace("ipfs://", "")
-      return f"https://gateway.pinata.cloud/ipfs/{cid}"
-    return token_uri
+      return crud.create_nft_record(
+        self.session,
+        token_id=token_id,
+        wallet_address=wallet_address,
+        cid=cid,
+        payload=payload,
+        first_owner_wallet=wallet_address,
+      )
+    except IntegrityError as exc:
+      raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT, detail="NFT already registered for this payload"
+      ) from exc
 
   def _extract_fields_from_metadata(self, metadata: dict | None) -> tuple[str | None, str | None]:
     if not metadata:
@@ -172,21 +190,11 @@ class NFTService:
 
   def register_nft(self, short_token: str, wallet_address: str):
     normalized_wallet = wallet_address.lower()
-    payload, _ = decode_short_token(short_token)
-
-    expected_wallet = did_to_wallet(payload["did"])
-    if normalized_wallet != expected_wallet:
-      raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Wallet does not match DID")
-
-    issue = crud.get_issue_by_token(self.session, short_token)
-    if not issue:
-      raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Issue not found")
-
-    if crud.is_payload_registered(self.session, payload):
-      raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="NFT already registered for this payload")
-
-    metadata = self._build_metadata(payload, short_token)
-    cid = self.pinata.upload_metadata(metadata)
+    # Committed before the mint so the pin worker can upload while the transaction is mined.
+    with transaction(self.session):
+      payload = self.validate_registration(short_token, normalized_wallet)
+      metadata = self._build_metadata(payload, short_token)
+      cid = self._pin_metadata(metadata)
     token_uri = f"ipfs://{cid}"
     product_hash_source = self._build_product_hash_source(payload, normalized_wallet)
     result = mint_via_web3(normalized_wallet, token_uri, product_hash_source)
@@ -194,14 +202,8 @@ class NFTService:
     if not token_id:
       raise HTTPException(status_code=500, detail="Unable to obtain tokenId from mint transaction")
 
-    crud.create_nft_record(
-      self.session,
-      token_id=str(token_id),
-      wallet_address=normalized_wallet,
-      cid=cid,
-      payload=payload,
-      first_owner_wallet=normalized_wallet,
-    )
+    with transaction(self.session):
+      self._create_nft_record(str(token_id), normalized_wallet, cid, payload)
 
     return {
       "tokenId": str(token_id),
@@ -211,6 +213,87 @@ class NFTService:
       "blockNumber": result.get("blockNumber"),
     }
 
+  @traced("nft.validate_registration")
+  def validate_registration(self, short_token: str, normalized_wallet: str) -> dict:
+    payload, _ = decode_short_token(short_token)
+
+    expected_wallet = did_to_wallet(payload["did"])
+    if normalized_wallet != expected_wallet:
+      raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Wallet does not match DID")
+
+    issue = crud.get_issue_by_token(self.session, short_token)
+    if not issue:
+      raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Issue not found")
+
+    if crud.is_payload_registered(self.session, payload):
+      raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="NFT already registered for this payload")
+    return payload
+
+  def enqueue_registration(self, short_token: str, wallet_address: str):
+    normalized_wallet = wallet_address.lower()
+    with transaction(self.session):
+      existing = crud.get_mint_job_by_token(self.session, short_token)
+      if existing and existing.status != "failed":
+        if existing.wallet_address != normalized_wallet:
+          raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Wallet does not match DID")
+        return existing
+
+      payload = self.validate_registration(short_token, normalized_wallet)
+      if existing:
+        return crud.update_mint_job(
+          self.session, existing, status="pending", error=None, attempts=0, locked_until=None
+        )
+      try:
+        return crud.create_mint_job(self.session, short_token, normalized_wallet, payload)
+      except IntegrityError:
+        # A concurrent request enqueued the same short_token first.
+        return crud.get_mint_job_by_token(self.session, short_token)
+
+  def get_mint_job(self, job_id: str, wallet_address: str):
+    job = crud.get_mint_job(self.session, job_id)
+    if not job or job.wallet_address != wallet_address.lower():
+      raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Mint job not found")
+    return job
+
+  def prepare_mint_job(self, job) -> tuple[str, str]:
+    """Assign the metadata CID for a leased job (once) and return (tokenURI, product hash source) for signing."""
+    with transaction(self.session):
+      if crud.is_payload_registered(self.session, job.payload):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="NFT already registered for this payload")
+      if not job.cid:
+        metadata = self._build_metadata(job.payload, job.short_token)
+        cid = self._pin_metadata(metadata)
+        crud.update_mint_job(self.session, job, cid=cid, token_metadata=metadata)
+    return f"ipfs://{job.cid}", self._build_product_hash_source(job.payload, job.wallet_address)
+
+  def complete_mint_job(self, job, result: dict) -> None:
+    error = None
+    with transaction(self.session):
+      if not crud.get_nft_by_token(self.session, result["tokenId"]):
+        try:
+          self._create_nft_record(result["tokenId"], job.wallet_address, job.cid, job.payload)
+        except HTTPException as exc:
+          # The token is minted either way; record why it has no `nfts` row.
+          error = exc.detail
+      crud.update_mint_job(
+        self.session,
+        job,
+        status="confirmed",
+        token_id=result["tokenId"],
+        block_number=result.get("blockNumber"),
+        error=error,
+        locked_until=None,
+      )
+
+  def fail_mint_job(self, job, reason: str, permanent: bool = False) -> None:
+    attempts = job.attempts + 1
+    if permanent or attempts >= settings.mint_job_max_attempts:
+      next_status = "failed"
+    else:
+      next_status = "submitted" if job.tx_hash else "pending"
+    with transaction(self.session):
+      crud.update_mint_job(self.session, job, status=next_status, error=reason, attempts=attempts, locked_until=None)
+
   def _build_product_hash_source(self, payload: dict, wallet_address: str) -> str:
     return "|".join(
       [
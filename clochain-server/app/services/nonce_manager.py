@@ -0,0 +1,169 @@
+import heapq
+import threading
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.db import models
+from app.db.session import SessionLocal
+
+NONCE_RESYNC_ERRORS = ("nonce too low", "already known", "replacement transaction underpriced")
+
+
+class NonceManager:
+  """
+  Hands out strictly increasing transaction nonces for the server wallet within one process.
+
+  The counter starts from the chain's `pending` transaction count. Nonces whose transaction never
+  reached the node are handed back with `release()` and reused first, so a failed send does not
+  leave a gap that stalls every later transaction.
+  """
+
+  def __init__(self, fetch_pending_count: Callable[[], int]) -> None:
+    self._fetch_pending_count = fetch_pending_count
+    self._lock = threading.Lock()
+    self._next: int | None = None
+    self._released: list[int] = []
+
+  def allocate(self) -> int:
+    with self._lock:
+      return self._allocate_locked()
+
+  def allocate_many(self, count: int) -> list[int]:
+    """Reserve `count` nonces at once; consecutive unless released nonces are being reused."""
+    with self._lock:
+      return [self._allocate_locked() for _ in range(count)]
+
+  def _allocate_locked(self) -> int:
+    if self._next is None:
+      self._next = self._fetch_pending_count()
+    if self._released:
+      return heapq.heappop(self._released)
+    nonce = self._next
+    self._next += 1
+    return nonce
+
+  def release(self, nonce: int) -> None:
+    with self._lock:
+      if self._next is not None and nonce < self._next and nonce not in self._released:
+        heapq.heappush(self._released, nonce)
+
+  def resync(self, force: bool = False) -> int:
+    """
+    Re-read the pending count and return it. By default the counter only moves forward so nonces
+    already handed to in-flight sends stay valid; `force` also moves it back (e.g. after a dropped
+    transaction).
+    """
+    pending = self._fetch_pending_count()
+    with self._lock:
+      if force or self._next is None or pending > self._next:
+        self._next = pending
+      self._released = [nonce for nonce in self._released if nonce >= pending and nonce < self._next]
+      heapq.heapify(self._released)
+    return pending
+
+
+class DBNonceManager(NonceManager):
+  """
+  Same contract as NonceManager, but the counter lives in `wallet_nonces` so several uvicorn workers
+  can mint from one wallet. Every allocation is a single row-locking UPDATE ... RETURNING (or a
+  DELETE ... RETURNING of the lowest released nonce), so two workers never receive the same nonce.
+  """
+
+  def __init__(self, wallet_address: str, fetch_pending_count: Callable[[], int], session_factory=SessionLocal) -> None:
+    super().__init__(fetch_pending_count)
+    self.wallet_address = wallet_address.lower()
+    self.session_factory = session_factory
+    self._initialized = False
+
+  def allocate(self) -> int:
+    if not self._initialized:
+      self.resync()
+    session = self.session_factory()
+    try:
+      lowest = (
+        select(func.min(models.ReleasedNonce.nonce))
+        .where(models.ReleasedNonce.wallet_address == self.wallet_address)
+        .scalar_subquery()
+      )
+      reused = session.execute(
+        delete(models.ReleasedNonce)
+        .where(models.ReleasedNonce.wallet_address == self.wallet_address, models.ReleasedNonce.nonce == lowest)
+        .returning(models.ReleasedNonce.nonce)
+      ).scalar()
+      if reused is not None:
+        session.commit()
+        return reused
+      allocated = session.execute(
+        update(models.WalletNonce)
+        .where(models.WalletNonce.wallet_address == self.wallet_address)
+        .values(next_nonce=models.WalletNonce.next_nonce + 1, updated_at=datetime.utcnow())
+        .returning(models.WalletNonce.next_nonce)
+      ).scalar_one()
+      session.commit()
+      return allocated - 1
+    finally:
+      session.close()
+
+  def allocate_many(self, count: int) -> list[int]:
+    if count <= 0:
+      return []
+    if not self._initialized:
+      self.resync()
+    session = self.session_factory()
+    try:
+      has_released = session.execute(
+        select(models.ReleasedNonce.nonce).where(models.ReleasedNonce.wallet_address == self.wallet_address).limit(1)
+      ).first()
+      if has_released is None:
+        end = session.execute(
+          update(models.WalletNonce)
+          .where(models.WalletNonce.wallet_address == self.wallet_address)
+          .values(next_nonce=models.WalletNonce.next_nonce + count, updated_at=datetime.utcnow())
+          .returning(models.WalletNonce.next_nonce)
+        ).scalar_one()
+        session.commit()
+        return list(range(end - count, end))
+    finally:
+      session.close()
+    return [self.allocate() for _ in range(count)]
+
+  def release(self, nonce: int) -> None:
+    session = self.session_factory()
+    try:
+      session.add(models.ReleasedNonce(wallet_address=self.wallet_address, nonce=nonce))
+      session.commit()
+    except IntegrityError:
+      session.rollback()
+    finally:
+      session.close()
+
+  def resync(self, force: bool = False) -> int:
+    pending = self._fetch_pending_count()
+    session = self.session_factory()
+    try:
+      record = session.get(models.WalletNonce, self.wallet_address, with_for_update=True)
+      if record is None:
+        session.add(models.WalletNonce(wallet_address=self.wallet_address, next_nonce=pending))
+      elif force or pending > record.next_nonce:
+        record.next_nonce = pending
+        record.updated_at = datetime.utcnow()
+      stale = delete(models.ReleasedNonce).where(models.ReleasedNonce.wallet_address == self.wallet_address)
+      if not force:
+        stale = stale.where(models.ReleasedNonce.nonce < pending)
+      session.execute(stale)
+      session.commit()
+    except IntegrityError:
+      # Another worker created the row first; its value is just as fresh.
+      session.rollback()
+    finally:
+      session.close()
+    self._initialized = True
+    return pending
+
+
+def needs_resync(exc: Exception) -> bool:
+  message = str(exc).lower()
+  return any(marker in message for marker in NONCE_RESYNC_ERRORS)
@@ -1,10 +1,12 @@
+import time
 from functools import lru_cache
 
 from eth_account import Account
+from eth_utils.abi import event_abi_to_log_topic
 from fastapi import HTTPException
-from web3 import Web3
+from web3 import HTTPProvider, Web3
 from web3.contract.contract import Contract
-from web3.exceptions import ContractLogicError, MismatchedABI, Web3Exception
+from web3.exceptions import ContractLogicError, MismatchedABI, TimeExhausted, Web3Exception
 
 try:  # web3.py v6.12+ exposes EventLogErrorFlags; older versions might not.
   from web3._utils.events import EventLogErrorFlags
@@ -12,6 +14,11 @@ except ImportError:  # pragma: no cover - defensive for future versions
   EventLogErrorFlags = None
 
 from app.core.config import settings
+from app.core.external_calls import observe_call
+from app.core.tracing import span, traced
+from app.services.chain_reader import ChainReader
+from app.services.gas_oracle import GasOracle
+from app.services.nonce_manager import DBNonceManager, NonceManager, needs_resync
 
 ABI = [
   {
@@ -24,6 +31,17 @@ ABI = [
     "name": "Transfer",
     "type": "event",
   },
+  {
+    "anonymous": False,
+    "inputs": [
+      {"indexed": True, "internalType": "uint256", "name": "tokenId", "type": "uint256"},
+      {"indexed": True, "internalType": "address", "name": "to", "type": "address"},
+      {"indexed": True, "internalType": "bytes32", "name": "productHash", "type": "bytes32"},
+      {"indexed": False, "internalType": "string", "name": "tokenURI", "type": "string"},
+    ],
+    "name": "AuthenticityMinted",
+    "type": "event",
+  },
   {
     "inputs": [
       {"internalType": "address", "name": "to", "type": "address"},
@@ -59,6 +77,35 @@ ABI = [
 ]
 
 
+class InstrumentedHTTPProvider(HTTPProvider):
+  """
+  HTTPProvider that counts and times every JSON-RPC request by method (a batch counts once, as "batch")
+  and records each one as a client span when the caller is being traced.
+  """
+
+  def make_request(self, method, params):
+    return self._observed(str(method), super().make_request, method, params)
+
+  def make_batch_request(self, batch_requests):
+    return self._observed("batch", super().make_batch_request, batch_requests)
+
+  def _observed(self, method: str, send, *args):
+    started = time.perf_counter()
+    result = "error"
+    with span(f"rpc {method}", "client", **{"rpc.system": "jsonrpc", "rpc.method": method}) as rpc_span:
+      try:
+        response = send(*args)
+        if method == "batch":
+          result = "ok" if isinstance(response, list) else "rpc_error"
+        else:
+          result = "rpc_error" if "error" in response else "ok"
+        return response
+      finally:
+        observe_call("rpc", method, result, time.perf_counter() - started)
+        if rpc_span is not None and result == "rpc_error":
+          rpc_span.error = "JSON-RPC error response"
+
+
 @lru_cache
 def _init_web3() -> tuple[Web3, Contract, str]:
   if not all(
@@ -71,7 +118,7 @@ def _init_web3() -> tuple[Web3, Contract, str]:
   ):
     raise HTTPException(status_code=500, detail="Blockchain credentials are not configured")
 
-  w3 = Web3(Web3.HTTPProvider(settings.rpc_url, request_kwargs={"timeout": 30}))
+  w3 = Web3(InstrumentedHTTPProvider(settings.rpc_url, request_kwargs={"timeout": 30}))
   if not w3.is_connected():
     raise HTTPException(status_code=502, detail="RPC connection failed")
 
@@ -88,45 +135,201 @@ def _init_web3() -> tuple[Web3, Contract, str]:
   return w3, contract, account.address
 
 
+@lru_cache
+def get_chain_reader() -> ChainReader:
+  w3, _, _ = _init_web3()
+  return ChainReader(
+    w3,
+    mode=settings.rpc_read_mode,
+    batch_size=settings.rpc_batch_size,
+    multicall_address=settings.multicall3_address,
+  )
+
+
+@lru_cache
+def get_nonce_manager() -> NonceManager:
+  w3, _, server_address = _init_web3()
+
+  def fetch_pending_count() -> int:
+    return int(w3.eth.get_transaction_count(server_address, "pending"))
+
+  if settings.nonce_backend == "db":
+    return DBNonceManager(server_address, fetch_pending_count)
+  return NonceManager(fetch_pending_count)
+
+
+@traced("onchain.mint_via_web3")
 def mint_via_web3(to_address: str, token_uri: str, product_hash_source: str) -> dict:
+  tx_hash = submit_mint_transaction(to_address, token_uri, product_hash_source)
+  result = wait_for_mint_receipt(tx_hash)
+  if result is None:
+    raise HTTPException(status_code=502, detail="Mint transaction failed")
+  return result
+
+
+@traced("onchain.submit_mint_transaction")
+def submit_mint_transaction(to_address: str, token_uri: str, product_hash_source: str) -> str:
+  nonce_manager = get_nonce_manager()
+  nonce = nonce_manager.allocate()
+  try:
+    raw_transaction, _ = sign_mint_transaction(to_address, token_uri, product_hash_source, nonce, quote_fees())
+    return broadcast_transaction(raw_transaction)
+  except Exception as exc:
+    # The transaction never reached the node: hand the nonce back (or resync if the chain moved on).
+    recover_nonces(nonce_manager, [nonce], exc)
+    if isinstance(exc, (ContractLogicError, Web3Exception)):
+      raise HTTPException(status_code=502, detail="Mint transaction failed") from exc
+    raise
+
+
+def recover_nonces(nonce_manager: NonceManager, nonces: list[int], exc: Exception) -> None:
+  """
+  Hand back the nonces of a send that failed and of everything after it in the window. After a
+  nonce error the counter is resynced first and only nonces the chain has not used yet go back.
+  """
+  pending = nonce_manager.resync() if needs_resync(exc) else 0
+  for nonce in nonces:
+    if nonce >= pending:
+      nonce_manager.release(nonce)
+
+
+@lru_cache
+def get_gas_oracle() -> GasOracle:
+  return GasOracle(
+    get_chain_reader(),
+    ttl_seconds=settings.gas_oracle_ttl_seconds,
+    base_fee_multiplier=settings.gas_base_fee_multiplier,
+    gas_limit_margin=settings.gas_limit_margin,
+  )
+
+
+def build_gas_oracle() -> GasOracle | None:
+  try:
+    oracle = get_gas_oracle()
+  except HTTPException:
+    return None
+  return oracle
+
+
+def quote_fees() -> dict[str, int]:
+  try:
+    return get_gas_oracle().fee_fields()
+  except (Web3Exception, ValueError, OSError) as exc:
+    raise HTTPException(status_code=502, detail="Unable to quote gas fees") from exc
+
+
+@lru_cache
+def _chain_id() -> int:
+  w3, _, _ = _init_web3()
+  return int(w3.eth.chain_id)
+
+
+@traced("onchain.sign_mint_transaction")
+def sign_mint_transaction(
+  to_address: str,
+  token_uri: str,
+  product_hash_source: str,
+  nonce: int,
+  fees: dict[str, int],
+) -> tuple[bytes, str]:
+  """Build and sign a mint transaction for an already-allocated nonce; returns (raw tx, tx hash)."""
   if not token_uri:
     raise HTTPException(status_code=400, detail="tokenURI is required")
   if not product_hash_source:
     raise HTTPException(status_code=400, detail="product hash source is required")
 
-  w3, contract, server_address = _init_web3()
+  _, contract, server_address = _init_web3()
   checksum_to = _to_checksum(to_address)
   product_hash = Web3.keccak(text=product_hash_source)
+  mint_call = contract.functions.mintAuthenticityToken(checksum_to, product_hash, token_uri)
+
+  def estimate() -> int | None:
+    try:
+      return mint_call.estimate_gas({"from": server_address})
+    except ContractLogicError:
+      raise
+    except Web3Exception:
+      return None
 
-  txn = contract.functions.mintAuthenticityToken(checksum_to, product_hash, token_uri).build_transaction(
+  # Every field is pre-filled so build_transaction makes no RPC calls of its own.
+  txn = mint_call.build_transaction(
     {
       "from": server_address,
-      "nonce": w3.eth.get_transaction_count(server_address),
-      "gasPrice": w3.eth.gas_price,
+      "nonce": nonce,
+      "gas": get_gas_oracle().gas_limit(token_uri, estimate),
+      "chainId": _chain_id(),
+      **fees,
     }
   )
+  signed = Account.from_key(settings.server_private_key).sign_transaction(txn)
+  return bytes(signed.raw_transaction), signed.hash.hex()
+
+
+@traced("onchain.broadcast_transaction")
+def broadcast_transaction(raw_transaction: bytes) -> str:
+  w3, _, _ = _init_web3()
+  return w3.eth.send_raw_transaction(raw_transaction).hex()
+
+
+@traced("onchain.fetch_mint_receipts")
+def fetch_mint_receipts(tx_hashes: list[str]) -> dict[str, dict | None]:
+  """
+  Look up several mint receipts in one JSON-RPC batch. Each hash maps to None while pending,
+  to {"error": ...} when the transaction reverted, or to the same dict `wait_for_mint_receipt` returns.
+  """
+  _, contract, _ = _init_web3()
+  hashes = [tx_hash if tx_hash.startswith("0x") else f"0x{tx_hash}" for tx_hash in tx_hashes]
+  raw_receipts = get_chain_reader().rpc_many([("eth_getTransactionReceipt", [tx_hash]) for tx_hash in hashes])
+
+  results: dict[str, dict | None] = {}
+  for tx_hash, raw_receipt in zip(tx_hashes, raw_receipts):
+    if not raw_receipt:
+      results[tx_hash] = None
+      continue
+    if raw_receipt.get("status") is not None and int(raw_receipt["status"], 16) == 0:
+      results[tx_hash] = {"error": "Mint transaction reverted"}
+      continue
+    token_id = _raw_receipt_token_id(contract, raw_receipt)
+    if token_id is None:
+      results[tx_hash] = {"error": "Unable to extract tokenId from receipt"}
+      continue
+    results[tx_hash] = {"txHash": tx_hash, "blockNumber": int(raw_receipt["blockNumber"], 16), "tokenId": str(token_id)}
+  return results
+
+
+def _raw_receipt_token_id(contract: Contract, raw_receipt: dict) -> int | None:
+  """tokenId of the contract's ERC-721 Transfer in an unformatted JSON-RPC receipt (hex strings throughout)."""
+  transfer_topic = Web3.to_hex(event_abi_to_log_topic(contract.events.Transfer.abi))
+  address = contract.address.lower()
+  for log in raw_receipt.get("logs") or []:
+    topics = log.get("topics") or []
+    if str(log.get("address", "")).lower() == address and len(topics) == 4 and topics[0].lower() == transfer_topic:
+      return int(topics[3], 16)
+  return None
 
-  if "gas" not in txn:
-    try:
-      txn["gas"] = contract.functions.mintAuthenticityToken(checksum_to, product_hash, token_uri).estimate_gas(
-        {"from": server_address}
-      )
-    except Web3Exception:
-      txn["gas"] = 500_000
 
+@traced("onchain.wait_for_mint_receipt")
+def wait_for_mint_receipt(tx_hash: str, timeout: float = 120) -> dict | None:
+  """
+  Wait up to `timeout` seconds for the mint receipt. Returns None when the transaction is still
+  pending, raises when it was mined but reverted or emitted no Transfer.
+  """
+  w3, contract, _ = _init_web3()
   try:
-    signed = Account.from_key(settings.server_private_key).sign_transaction(txn)
-    tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+  except TimeExhausted:
+    return None
   except (ContractLogicError, Web3Exception) as exc:  # noqa: BLE001
     raise HTTPException(status_code=502, detail="Mint transaction failed") from exc
 
+  if receipt.get("status") == 0:
+    raise HTTPException(status_code=502, detail="Mint transaction reverted")
   token_id = _extract_token_id(contract, receipt)
   if token_id is None:
     raise HTTPException(status_code=500, detail="Unable to extract tokenId from receipt")
 
   return {
-    "txHash": tx_hash.hex(),
+    "txHash": tx_hash,
     "blockNumber": receipt.get("blockNumber"),
     "tokenId": str(token_id),
   }
@@ -157,26 +360,75 @@ def _extract_token_id(contract: Contract, receipt: dict) -> int | None:
   return None
 
 
+@traced("onchain.fetch_wallet_tokens_onchain")
 def fetch_wallet_tokens_onchain(wallet_address: str) -> list[dict]:
-  w3, contract, _ = _init_web3()
+  _, contract, _ = _init_web3()
   normalized_wallet = wallet_address.lower()
   try:
     total_minted = int(contract.functions.totalMinted().call())
   except Web3Exception as exc:  # noqa: BLE001
     raise HTTPException(status_code=502, detail="Unable to query total minted supply") from exc
 
-  owned_tokens: list[dict] = []
-  for token_id in range(1, total_minted + 1):
-    try:
-      owner = contract.functions.ownerOf(token_id).call()
-    except (ContractLogicError, Web3Exception):
-      continue
-    if owner.lower() != normalized_wallet:
+  reader = get_chain_reader()
+  token_ids = range(1, total_minted + 1)
+  owners = reader.call_many([contract.functions.ownerOf(token_id) for token_id in token_ids])
+  owned_ids = [
+    token_id for token_id, owner in zip(token_ids, owners) if owner and str(owner).lower() == normalized_wallet
+  ]
+  token_uris = reader.call_many([contract.functions.tokenURI(token_id) for token_id in owned_ids])
+  return [
+    {"tokenId": str(token_id), "tokenURI": token_uri or ""} for token_id, token_uri in zip(owned_ids, token_uris)
+  ]
+
+
+def get_block_number() -> int:
+  w3, _, _ = _init_web3()
+  try:
+    return int(w3.eth.block_number)
+  except Web3Exception as exc:  # noqa: BLE001
+    raise HTTPException(status_code=502, detail="Unable to query latest block") from exc
+
+
+@traced("onchain.fetch_contract_events")
+def fetch_contract_events(from_block: int, to_block: int) -> list[dict]:
+  """
+  Return decoded Transfer/AuthenticityMinted logs emitted by the contract in [from_block, to_block],
+  ordered by (blockNumber, logIndex).
+  """
+  w3, contract, _ = _init_web3()
+  events = {
+    contract.events.Transfer().topic: contract.events.Transfer(),
+    contract.events.AuthenticityMinted().topic: contract.events.AuthenticityMinted(),
+  }
+  logs = w3.eth.get_logs(
+    {
+      "address": contract.address,
+      "fromBlock": from_block,
+      "toBlock": to_block,
+      "topics": [list(events.keys())],
+    }
+  )
+
+  decoded: list[dict] = []
+  for log in logs:
+    event = events.get(Web3.to_hex(log["topics"][0]))
+    if event is None:
       continue
-    token_uri = ""
     try:
-      token_uri = contract.functions.tokenURI(token_id).call()
-    except (ContractLogicError, Web3Exception):
-      token_uri = ""
-    owned_tokens.append({"tokenId": str(token_id), "tokenURI": token_uri})
-  return owned_tokens
+      args = event.process_log(log)["args"]
+    except (Web3Exception, MismatchedABI):
+      continue
+    entry = {
+      "event": event.event_name,
+      "tokenId": str(args["tokenId"]),
+      "blockNumber": int(log["blockNumber"]),
+      "logIndex": int(log["logIndex"]),
+    }
+    if entry["event"] == "Transfer":
+      entry["from"] = args["from"].lower()
+      entry["to"] = args["to"].lower()
+    else:
+      entry["tokenURI"] = args["tokenURI"]
+    decoded.append(entry)
+  decoded.sort(key=lambda item: (item["blockNumber"], item["logIndex"]))
+  return decoded
@@ -0,0 +1,114 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+
+from app.core import metrics
+from app.core.background import BackgroundWorker
+from app.core.config import settings
+from app.db import crud
+from app.db.session import SessionLocal, transaction
+from app.services.pinata_service import PinataService, remember_pinned
+
+logger = logging.getLogger(__name__)
+
+_worker: "PinWorker | None" = None
+
+PINS = metrics.counter("clochain_metadata_pins_total", "Background metadata pin attempts, by result")
+
+
+class PinWorker(BackgroundWorker):
+  """
+  Uploads metadata registered by `PinataService.register_pin` to Pinata and checks that the CID
+  Pinata reports equals the one computed locally (and already written into tokenURIs).
+
+  Failed uploads stay `pending` with `locked_until` pushed out by an exponential backoff, and become
+  `failed` after `PIN_MAX_ATTEMPTS`; a differing CID is recorded as `mismatch`. Both are visible in
+  `metadata_pins` and through `GET /nft/pins/{cid}`.
+  """
+
+  name = "pin-worker"
+  lease_seconds = 300
+  retry_base_seconds = 30
+  retry_cap_seconds = 3600
+
+  def __init__(self, session_factory=SessionLocal, poll_seconds: float | None = None):
+    super().__init__(poll_seconds if poll_seconds is not None else settings.pin_worker_poll_seconds)
+    self.session_factory = session_factory
+    self.batch_size = max(1, settings.pinata_max_concurrency)
+    self._executor = ThreadPoolExecutor(max_workers=self.batch_size, thread_name_prefix="pinata-pin")
+
+  def run_once(self) -> bool:
+    session = self.session_factory()
+    try:
+      with transaction(session):
+        pins = crud.claim_metadata_pins(session, self.batch_size, self.lease_seconds)
+      if not pins:
+        return False
+      pinata = PinataService(settings.pinata_api_key, settings.pinata_secret, settings.pinata_jwt)
+      # Uploads run in parallel; the session is only used from this thread.
+      futures = [(pin, self._executor.submit(pinata.pin_content, pin.content.encode(), pin.name)) for pin in pins]
+      with transaction(session):
+        for pin, future in futures:
+          try:
+            self._record_success(session, pin, future.result())
+          except Exception as exc:  # noqa: BLE001
+            reason = exc.detail if isinstance(exc, HTTPException) else str(exc)
+            self._record_failure(session, pin, reason if isinstance(reason, str) else "Pinata upload failed")
+      return len(pins) == self.batch_size
+    finally:
+      session.close()
+
+  def stop(self, timeout: float | None = 5.0) -> None:
+    super().stop(timeout)
+    self._executor.shutdown(wait=False, cancel_futures=True)
+
+  def _record_success(self, session, pin, pinned_cid: str) -> None:
+    if pinned_cid == pin.cid:
+      crud.update_metadata_pin(
+        session, pin, status="pinned", pinned_cid=pinned_cid, last_error=None, locked_until=None
+      )
+      remember_pinned(pin.cid, pinned_cid)
+      PINS.inc(result="pinned")
+      return
+    logger.warning("Pinata returned CID %s for metadata pinned as %s", pinned_cid, pin.cid)
+    crud.update_metadata_pin(
+      session,
+      pin,
+      status="mismatch",
+      pinned_cid=pinned_cid,
+      last_error=f"Pinata returned {pinned_cid}",
+      locked_until=None,
+    )
+    PINS.inc(result="mismatch")
+
+  def _record_failure(self, session, pin, reason: str) -> None:
+    attempts = pin.attempts + 1
+    if attempts >= settings.pin_max_attempts:
+      logger.error("Giving up pinning %s after %s attempts: %s", pin.cid, attempts, reason)
+      crud.update_metadata_pin(session, pin, status="failed", attempts=attempts, last_error=reason, locked_until=None)
+      PINS.inc(result="failed")
+      return
+    delay = min(self.retry_cap_seconds, self.retry_base_seconds * (2 ** (attempts - 1)))
+    crud.update_metadata_pin(
+      session,
+      pin,
+      attempts=attempts,
+      last_error=reason,
+      locked_until=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    PINS.inc(result="retry")
+
+
+def build_pin_worker() -> PinWorker | None:
+  global _worker
+  if not settings.pin_worker_enabled:
+    return None
+  _worker = PinWorker()
+  return _worker
+
+
+def notify_pin_worker() -> None:
+  if _worker is not None:
+    _worker.wake()
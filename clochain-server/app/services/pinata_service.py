@@ -1,44 +1,194 @@
-import hashlib
 import json
+import random
+import threading
+import time
+from collections import OrderedDict
 
 import httpx
 from fastapi import HTTPException, status
 
+from app.core.cid import metadata_cid
+from app.core.config import settings
+from app.core.external_calls import observe_call
+from app.core.tracing import traced
+from app.db import crud
+from app.db.session import transaction
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+_upload_slots = threading.BoundedSemaphore(settings.pinata_max_concurrency)
+
+# CIDs (computed locally) known to be pinned -> CID Pinata reported for them.
+_pinned: OrderedDict[str, str] = OrderedDict()
+_pinned_lock = threading.Lock()
+_PINNED_CACHE_SIZE = 4096
+
+
+def _client_options() -> dict:
+  return {
+    "timeout": httpx.Timeout(settings.pinata_timeout_seconds, connect=5.0),
+    "limits": httpx.Limits(
+      max_connections=settings.pinata_max_concurrency,
+      max_keepalive_connections=settings.pinata_max_concurrency,
+      keepalive_expiry=60,
+    ),
+  }
+
+
+def get_http_client() -> httpx.Client:
+  global _client
+  with _client_lock:
+    if _client is None:
+      _client = httpx.Client(**_client_options())
+    return _client
+
+
+def close_http_client() -> None:
+  global _client
+  with _client_lock:
+    if _client is not None:
+      _client.close()
+      _client = None
+
+
+def _observe_upload(response: httpx.Response | None, started: float) -> None:
+  # One observation per HTTP attempt, so retries show up as separate (failed) uploads.
+  if response is None:
+    result = "error"
+  else:
+    result = "ok" if response.is_success else f"http_{response.status_code}"
+  observe_call("pinata", "upload", result, time.perf_counter() - started)
+
 
 class PinataService:
-  _PIN_JSON_URL = "https://api.pinata.cloud/pinning/pinJSONToIPFS"
+  _PIN_FILE_URL = "https://api.pinata.cloud/pinning/pinFileToIPFS"
 
-  def __init__(self, api_key: str, secret_key: str, jwt: str | None = None) -> None:
+  def __init__(self, api_key: str, secret_key: str, jwt: str | None = None, session=None) -> None:
     self.api_key = api_key or ""
     self.secret_key = secret_key or ""
     self.jwt = jwt or ""
+    self.session = session
+
+  def register_pin(self, metadata: dict) -> str:
+    """
+    Return the CID of `metadata` without talking to IPFS and queue the exact bytes for the pin
+    worker. The CID is computed locally, so callers (mint) can use it right away.
+    """
+    content, cid = metadata_cid(metadata)
+    if not self._has_valid_credentials() or self._known_pinned(cid):
+      return cid
+    if self.session is None:
+      return self.upload_metadata(metadata)
+    with transaction(self.session):
+      crud.register_metadata_pin(self.session, cid, content.decode(), self._pin_name(metadata))
+    return cid
 
+  @traced("pinata.upload_metadata")
   def upload_metadata(self, metadata: dict) -> str:
     """
-    Upload metadata JSON to Pinata/IPFS and return the CID.
-    Falls back to deterministic mock CID generation when API keys are not configured.
+    Pin metadata JSON to Pinata/IPFS now and return the CID.
+    Without API keys the locally computed CID is returned and nothing is uploaded.
     """
-    if not self._has_valid_credentials():
-      return self._mock_cid(metadata)
+    content, cid = metadata_cid(metadata)
+    if not self._has_valid_credentials() or self._known_pinned(cid):
+      return cid
+    with _upload_slots:
+      response = self._post_with_retries(**self._build_request(content, self._pin_name(metadata)))
+    return self._record_pinned(cid, self._parse_cid(response))
+
+  @traced("pinata.pin_content")
+  def pin_content(self, content: bytes, name: str) -> str:
+    """Upload already-serialized metadata bytes and return the CID Pinata assigned to them."""
+    with _upload_slots:
+      response = self._post_with_retries(**self._build_request(content, name))
+    return self._parse_cid(response)
 
-    payload = {
-      "pinataOptions": {"cidVersion": 1},
-      "pinataMetadata": {"name": metadata.get("name", "CloChain NFT")},
-      "pinataContent": metadata,
+  def _post_with_retries(self, **request) -> httpx.Response:
+    client = get_http_client()
+    for attempt in range(settings.pinata_max_retries + 1):
+      started = time.perf_counter()
+      try:
+        response = client.post(self._PIN_FILE_URL, **request)
+      except httpx.TransportError as exc:
+        _observe_upload(None, started)
+        if attempt >= settings.pinata_max_retries:
+          raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Pinata upload failed") from exc
+        time.sleep(self._backoff(attempt, None))
+        continue
+      _observe_upload(response, started)
+      if response.status_code in _RETRY_STATUSES and attempt < settings.pinata_max_retries:
+        time.sleep(self._backoff(attempt, response))
+        continue
+      return response
+    raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Pinata upload failed")
+
+  def _backoff(self, attempt: int, response: httpx.Response | None) -> float:
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+      return min(float(retry_after), settings.pinata_backoff_cap_seconds)
+    # Full jitter: uniform over [0, base * 2^attempt], capped.
+    ceiling = min(settings.pinata_backoff_cap_seconds, settings.pinata_backoff_base_seconds * (2**attempt))
+    return random.uniform(0, ceiling)
+
+  def _build_request(self, content: bytes, name: str) -> dict:
+    # Pinning the exact bytes as a file (CIDv1, raw leaves) is what makes Pinata's CID equal ours;
+    # pinJSONToIPFS would re-serialize the document.
+    return {
+      "files": {"file": (f"{name}.json", content, "application/json")},
+      "data": {
+        "pinataOptions": json.dumps({"cidVersion": 1}),
+        "pinataMetadata": json.dumps({"name": name}),
+      },
+      "headers": self._build_headers(),
     }
-    headers = self._build_headers()
+
+  def _pin_name(self, metadata: dict) -> str:
+    return str(metadata.get("name", "CloChain NFT"))
+
+  def _parse_cid(self, response: httpx.Response) -> str:
     try:
-      response = httpx.post(self._PIN_JSON_URL, json=payload, headers=headers, timeout=30.0)
       response.raise_for_status()
-    except httpx.HTTPError as exc:  # noqa: BLE001
+      data = response.json()
+    except (httpx.HTTPError, ValueError) as exc:  # noqa: BLE001
       raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Pinata upload failed") from exc
-
-    data = response.json()
     cid = data.get("IpfsHash")
     if not cid:
       raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Pinata response missing IpfsHash")
     return cid
 
+  def _known_pinned(self, cid: str) -> bool:
+    with _pinned_lock:
+      if cid in _pinned:
+        _pinned.move_to_end(cid)
+        return True
+    if self.session is None:
+      return False
+    pin = crud.get_metadata_pin(self.session, cid)
+    if pin is None or pin.status != "pinned":
+      return False
+    remember_pinned(cid, pin.pinned_cid or cid)
+    return True
+
+  def _record_pinned(self, cid: str, pinned_cid: str) -> str:
+    """Store the outcome of a synchronous pin; on a CID mismatch the CID Pinata serves wins."""
+    matched = pinned_cid == cid
+    if matched:
+      remember_pinned(cid, pinned_cid)
+    if self.session is not None:
+      with transaction(self.session):
+        pin = crud.get_metadata_pin(self.session, cid)
+        if pin is not None:
+          crud.update_metadata_pin(
+            self.session,
+            pin,
+            status="pinned" if matched else "mismatch",
+            pinned_cid=pinned_cid,
+            locked_until=None,
+          )
+    return cid if matched else pinned_cid
+
   def _has_valid_credentials(self) -> bool:
     has_key_pair = bool(
       self.api_key and self.secret_key and self.api_key != "pinata-key" and self.secret_key != "pinata-secret"
@@ -53,8 +203,10 @@ class PinataService:
       "pinata_secret_api_key": self.secret_key,
     }
 
-  def _mock_cid(self, metadata: dict) -> str:
-    serialized = json.dumps(metadata, sort_keys=True).encode()
-    digest = hashlib.sha256(serialized).hexdigest()
-    # CIDv1 placeholder (not real IPFS hash but deterministic)
-    return f"bafy{digest[:50]}"
+
+def remember_pinned(cid: str, pinned_cid: str) -> None:
+  with _pinned_lock:
+    _pinned[cid] = pinned_cid
+    _pinned.move_to_end(cid)
+    while len(_pinned) > _PINNED_CACHE_SIZE:
+      _pinned.popitem(last=False)
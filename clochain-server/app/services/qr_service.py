@@ -0,0 +1,160 @@
+import asyncio
+import base64
+import io
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import qrcode
+import qrcode.image.svg
+
+from app.core.config import settings
+from app.core.external_calls import observe_call
+from app.core.tracing import span
+
+QR_FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+DEFAULT_BOX_SIZE = 10
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def verify_url(short_token: str) -> str:
+  return f"https://clochain-shop.vercel.app/shop/verify?q={short_token}"
+
+
+def render_qr(short_token: str, fmt: str = "png", box_size: int = DEFAULT_BOX_SIZE) -> bytes:
+  """Render the verify-URL QR code. Runs inside the render process pool, so it only needs qrcode."""
+  qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=box_size)
+  qr.add_data(verify_url(short_token))
+  qr.make(fit=True)
+  buffer = io.BytesIO()
+  if fmt == "svg":
+    # Path-based SVG is plain string building: no raster image, no Pillow.
+    qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+  else:
+    qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+  return buffer.getvalue()
+
+
+def data_uri(image: bytes, fmt: str) -> str:
+  return f"data:{QR_FORMATS[fmt]};base64,{base64.b64encode(image).decode()}"
+
+
+class QRImageCache:
+  """LRU of rendered images bounded by total bytes rather than entry count."""
+
+  def __init__(self, max_bytes: int) -> None:
+    self.max_bytes = max_bytes
+    self._entries: OrderedDict[tuple[str, str, int], bytes] = OrderedDict()
+    self._bytes = 0
+    self._lock = threading.Lock()
+
+  def get(self, key: tuple[str, str, int]) -> bytes | None:
+    with self._lock:
+      image = self._entries.get(key)
+      if image is not None:
+        self._entries.move_to_end(key)
+      return image
+
+  def put(self, key: tuple[str, str, int], image: bytes) -> None:
+    if len(image) > self.max_bytes:
+      return
+    with self._lock:
+      previous = self._entries.pop(key, None)
+      if previous is not None:
+        self._bytes -= len(previous)
+      self._entries[key] = image
+      self._bytes += len(image)
+      while self._bytes > self.max_bytes:
+        _, evicted = self._entries.popitem(last=False)
+        self._bytes -= len(evicted)
+
+
+qr_cache = QRImageCache(settings.qr_cache_bytes)
+
+
+def _get_pool() -> ProcessPoolExecutor | None:
+  global _pool
+  if settings.qr_render_processes <= 0:
+    return None
+  with _pool_lock:
+    if _pool is None:
+      # spawn, not fork: the server process runs threads (workers, DB pool) that fork would copy mid-state.
+      _pool = ProcessPoolExecutor(
+        max_workers=settings.qr_render_processes, mp_context=multiprocessing.get_context("spawn")
+      )
+    return _pool
+
+
+def warm_qr_pool() -> None:
+  """Spawn the render processes at startup instead of on the first /issue."""
+  pool = _get_pool()
+  if pool is not None:
+    pool.submit(render_qr, "warmup")
+
+
+def shutdown_qr_pool() -> None:
+  global _pool
+  with _pool_lock:
+    if _pool is not None:
+      _pool.shutdown(wait=False, cancel_futures=True)
+      _pool = None
+
+
+def _discard_pool(broken: ProcessPoolExecutor) -> None:
+  # A broken pool never recovers; dropping it makes the next submit start a fresh one.
+  global _pool
+  with _pool_lock:
+    if _pool is broken:
+      _pool = None
+
+
+def _submit(short_token: str, fmt: str, box_size: int) -> Future:
+  key = (short_token, fmt, box_size)
+  pool = _get_pool()
+  future: Future | None = None
+  started = time.perf_counter()
+  if pool is not None:
+    try:
+      future = pool.submit(render_qr, short_token, fmt, box_size)
+    except BrokenProcessPool:
+      # A worker died (OOM kill etc.); start a fresh pool next time and render this one inline.
+      _discard_pool(pool)
+  if future is None:
+    future = Future()
+    future.set_result(render_qr(short_token, fmt, box_size))
+
+  def finished(done: Future) -> None:
+    # Measured from submit, so time spent queued for a render process is included.
+    error = None if done.cancelled() else done.exception()
+    failed = done.cancelled() or error is not None
+    observe_call("qr", fmt, "error" if failed else "ok", time.perf_counter() - started)
+    if isinstance(error, BrokenProcessPool) and pool is not None:
+      _discard_pool(pool)
+    if not failed:
+      qr_cache.put(key, done.result())
+
+  future.add_done_callback(finished)
+  return future
+
+
+async def get_qr_async(short_token: str, fmt: str = "png", box_size: int = DEFAULT_BOX_SIZE) -> bytes:
+  image = qr_cache.get((short_token, fmt, box_size))
+  if image is not None:
+    return image
+  with span("qr.render", **{"qr.format": fmt}):
+    try:
+      return await asyncio.wrap_future(_submit(short_token, fmt, box_size))
+    except BrokenProcessPool:
+      # The render process died mid-render and took the pool with it; retry once on a fresh pool.
+      return await asyncio.wrap_future(_submit(short_token, fmt, box_size))
+
+
+def prerender_qr(short_token: str, fmt: str = "png", box_size: int = DEFAULT_BOX_SIZE) -> None:
+  """Start rendering into the cache without waiting, so a following GET /qr is a cache hit."""
+  if qr_cache.get((short_token, fmt, box_size)) is None:
+    _submit(short_token, fmt, box_size)
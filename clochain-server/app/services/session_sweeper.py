@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from app.core import metrics
+from app.core.background import BackgroundWorker
+from app.core.config import settings
+from app.db import crud
+from app.db.session import SessionLocal, transaction
+
+SWEPT = metrics.counter("clochain_sessions_swept_total", "Expired rows deleted from the sessions table")
+
+
+class SessionSweeper(BackgroundWorker):
+  """Deletes expired `sessions` rows in batches of `batch_size`, one short transaction per batch."""
+
+  name = "session-sweeper"
+
+  def __init__(self, session_factory=SessionLocal, poll_seconds: float | None = None, batch_size: int | None = None):
+    super().__init__(poll_seconds if poll_seconds is not None else settings.session_sweep_seconds)
+    self.session_factory = session_factory
+    self.batch_size = max(1, batch_size or settings.session_sweep_batch_size)
+
+  def run_once(self) -> bool:
+    session = self.session_factory()
+    try:
+      with transaction(session):
+        deleted = crud.delete_expired_sessions(session, datetime.utcnow(), self.batch_size)
+    finally:
+      session.close()
+    if deleted:
+      SWEPT.inc(deleted)
+    # A full batch means there is probably more: run again right away instead of waiting a poll.
+    return deleted >= self.batch_size
+
+
+def build_session_sweeper() -> SessionSweeper | None:
+  if settings.session_sweep_seconds <= 0:
+    return None
+  return SessionSweeper()
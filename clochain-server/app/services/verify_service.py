@@ -1,4 +1,12 @@
+from typing import Iterator
+
+from fastapi import HTTPException
+
 from app.core.hmac_utils import decode_short_token
+from app.db import crud
+from app.db.ownership_cache import ownership_cache, product_key
+
+BATCH_CHUNK_SIZE = 200
 
 
 class VerifyService:
@@ -8,3 +16,45 @@ class VerifyService:
   def verify(self, short_token: str):
     payload, signature = decode_short_token(short_token)
     return payload, signature
+
+  def ownership(self, payload: dict) -> dict:
+    """Registration status, current owner and transfer count for a verified payload (cached)."""
+    return ownership_cache.get(product_key(payload), lambda key: crud.get_ownership(self.session, key))
+
+  def verify_many(self, short_tokens: list[str]) -> Iterator[dict]:
+    """
+    Verify tokens in input order, yielding one result per token. Signatures are checked in memory;
+    issue and NFT state is looked up with one IN query each per chunk of `BATCH_CHUNK_SIZE` tokens.
+    """
+    for start in range(0, len(short_tokens), BATCH_CHUNK_SIZE):
+      chunk = short_tokens[start : start + BATCH_CHUNK_SIZE]
+      decoded: list[tuple[str, dict | None, str | None, str | None]] = []
+      for short_token in chunk:
+        try:
+          payload, signature = decode_short_token(short_token)
+        except HTTPException as exc:
+          reason = exc.detail if isinstance(exc.detail, str) else "Invalid short token"
+          decoded.append((short_token, None, None, reason))
+        except ValueError:
+          decoded.append((short_token, None, None, "Malformed short token"))
+        else:
+          decoded.append((short_token, payload, signature, None))
+
+      valid = [(token, payload) for token, payload, _, _ in decoded if payload is not None]
+      issued = crud.get_issued_tokens(self.session, [token for token, _ in valid])
+      nfts = crud.get_nfts_by_products(self.session, [product_key(payload) for _, payload in valid])
+
+      for offset, (short_token, payload, signature, reason) in enumerate(decoded):
+        result = {"index": start + offset, "token": short_token, "ok": payload is not None}
+        if payload is None:
+          result["reason"] = reason
+        else:
+          nft = nfts.get(product_key(payload))
+          result.update(
+            payload=payload,
+            signature=signature,
+            issued=short_token in issued,
+            registered=nft is not None,
+            tokenId=nft.token_id if nft else None,
+          )
+        yield result
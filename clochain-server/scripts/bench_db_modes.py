@@ -0,0 +1,122 @@
+"""
+Compare sync (threadpool) and async (DB_ASYNC) request handling under high concurrency.
+
+  cd clochain-server && PYTHONPATH=. python scripts/bench_db_modes.py [concurrency] [requests]
+
+Starts uvicorn once per mode against the same database (DATABASE_URL, default a temporary SQLite
+file), issues a few tokens and then fires `requests` GET /verify?details=true calls, `concurrency`
+at a time. The ownership cache is disabled so every call reaches the database. Prints throughput and
+latency percentiles per mode; BENCH_MODES=sync or async runs only one of them.
+"""
+
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+MODES = os.getenv("BENCH_MODES", "sync,async").split(",")
+WALLET = "0x" + "3f" * 20
+
+
+def _free_port() -> int:
+  with socket.socket() as sock:
+    sock.bind(("127.0.0.1", 0))
+    return sock.getsockname()[1]
+
+
+def _start_server(port: int, env: dict) -> subprocess.Popen:
+  return subprocess.Popen(
+    [
+      sys.executable, "-m", "uvicorn", "app.main:app",
+      "--port", str(port), "--log-level", "warning", "--timeout-keep-alive", "120",
+    ],
+    env=env,
+  )
+
+
+async def _wait_ready(client: httpx.AsyncClient) -> None:
+  for _ in range(100):
+    try:
+      await client.get("/verify", params={"q": "ping"})
+      return
+    except httpx.TransportError:
+      await asyncio.sleep(0.1)
+  raise RuntimeError("server did not start")
+
+
+async def _run(base_url: str, concurrency: int, requests: int) -> dict:
+  limits = httpx.Limits(max_connections=concurrency)
+  async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+    await _wait_ready(client)
+    tokens = []
+    for index in range(8):
+      body = {"brand": "Bench", "productId": f"P-{index}", "purchaseAt": "2024-05-01T00:00:00.000Z"}
+      body["ownerWallet"] = WALLET
+      response = await client.post("/issue", params={"qr": "url"}, json=body)
+      tokens.append(response.json()["short_token"])
+
+    latencies: list[float] = []
+    errors = 0
+    queue = iter(range(requests))
+
+    async def worker() -> None:
+      nonlocal errors
+      for index in queue:
+        started = time.perf_counter()
+        try:
+          response = await client.get("/verify", params={"q": tokens[index % len(tokens)], "details": "true"})
+        except httpx.TransportError:
+          errors += 1
+          continue
+        latencies.append(time.perf_counter() - started)
+        errors += response.status_code != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+  latencies.sort()
+  return {
+    "rps": requests / elapsed,
+    "p50": statistics.median(latencies) * 1000,
+    "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    "errors": errors,
+  }
+
+
+def main(concurrency: int, requests: int) -> None:
+  database_url = os.getenv("DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+  print(f"{concurrency} concurrent, {requests} requests, {database_url.split('://', 1)[0]}")
+  print(f"{'mode':<7}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+  for mode in MODES:
+    port = _free_port()
+    env = {
+      **os.environ,
+      "DATABASE_URL": database_url,
+      "DB_AUTO_MIGRATE": "true",
+      "DB_ASYNC": "true" if mode == "async" else "false",
+      "OWNERSHIP_CACHE_TTL_SECONDS": "0",
+      "QR_RENDER_PROCESSES": "0",
+      "INDEXER_ENABLED": "false",
+      "PIN_WORKER_ENABLED": "false",
+      "MINT_WORKER_ENABLED": "false",
+    }
+    server = _start_server(port, env)
+    try:
+      result = asyncio.run(_run(f"http://127.0.0.1:{port}", concurrency, requests))
+    finally:
+      server.terminate()
+      server.wait()
+    print(f"{mode:<7}{result['rps']:>10.0f}{result['p50']:>10.1f}{result['p99']:>10.1f}{result['errors']:>8}")
+
+
+if __name__ == "__main__":
+  main(
+    int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+    int(sys.argv[2]) if len(sys.argv) > 2 else 5000,
+  )
@@ -0,0 +1,50 @@
+"""
+Compare the legacy JSON short_token with the compact binary one.
+
+  cd clochain-server && PYTHONPATH=. python scripts/bench_short_token.py [iterations]
+
+Prints token length, encode/decode time per token and the QR version / render time of the verify URL.
+"""
+
+import sys
+import time
+from datetime import datetime, timezone
+
+import qrcode
+
+from app.core.hmac_utils import decode_short_token, encode_short_token, random_nonce, sign_payload
+from app.services.qr_service import render_qr, verify_url
+
+
+def _per_call_us(fn, iterations: int) -> float:
+  started = time.perf_counter()
+  for _ in range(iterations):
+    fn()
+  return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main(iterations: int) -> None:
+  payload = {
+    "brand": "CloChain",
+    "productId": "CC-2024-000123",
+    "purchaseAt": "2024-05-01T12:34:56.789Z",
+    "did": "did:ethr:0x" + "3f" * 20,
+    "nonce": random_nonce(),
+    "issuedAt": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+  }
+  signature = sign_payload(payload)
+  print(f"{'format':<8}{'chars':>7}{'encode us':>12}{'decode us':>12}{'QR ver':>8}{'render ms':>12}")
+  for name, compact in (("legacy", False), ("compact", True)):
+    token = encode_short_token(payload, signature, compact=compact)
+    assert decode_short_token(token) == (payload, signature)
+    encode_us = _per_call_us(lambda: encode_short_token(payload, signature, compact=compact), iterations)
+    decode_us = _per_call_us(lambda: decode_short_token(token), iterations)
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M)
+    qr.add_data(verify_url(token))
+    qr.make(fit=True)
+    render_ms = _per_call_us(lambda: render_qr(token), max(1, iterations // 500)) / 1000
+    print(f"{name:<8}{len(token):>7}{encode_us:>12.1f}{decode_us:>12.1f}{qr.version:>8}{render_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+  main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,23 @@
+"""
+Print the headers that ask the server to profile one request.
+
+  cd clochain-server && PROFILING_SECRET=... PYTHONPATH=. python scripts/profile_request.py GET '/nft/me?page=2'
+
+The signature covers the method, path, query string and the printed `X-Request-ID`, is valid for
+five minutes and is accepted once. The response carries `X-Profile-Id` (the request id); fetch the
+speedscope file with GET /admin/profiles/<id> (signed the same way for that path) and open it in
+speedscope.app.
+"""
+
+import sys
+import uuid
+
+from app.core.profiling import sign_profile_request
+
+if __name__ == "__main__":
+  if len(sys.argv) != 3:
+    sys.exit(__doc__)
+  path, _, query = sys.argv[2].partition("?")
+  request_id = uuid.uuid4().hex
+  print(f"X-Request-ID: {request_id}")
+  print(f"X-Clochain-Profile: {sign_profile_request(sys.argv[1], path, query, request_id)}")
@@ -0,0 +1,27 @@
+import os
+import tempfile
+
+# Settings are read at import time, so point the app at a throwaway database before anything imports it.
+_scratch = tempfile.mkdtemp(prefix="clochain-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'app.db')}"
+os.environ["DB_AUTO_MIGRATE"] = "false"
+os.environ["HMAC_SECRET"] = "test-hmac"
+
+import pytest  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db import migrate  # noqa: E402
+
+
+@pytest.fixture
+def engine(tmp_path):
+  created = create_engine(f"sqlite:///{tmp_path / 'test.db'}", future=True)
+  yield created
+  created.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+  migrate.upgrade(engine)
+  return sessionmaker(bind=engine, autocommit=False, autoflush=False)
@@ -0,0 +1,44 @@
+import base64
+import hashlib
+
+import pytest
+
+from app.core.cid import DAG_JSON_CODEC, compute_cid, is_raw_cid, metadata_cid
+
+
+@pytest.mark.parametrize(
+  ("data", "cid"),
+  [
+    (b"", "bafkreihdwdcefgh4dqkjv67uzcmw7ojee6xedzdetojuzjevtenxquvyku"),
+    (b"hello", "bafkreibm6jg3ux5qumhcn2b3flc3tyu6dmlb4xa7u5bf44yegnrjhc4yeq"),
+    (b"hello world", "bafkreifzjut3te2nhyekklss27nh3k72ysco7y32koao5eei66wof36n5e"),
+  ],
+)
+def test_raw_cids_match_ipfs(data, cid):
+  assert compute_cid(data) == cid
+  assert is_raw_cid(cid)
+
+
+def test_dag_json_cid():
+  cid = compute_cid(b"{}", DAG_JSON_CODEC)
+
+  assert cid == "baguqeeraiqjw7i2vwntyuekgvulpp2det2kpwt6cd7tx5ayqybqpmhfk76fa"
+  assert not is_raw_cid(cid)
+
+
+def test_cid_carries_the_sha256_of_the_content():
+  data = b'{"name":"CloChain"}'
+  encoded = compute_cid(data)[1:].upper()
+  cid_bytes = base64.b32decode(encoded + "=" * (-len(encoded) % 8))
+
+  # version 1, raw codec 0x55, sha2-256 multihash of 32 bytes
+  assert cid_bytes[:4] == bytes([0x01, 0x55, 0x12, 0x20])
+  assert cid_bytes[4:] == hashlib.sha256(data).digest()
+
+
+def test_metadata_cid_is_independent_of_key_order():
+  content, cid = metadata_cid({"name": "CloChain", "attributes": [{"trait_type": "brand", "value": "한글"}]})
+  same_content, same_cid = metadata_cid({"attributes": [{"value": "한글", "trait_type": "brand"}], "name": "CloChain"})
+
+  assert content == same_content == '{"attributes":[{"trait_type":"brand","value":"한글"}],"name":"CloChain"}'.encode()
+  assert cid == same_cid == compute_cid(content)
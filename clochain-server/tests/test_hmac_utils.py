@@ -0,0 +1,89 @@
+import pytest
+from fastapi import HTTPException
+
+from app.core.hmac_utils import (
+  COMPACT_TOKEN_VERSION,
+  _b64decode,
+  _b64encode,
+  decode_short_token,
+  encode_short_token,
+  random_nonce,
+  sign_payload,
+)
+
+
+def _payload(**overrides) -> dict:
+  payload = {
+    "brand": "CloChain",
+    "productId": "SKU-001",
+    "purchaseAt": "2025-03-01T12:34:56.789Z",
+    "did": "did:ethr:0x" + "ab" * 20,
+    "nonce": random_nonce(),
+    "issuedAt": "2025-03-01T12:35:00+00:00",
+  }
+  payload.update(overrides)
+  return payload
+
+
+def test_compact_token_round_trip():
+  payload = _payload()
+  token = encode_short_token(payload, sign_payload(payload))
+
+  assert _b64decode(token)[0] == COMPACT_TOKEN_VERSION
+  assert decode_short_token(token) == (payload, sign_payload(payload))
+
+
+@pytest.mark.parametrize(
+  "overrides",
+  [
+    {"purchaseAt": "2025-03-01"},
+    {"nonce": "not-a-16-byte-nonce"},
+    {"issuedAt": "2025-03-01T12:35:00.123456+00:00"},
+    {"brand": "브랜드"},
+  ],
+)
+def test_compact_token_keeps_fields_that_do_not_pack(overrides):
+  payload = _payload(**overrides)
+  token = encode_short_token(payload, sign_payload(payload))
+
+  assert _b64decode(token)[0] == COMPACT_TOKEN_VERSION
+  assert decode_short_token(token) == (payload, sign_payload(payload))
+
+
+@pytest.mark.parametrize(
+  "overrides",
+  [
+    {"did": "did:ethr:0x" + "AB" * 20},
+    {"extra": "field"},
+  ],
+)
+def test_payloads_outside_the_layout_use_legacy_tokens(overrides):
+  payload = _payload(**overrides)
+  token = encode_short_token(payload, sign_payload(payload))
+
+  assert _b64decode(token)[0] != COMPACT_TOKEN_VERSION
+  assert decode_short_token(token) == (payload, sign_payload(payload))
+
+
+def test_legacy_tokens_still_decode():
+  payload = _payload()
+  token = encode_short_token(payload, sign_payload(payload), compact=False)
+
+  assert decode_short_token(token) == (payload, sign_payload(payload))
+
+
+@pytest.mark.parametrize("compact", [True, False])
+def test_tampered_tokens_are_rejected(compact):
+  payload = _payload()
+  raw = bytearray(_b64decode(encode_short_token(payload, sign_payload(payload), compact=compact)))
+  raw[5] ^= 0x01
+
+  with pytest.raises(HTTPException) as excinfo:
+    decode_short_token(_b64encode(bytes(raw)))
+  assert excinfo.value.status_code == 400
+
+
+def test_truncated_compact_token_is_rejected():
+  with pytest.raises(HTTPException) as excinfo:
+    decode_short_token(_b64encode(bytes([COMPACT_TOKEN_VERSION, 0])))
+  assert excinfo.value.status_code == 400
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+from app.db import crud, models
+
+
+def _add_jobs(session, *statuses: str) -> None:
+  start = datetime(2025, 1, 1)
+  for index, status in enumerate(statuses):
+    session.add(
+      models.MintJob(
+        job_id=f"job-{index}",
+        short_token=f"token-{index}",
+        wallet_address="0xabc",
+        payload={},
+        status=status,
+        created_at=start + timedelta(seconds=index),
+        updated_at=start,
+      )
+    )
+  session.commit()
+
+
+def test_claims_oldest_unlocked_rows_in_status(session_factory):
+  with session_factory() as session:
+    _add_jobs(session, "pending", "failed", "pending", "submitted", "pending")
+
+    claimed = crud.claim_mint_jobs(session, ["pending", "submitted"], limit=3, lease_seconds=60)
+
+    assert [job.job_id for job in claimed] == ["job-0", "job-2", "job-3"]
+    assert all(job.locked_until > datetime.utcnow() for job in claimed)
+
+
+def test_leased_rows_are_not_claimed_twice(session_factory):
+  with session_factory() as session:
+    _add_jobs(session, "pending", "pending")
+    first = [job.job_id for job in crud.claim_mint_jobs(session, ["pending"], limit=1, lease_seconds=60)]
+    session.commit()
+
+  with session_factory() as other:
+    second = [job.job_id for job in crud.claim_mint_jobs(other, ["pending"], limit=10, lease_seconds=60)]
+    other.commit()
+
+  with session_factory() as third:
+    assert crud.claim_mint_jobs(third, ["pending"], limit=10, lease_seconds=60) == []
+
+  assert first == ["job-0"]
+  assert second == ["job-1"]
+
+
+def test_expired_leases_are_claimed_again(session_factory):
+  with session_factory() as session:
+    _add_jobs(session, "pending")
+    job = session.get(models.MintJob, "job-0")
+    job.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    session.commit()
+
+    claimed = crud.claim_mint_jobs(session, ["pending"], limit=1, lease_seconds=60)
+
+    assert [job.job_id for job in claimed] == ["job-0"]
+
+
+def test_lease_is_refused_once_another_worker_holds_the_row(session_factory):
+  with session_factory() as session:
+    _add_jobs(session, "pending")
+    # Another worker leases the row between our candidate SELECT and our UPDATE.
+    original_execute = session.execute
+    raced = []
+
+    def execute(statement, *args, **kwargs):
+      if statement.is_update and not raced:
+        with session_factory() as other:
+          raced.extend(job.job_id for job in crud.claim_mint_jobs(other, ["pending"], limit=1, lease_seconds=60))
+          other.commit()
+      return original_execute(statement, *args, **kwargs)
+
+    session.execute = execute
+
+    assert crud.claim_mint_jobs(session, ["pending"], limit=1, lease_seconds=60) == []
+    assert raced == ["job-0"]
+
+
+def test_claims_pending_metadata_pins(session_factory):
+  now = datetime.utcnow()
+  with session_factory() as session:
+    crud.register_metadata_pin(session, "bafkrei-a", "{}", "a")
+    session.add(
+      models.MetadataPin(cid="bafkrei-b", content="{}", name="b", status="pinned", created_at=now, updated_at=now)
+    )
+    session.commit()
+
+    claimed = crud.claim_metadata_pins(session, limit=10, lease_seconds=60)
+
+    assert [pin.cid for pin in claimed] == ["bafkrei-a"]
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.db import migrate
+from app.db.session import run_db
+from app.services.login_nonce_store import MemoryLoginNonceStore, SqlLoginNonceStore
+
+
+def _no_own_session():
+  raise AssertionError("request-path store calls must use the request's session")
+
+
+@pytest.fixture(params=["memory", "db"])
+def store(request):
+  if request.param == "memory":
+    return MemoryLoginNonceStore(max_entries=10)
+  return SqlLoginNonceStore(session_factory=_no_own_session)
+
+
+def test_nonce_is_redeemed_once(store, session_factory):
+  expires = datetime.now(timezone.utc) + timedelta(minutes=5)
+  with session_factory() as session:
+    store.put("0xabc", "first", expires, session)
+    store.put("0xabc", "second", expires, session)
+
+    assert store.get("0xabc", session)[0] == "second"
+    assert not store.consume("0xabc", "first", session)
+    assert store.consume("0xabc", "second", session)
+    assert not store.consume("0xabc", "second", session)
+    assert store.get("0xabc", session) is None
+
+
+def test_expired_nonce_is_dropped(store, session_factory):
+  with session_factory() as session:
+    store.put("0xabc", "stale", datetime.now(timezone.utc) - timedelta(seconds=1), session)
+
+    assert not store.consume("0xabc", "stale", session)
+    record = store.get("0xabc", session)
+    assert record is not None and record[0] == "stale"
+    assert store.get("0xabc", session) is None
+
+
+def test_db_store_runs_on_the_async_request_session(engine):
+  migrate.upgrade(engine)
+  store = SqlLoginNonceStore(session_factory=_no_own_session)
+  expires = datetime.now(timezone.utc) + timedelta(minutes=5)
+
+  async def login() -> bool:
+    async_engine = create_async_engine(str(engine.url).replace("sqlite:", "sqlite+aiosqlite:", 1))
+    try:
+      async with async_sessionmaker(async_engine, class_=AsyncSession)() as session:
+        await run_db(session, lambda db: store.put("0xabc", "nonce", expires, db))
+        return await run_db(session, lambda db: store.consume("0xabc", "nonce", db))
+    finally:
+      await async_engine.dispose()
+
+  assert asyncio.run(login())
@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, inspect, select
+
+from app.core.hmac_utils import payload_fingerprint, product_fingerprint
+from app.db import migrate, models
+from app.db.migrations import m0001_baseline, ops
+
+_baseline = m0001_baseline._metadata.tables
+
+
+def _schema(engine) -> dict:
+  inspector = inspect(engine)
+  return {
+    table: {
+      "columns": {column["name"]: column["nullable"] for column in inspector.get_columns(table)},
+      "indexes": {
+        (tuple(index["column_names"]), bool(index["unique"])) for index in inspector.get_indexes(table)
+      },
+      "unique": {tuple(unique["column_names"]) for unique in inspector.get_unique_constraints(table)},
+      "foreign_keys": {
+        (tuple(fk["constrained_columns"]), fk["referred_table"]) for fk in inspector.get_foreign_keys(table)
+      },
+    }
+    for table in inspector.get_table_names()
+    if table != migrate.schema_migrations.name
+  }
+
+
+def _baseline_database(engine, duplicate_issue: bool = False) -> None:
+  """A database as the pre-migration init_db left it, with some data in every table."""
+  m0001_baseline._metadata.create_all(bind=engine)
+  now = datetime(2025, 1, 1)
+  payload = {"brand": "CloChain", "productId": "SKU-1", "purchaseAt": "2025-01-01T00:00:00.000Z"}
+  with engine.begin() as conn:
+    conn.execute(_baseline["users"].insert(), [{"wallet_address": "0xabc", "did": "did:ethr:0xabc", "created_at": now}])
+    issues = [{"issue_id": "issue-1", "short_token": "t1", "payload": payload, "signature": "s1", "created_at": now}]
+    if duplicate_issue:
+      issues.append({"issue_id": "issue-2", "short_token": "t2", "payload": payload, "signature": "s1", "created_at": now})
+    conn.execute(_baseline["issues"].insert(), issues)
+    conn.execute(
+      _baseline["nfts"].insert(),
+      [
+        {
+          "token_id": "1",
+          "owner_wallet": "0xabc",
+          "cid": "bafkrei",
+          "brand": "CloChain",
+          "product_id": "SKU-1",
+          "purchase_at": "2025-01-01T00:00:00.000Z",
+          "first_owner_wallet": "0xabc",
+          "created_at": now,
+        }
+      ],
+    )
+    conn.execute(
+      _baseline["transfers"].insert(),
+      [{"id": "tr-1", "token_id": "1", "from_wallet": "0x0", "to_wallet": "0xabc", "tx_hash": "0x1", "created_at": now}],
+    )
+
+
+def test_baseline_database_migrates_to_the_fresh_schema(engine, tmp_path):
+  _baseline_database(engine)
+  with pytest.raises(migrate.SchemaNotMigratedError):
+    migrate.check_schema(engine)
+
+  applied = migrate.upgrade(engine)
+
+  fresh = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}", future=True)
+  assert migrate.upgrade(fresh) == applied == [module.revision for module in migrate.load_migrations()]
+  assert _schema(engine) == _schema(fresh)
+  migrate.check_schema(engine)
+  assert migrate.upgrade(engine) == []
+  fresh.dispose()
+
+
+def test_migrated_columns_match_the_models(engine):
+  migrate.upgrade(engine)
+  schema = _schema(engine)
+
+  for table in models.Base.metadata.sorted_tables:
+    expected = {column.name: column.nullable for column in table.columns}
+    assert schema[table.name]["columns"] == expected, table.name
+
+
+def test_baseline_rows_get_not_null_fingerprints(engine):
+  _baseline_database(engine)
+  migrate.upgrade(engine)
+
+  with engine.connect() as conn:
+    assert not ops.is_nullable(conn, "issues", "payload_fingerprint")
+    assert not ops.is_nullable(conn, "nfts", "product_fingerprint")
+    issue = conn.execute(select(models.Issue.payload, models.Issue.payload_fingerprint)).one()
+    nft = conn.execute(select(models.NFT.product_fingerprint)).scalar_one()
+    transfers = conn.execute(select(models.Transfer.id)).scalars().all()
+
+  assert issue.payload_fingerprint == payload_fingerprint(issue.payload)
+  assert nft == product_fingerprint("CloChain", "SKU-1", "2025-01-01T00:00:00.000Z")
+  assert transfers == ["tr-1"]
+
+
+def test_duplicate_payloads_stop_the_migration(engine):
+  _baseline_database(engine, duplicate_issue=True)
+
+  with pytest.raises(ops.MigrationConflictError, match="issue-1, issue-2"):
+    migrate.upgrade(engine)
+
+  assert migrate.applied_revisions(engine) == {"0001"}
+  with engine.connect() as conn:
+    assert not ops.has_column(conn, "issues", "payload_fingerprint")
+
+  with engine.begin() as conn:
+    conn.execute(_baseline["issues"].delete().where(_baseline["issues"].c.issue_id == "issue-2"))
+  migrate.upgrade(engine)
+  migrate.check_schema(engine)
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db import crud, models
+from app.services import mint_worker
+from app.services.mint_worker import MintJobWorker
+from app.services.nft_service import NFTService
+from app.services.nonce_manager import DBNonceManager, NonceManager
+
+
+class Chain:
+  """Fake node: records the nonce of every accepted send and fails the sends listed in `failures`."""
+
+  def __init__(self, pending: int) -> None:
+    self.pending = pending
+    self.sent: list[int] = []
+    self.failures: dict[int, tuple[Exception, int | None]] = {}
+
+  def pending_count(self) -> int:
+    return self.pending
+
+  def sign(self, wallet, token_uri, product_hash_source, nonce, fees):
+    return nonce, None
+
+  def broadcast(self, nonce: int) -> str:
+    if nonce in self.failures:
+      exc, pending = self.failures.pop(nonce)
+      self.pending = pending or self.pending
+      raise exc
+    self.sent.append(nonce)
+    self.pending = max(self.pending, nonce + 1)
+    return f"0x{nonce:064x}"
+
+
+@pytest.fixture(params=["memory", "db"])
+def worker(request, monkeypatch, session_factory):
+  chain = Chain(5)
+  if request.param == "memory":
+    manager = NonceManager(chain.pending_count)
+  else:
+    manager = DBNonceManager("0xserver", chain.pending_count, session_factory=session_factory)
+  monkeypatch.setattr(mint_worker, "get_nonce_manager", lambda: manager)
+  monkeypatch.setattr(mint_worker, "quote_fees", lambda: {})
+  monkeypatch.setattr(mint_worker, "sign_mint_transaction", chain.sign)
+  monkeypatch.setattr(mint_worker, "broadcast_transaction", chain.broadcast)
+  monkeypatch.setattr(NFTService, "prepare_mint_job", lambda self, job: (f"ipfs://{job.job_id}", job.job_id))
+  created = MintJobWorker(session_factory=session_factory, concurrency=1, window_size=3)
+  created.chain = chain
+  yield created
+  created.stop(timeout=0)
+
+
+def _add_jobs(session_factory, count: int) -> None:
+  start = datetime(2025, 1, 1)
+  with session_factory() as session:
+    for index in range(count):
+      session.add(
+        models.MintJob(
+          job_id=f"job-{index}",
+          short_token=f"token-{index}",
+          wallet_address="0xabc",
+          payload={},
+          status="pending",
+          created_at=start + timedelta(seconds=index),
+          updated_at=start,
+        )
+      )
+    session.commit()
+
+
+def _broadcast_window(worker) -> dict[str, str]:
+  with worker.session_factory() as session:
+    jobs = crud.claim_mint_jobs(session, ["pending", "submitted"], worker.window_size, worker.lease_seconds)
+    session.commit()
+    return worker._broadcast_window(session, jobs)
+
+
+@pytest.mark.parametrize(
+  ("failure", "used_by_chain"),
+  [
+    (ConnectionError("connection reset"), False),
+    (ValueError("{'code': -32000, 'message': 'nonce too low'}"), True),
+  ],
+)
+def test_failed_send_returns_the_unsent_nonces_of_the_window(worker, session_factory, failure, used_by_chain):
+  chain = worker.chain
+  _add_jobs(session_factory, 3)
+
+  # With a nonce error someone else's transaction took nonce 6 before ours reached the node.
+  chain.failures[6] = (failure, 7 if used_by_chain else None)
+
+  assert list(_broadcast_window(worker)) == ["job-0"]
+  assert chain.sent == [5]
+
+  with session_factory() as session:
+    assert [(job.status, job.attempts) for job in session.query(models.MintJob).order_by(models.MintJob.job_id)] == [
+      ("submitted", 0),
+      ("pending", 1),
+      ("pending", 0),
+    ]
+
+  assert sorted(_broadcast_window(worker)) == ["job-1", "job-2"]
+  assert chain.sent == [5, 7, 8] if used_by_chain else [5, 6, 7]
+
+
+def _submitted_job(worker, session_factory) -> None:
+  _add_jobs(session_factory, 1)
+  assert list(_broadcast_window(worker)) == ["job-0"]
+
+
+def _collect(worker, monkeypatch, receipts: dict) -> None:
+  monkeypatch.setattr(mint_worker, "fetch_mint_receipts", lambda tx_hashes: receipts)
+  with worker._lock:
+    worker._in_flight += 1
+  worker._collect_receipts({"job-0": f"0x{5:064x}"}, {}, 0.0)
+
+
+def test_reverted_mint_fails_at_once(worker, session_factory, monkeypatch):
+  _submitted_job(worker, session_factory)
+  _collect(worker, monkeypatch, {f"0x{5:064x}": {"error": "Mint transaction reverted"}})
+
+  with session_factory() as session:
+    job = session.get(models.MintJob, "job-0")
+    assert (job.status, job.error, job.attempts) == ("failed", "Mint transaction reverted", 1)
+
+
+def test_unmined_mint_gives_up_after_max_attempts(worker, session_factory, monkeypatch):
+  monkeypatch.setattr(mint_worker.settings, "mint_receipt_timeout_seconds", 0)
+  monkeypatch.setattr(mint_worker.settings, "mint_job_max_attempts", 2)
+  _submitted_job(worker, session_factory)
+
+  _collect(worker, monkeypatch, {})
+  with session_factory() as session:
+    job = session.get(models.MintJob, "job-0")
+    assert (job.status, job.attempts, job.locked_until) == ("submitted", 1, None)
+
+  _collect(worker, monkeypatch, {})
+  with session_factory() as session:
+    assert session.get(models.MintJob, "job-0").status == "failed"
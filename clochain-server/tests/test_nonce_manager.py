@@ -0,0 +1,86 @@
+import pytest
+
+from app.services.nonce_manager import DBNonceManager, NonceManager, needs_resync
+
+
+class Chain:
+  def __init__(self, pending: int) -> None:
+    self.pending = pending
+    self.calls = 0
+
+  def pending_count(self) -> int:
+    self.calls += 1
+    return self.pending
+
+
+@pytest.fixture
+def chain():
+  return Chain(5)
+
+
+@pytest.fixture(params=["memory", "db"])
+def manager(request, chain):
+  if request.param == "memory":
+    return NonceManager(chain.pending_count)
+  session_factory = request.getfixturevalue("session_factory")
+  return DBNonceManager("0xABC", chain.pending_count, session_factory=session_factory)
+
+
+def test_allocates_from_the_pending_count(manager, chain):
+  assert [manager.allocate(), manager.allocate()] == [5, 6]
+  assert manager.allocate_many(3) == [7, 8, 9]
+  assert chain.calls == 1
+
+
+def test_released_nonces_are_reused_lowest_first(manager):
+  manager.allocate_many(4)
+  manager.release(7)
+  manager.release(6)
+  manager.release(6)
+
+  assert [manager.allocate(), manager.allocate(), manager.allocate()] == [6, 7, 9]
+
+
+def test_resync_only_moves_forward(manager, chain):
+  manager.allocate_many(3)
+  chain.pending = 6
+  manager.resync()
+  assert manager.allocate() == 8
+
+  chain.pending = 12
+  manager.resync()
+  assert manager.allocate() == 12
+
+
+def test_resync_drops_released_nonces_the_chain_has_used(manager, chain):
+  manager.allocate_many(5)
+  manager.release(5)
+  manager.release(8)
+  chain.pending = 7
+  manager.resync()
+
+  assert [manager.allocate(), manager.allocate()] == [8, 10]
+
+
+def test_forced_resync_moves_back(manager, chain):
+  manager.allocate_many(5)
+  manager.release(7)
+  chain.pending = 6
+  manager.resync(force=True)
+
+  assert manager.allocate_many(2) == [6, 7]
+
+
+def test_db_managers_share_one_counter(session_factory, chain):
+  first = DBNonceManager("0xabc", chain.pending_count, session_factory=session_factory)
+  second = DBNonceManager("0xABC", chain.pending_count, session_factory=session_factory)
+
+  assert [first.allocate(), second.allocate(), first.allocate()] == [5, 6, 7]
+  second.release(6)
+  assert first.allocate() == 6
+
+
+def test_needs_resync():
+  assert needs_resync(ValueError("{'code': -32000, 'message': 'nonce too low'}"))
+  assert needs_resync(ValueError("Already Known"))
+  assert not needs_resync(ValueError("insufficient funds for gas * price + value"))
@@ -0,0 +1,39 @@
+import logging
+
+from app.core import profiling
+from app.core.background import worker_names
+from app.services import indexer, login_nonce_store, mint_worker, pin_worker, session_sweeper  # noqa: F401
+
+
+def test_worker_names_are_registered():
+  assert {"mint-job-worker", "transfer-indexer", "pin-worker", "session-sweeper", "login-nonce-sweeper"} <= worker_names
+
+
+def test_unknown_profile_workers_are_reported(monkeypatch, caplog):
+  monkeypatch.setattr(profiling.settings, "profiling_enabled", True)
+  monkeypatch.setattr(profiling.settings, "profile_workers", {"mint-job-worker", "mint-worker"})
+
+  with caplog.at_level(logging.WARNING, logger=profiling.__name__):
+    profiling.check_profile_workers(worker_names)
+
+  assert "unknown workers mint-worker;" in caplog.text
+
+
+def test_known_profile_workers_are_accepted(monkeypatch, caplog):
+  monkeypatch.setattr(profiling.settings, "profiling_enabled", True)
+  monkeypatch.setattr(profiling.settings, "profile_workers", {"mint-job-worker", "transfer-indexer"})
+
+  with caplog.at_level(logging.WARNING, logger=profiling.__name__):
+    profiling.check_profile_workers(worker_names)
+
+  assert caplog.text == ""
+
+
+def test_signed_request_is_accepted_once(monkeypatch):
+  monkeypatch.setattr(profiling.settings, "profiling_secret", "test-profiling")
+  header = profiling.sign_profile_request("GET", "/nft/me", "limit=5", "req-1")
+
+  assert not profiling.verify_profile_signature(header, "GET", "/nft/me", "limit=6", "req-1")
+  assert not profiling.verify_profile_signature(header, "GET", "/nft/me", "limit=5", "req-2")
+  assert profiling.verify_profile_signature(header, "GET", "/nft/me", "limit=5", "req-1")
+  assert not profiling.verify_profile_signature(header, "GET", "/nft/me", "limit=5", "req-1")
@@ -0,0 +1,44 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.core import rate_limit
+from app.core.rate_limit import TokenBucketLimiter, client_key
+
+
+def _request(forwarded: str | None = None, peer: str = "10.0.0.1") -> Request:
+  headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded is not None else []
+  return Request({"type": "http", "method": "POST", "path": "/verify/batch", "headers": headers, "client": (peer, 443)})
+
+
+def test_spoofed_first_hops_share_the_callers_bucket():
+  limiter = TokenBucketLimiter(rate=0, burst=2)
+  limiter.enforce(client_key(_request("1.1.1.1, 203.0.113.7")))
+  limiter.enforce(client_key(_request("2.2.2.2, 203.0.113.7")))
+
+  with pytest.raises(HTTPException) as excinfo:
+    limiter.enforce(client_key(_request("3.3.3.3, 203.0.113.7")))
+  assert excinfo.value.status_code == 429
+
+
+def test_client_key_uses_the_hop_the_trusted_proxies_added(monkeypatch):
+  assert client_key(_request("203.0.113.7")) == "203.0.113.7"
+  assert client_key(_request()) == "10.0.0.1"
+
+  monkeypatch.setattr(rate_limit.settings, "trusted_proxy_hops", 2)
+  assert client_key(_request("1.1.1.1, 203.0.113.7, 10.1.0.1")) == "203.0.113.7"
+  assert client_key(_request("203.0.113.7")) == "10.0.0.1"
+
+  monkeypatch.setattr(rate_limit.settings, "trusted_proxy_hops", 0)
+  assert client_key(_request("203.0.113.7")) == "10.0.0.1"
+
+
+def test_bucket_refills_over_time(monkeypatch):
+  now = [100.0]
+  monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+  limiter = TokenBucketLimiter(rate=10, burst=5)
+
+  assert limiter.acquire("caller", cost=5) == 0
+  assert limiter.acquire("caller", cost=2) == pytest.approx(0.2)
+  now[0] += 0.2
+  assert limiter.acquire("caller", cost=2) == 0
@@ -16,7 +16,7 @@ type VerifyResponseRaw = Partial<VerifyResponse> & {
 }
 
 export async function verifyProduct(params: VerifyRequest): Promise<VerifyResponse> {
-  const requestParams: Record<string, string> = { q: params.token }
+  const requestParams: Record<string, string> = { q: params.token, details: 'true' }
   if (params.sig) {
     requestParams.sig = params.sig
   }
@@ -35,5 +35,8 @@ export async function verifyProduct(params: VerifyRequest): Promise<VerifyRespon
     payload: data.payload,
     signature: data.signature,
     registered: data.registered,
+    tokenId: data.tokenId,
+    owner: data.owner,
+    transferCount: data.transferCount,
   }
 }
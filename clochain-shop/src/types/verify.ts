@@ -9,4 +9,7 @@ export interface VerifyResponse {
   payload?: Record<string, unknown>
   signature?: string
   registered?: boolean
+  tokenId?: string | null
+  owner?: string | null
+  transferCount?: number
 }